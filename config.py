@@ -29,6 +29,116 @@ class Config:
     # 词云配置
     WORDCLOUD_FONT_PATH = r'C:\Windows\Fonts\msyh.ttc'
 
+    # ==================== 数据集配置 ====================
+    # 数据后端: 'csv'（读取爬虫CSV）/ 'orm'（读取数据库，查询条件转换为SQL）
+    DATASET_BACKEND = 'csv'
+    # 列式快照：CSV解析后自动生成，CSV未更新时直接读取快照
+    DATASET_SNAPSHOT_ENABLED = True
+    # 快照格式: 'parquet' / 'feather'（需要pyarrow，缺失时回退为 'pickle'）
+    DATASET_SNAPSHOT_FORMAT = 'parquet'
+    DATASET_SNAPSHOT_DIR = BASE_DIR / 'data' / 'snapshot'
+    # 紧凑类型：user_ip、aweme_id存为category，评论内容、用户名、视频描述存为Arrow字符串
+    DATASET_COMPACT_DTYPES = True
+    # 多进程共享：标准化数据写入Arrow文件，各worker进程内存映射挂载（零拷贝），数据更新时递增版本号
+    DATASET_SHARED_ENABLED = False
+    # Linux下可设为 '/dev/shm/douyin_analysis'，文件只存在于内存
+    DATASET_SHARED_DIR = BASE_DIR / 'data' / 'shared'
+    # 数据变化标记：数据库中的行被原地更新（重新导入视频、清空数据、重新分析情感）时改写，
+    # 行数和最大主键不变时数据版本也随之变化（接口ETag、报告快照）
+    DATA_CHANGE_TOKEN_PATH = BASE_DIR / 'data' / 'cache' / 'data_change.token'
+
+    # ==================== 流式分析配置 ====================
+    # 评论数据超过内存时按块读取CSV，逐块聚合
+    COMMENT_STREAMING_ENABLED = False
+    # 每块数据的内存预算(MB)，按采样估算的单行内存换算为每块行数
+    STREAMING_MEMORY_BUDGET_MB = 256
+    # 固定每块行数，None表示按内存预算估算
+    STREAMING_CHUNK_ROWS = None
+
+    # ==================== 预计算聚合配置 ====================
+    # 仪表盘统计从预计算的聚合表读取，数据追加时只聚合新增的行
+    MATERIALIZED_AGGREGATES_ENABLED = True
+    MATERIALIZED_AGGREGATES_DIR = BASE_DIR / 'data' / 'aggregates'
+    # 排行类聚合表保存的条数，请求更多时实时计算
+    MATERIALIZED_TOP_N = 100
+
+    # ==================== 统计配置 ====================
+    # 数值指标的不同取值不超过该数量时分位数为精确值，超过后使用分位数草图
+    STATS_EXACT_MAX_VALUES = 4096
+    # 分位数草图的相对误差
+    STATS_SKETCH_RELATIVE_ACCURACY = 0.01
+
+    # ==================== 接口缓存配置 ====================
+    # 统计接口返回ETag，数据未变化时条件请求返回304，响应内容缓存在服务端
+    API_CACHE_ENABLED = True
+    # 服务端缓存的过期时间（秒）
+    API_CACHE_TIMEOUT = 300
+
+    # ==================== 筛选配置 ====================
+    # 每个数据版本缓存的筛选掩码（及按筛选条件计算的结果）数量
+    FILTER_MASK_CACHE_SIZE = 64
+
+    # ==================== 报告预计算配置 ====================
+    # 仪表盘读取后台生成的报告快照（关闭时在请求中生成）
+    REPORT_REFRESH_ENABLED = True
+    # 后台检查数据版本的间隔（秒）
+    REPORT_REFRESH_INTERVAL = 30
+    # 报告快照文件（原子替换，多进程共享）
+    REPORT_SNAPSHOT_PATH = BASE_DIR / 'data' / 'aggregates' / 'report_snapshot.json'
+
+    # ==================== 报告并行配置 ====================
+    # 完整报告的各部分在线程池中并行计算（关闭时依次计算）
+    REPORT_PARALLEL_ENABLED = True
+    # 线程数，None表示每个部分一个线程
+    REPORT_MAX_WORKERS = None
+    # 各部分的超时（秒，从报告开始计算），超时的部分返回默认值并记录在 errors 中，None表示不限
+    REPORT_SECTION_TIMEOUT = 30
+    # 在进程池中计算的部分（CPU密集、只依赖数据帧），可选:
+    # 'user_ip_distribution', 'fans_distribution', 'video_statistics', 'publish_time_distribution'
+    REPORT_PROCESS_SECTIONS = []
+    # 进程数，None表示CPU核数
+    REPORT_PROCESS_WORKERS = None
+
+    # ==================== 情感分析配置 ====================
+    # SnowNLP得分按 (规范化文本哈希, 模型版本) 缓存到SQLite，多进程共享，重复分析只查询缓存
+    SENTIMENT_CACHE_ENABLED = True
+    SENTIMENT_CACHE_PATH = BASE_DIR / 'data' / 'cache' / 'sentiment_cache.sqlite3'
+    # 模型版本，None表示使用SnowNLP情感模型文件的哈希（更换模型后旧得分自动失效）
+    SENTIMENT_MODEL_VERSION = None
+    # 批量打分的进程数，None表示CPU核数
+    SENTIMENT_WORKERS = None
+    # 文本数少于该值时在当前进程中打分（启动进程池、分发文本的开销大于收益）
+    SENTIMENT_PARALLEL_MIN_TEXTS = 2000
+    # 情感打分引擎: 'snownlp'（逐条调用SnowNLP）/ 'vector'（SnowNLP模型导出为数组后批量分词、批量打分，结果一致）
+    SENTIMENT_ENGINE = 'snownlp'
+    # 向量化引擎导出的模型数组（SnowNLP模型文件变化时重新导出）
+    SENTIMENT_VECTOR_MODEL_PATH = BASE_DIR / 'data' / 'cache' / 'sentiment_vector.npz'
+    # 向量化引擎每批的文本数
+    SENTIMENT_VECTOR_BATCH = 50000
+    # 数据库评论情感回填：每批读取、打分的评论数，每条 bulk_update 语句更新的行数
+    SENTIMENT_BACKFILL_BATCH = 2000
+    SENTIMENT_BULK_UPDATE_BATCH = 500
+    # 增量情感分析：记录已分析到的位置（CSV字节偏移 / 最大评论主键），只为新增的评论打分，统计结果原地累加
+    # 打分由爬虫批次之后运行的 python -m data.sentiment_pipeline / python manage.py refresh_sentiment 完成，
+    # 情感接口只读取统计结果（还没有生成过时实时分析）
+    SENTIMENT_PIPELINE_ENABLED = True
+    SENTIMENT_PIPELINE_PATH = BASE_DIR / 'data' / 'aggregates' / 'sentiment_pipeline.json'
+
+    # ==================== 执行引擎配置 ====================
+    # 分析执行引擎: 'pandas'（单进程）/ 'dask'（按分区并行，需要 dask[dataframe]，未安装时回退为pandas）
+    # 开启预计算聚合时仪表盘统计读取聚合表，Dask模式用于关闭聚合表时的全量计算和流式评论分析
+    ANALYSIS_ENGINE = 'pandas'
+    # Dask读取的分区（glob，如 'data/partitions/comment-*.parquet'），None表示读取上面的CSV文件
+    # CSV分区为爬虫原始格式，Parquet分区为标准化后的数据（可由 data.dask_engine.write_partitions 生成）
+    DASK_VIDEO_INPUT = None
+    DASK_COMMENT_INPUT = None
+    # CSV分区的大小（字节数或如 '64MB'），None表示每个文件按并行数均分；只在引号外的换行处切分，评论内容含换行时行不会被拆开
+    DASK_CSV_BLOCKSIZE = None
+    # 调度器: 'processes'（多进程，使用多个CPU核）/ 'threads'
+    DASK_SCHEDULER = 'processes'
+    # 并行数，None表示CPU核数
+    DASK_WORKERS = None
+
     @classmethod
     def get_database_url(cls):
         """获取数据库连接URL"""
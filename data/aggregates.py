@@ -0,0 +1,510 @@
+"""
+预计算聚合模块 - 仪表盘统计从预计算的聚合表读取，数据追加时只聚合新增的行
+
+data_analysis.py 的 user_ip_Count、like_collect_ratio、fans_Count、fans_rank、comment_share
+每次全量重算后整表替换，而网页接口又各自在pandas中重新计算。这里把这些统计（以及发布时间分布、
+数值统计）保存为可合并的中间结果：
+    - 计数类（IP分布、粉丝区间、发布小时、总数）：按键累加；
+    - 排行类（点赞排行、评论分享排行）：只保留前 MATERIALIZED_TOP_N 条，新行与已有前N条合并后重新截取；
+    - 粉丝排行：每个用户名只保留第一次出现时的粉丝数，与 drop_duplicates 一致；
+    - 数值统计：计数、合计、最大、最小以及分位数（data.stats_sketch.MetricStats，保存精确的取值计数，
+      结果与关闭预计算时 exact_result() 的精确值一致）。
+
+数据源的读取位置记为游标：CSV后端为已读取的字节偏移（文件被改写时全量重建），
+数据库后端为已聚合的最大主键。视频数据在数据库中会被 update_or_create 原地更新，
+导入视频后调用 invalidate('video') 重建视频部分，同时改写数据变化标记（接口ETag、报告快照随之更新）。
+
+聚合结果保存在 MATERIALIZED_AGGREGATES_DIR 下的JSON文件中，进程重启或多个worker之间直接复用。
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from data.dataset import (VIDEO_CSV_PATH, COMMENT_CSV_PATH, bump_data_change_token, complete_rows_end,
+                          file_fingerprint, iter_csv_range, read_csv_from)
+from data.normalize import normalize_video_data, normalize_comment_data
+from data.stats_sketch import MetricStats
+from data.report import (FANS_BINS, FANS_LABELS, NUMERIC_COLUMNS, TOP_VIDEO_COLUMNS, compute_like_collect_relation,
+                         compute_top_users)
+
+logger = logging.getLogger(__name__)
+
+# 聚合文件格式版本，结构变化时递增，旧文件自动重建
+FORMAT_VERSION = 3
+
+# 点赞排行保存的列（热门视频 + 点赞收藏关系）
+TOP_LIKED_COLUMNS = TOP_VIDEO_COLUMNS
+# 评论分享排行保存的列
+COMMENT_SHARE_COLUMNS = ['aweme_id', 'description', 'comment_count', 'share_count']
+
+
+def _records(df: pd.DataFrame, columns: List[str]) -> List[Dict]:
+    """DataFrame -> 可JSON序列化的记录列表（缺失值为None）"""
+    columns = [col for col in columns if col in df.columns]
+    values = df[columns].astype(object)
+    return values.where(values.notna(), None).to_dict('records')
+
+
+def _merge_top(top: List[Dict], df: pd.DataFrame, column: str, columns: List[str], limit: int) -> List[Dict]:
+    """
+    已有前N条与新行合并后按列降序重新截取前N条
+    已有行都在新行之前，稳定排序后并列的行保持原来的先后顺序，结果与全量稳定排序一致
+    :param top: 已有前N条
+    :param df: 新增的行
+    :param column: 排序列
+    :param columns: 保存的列
+    :param limit: 保存条数
+    :return: 新的前N条
+    """
+    if df.empty or column not in df.columns:
+        return top
+    candidates = df.sort_values(column, ascending=False, kind='stable').head(limit)
+    merged = pd.concat([pd.DataFrame.from_records(top, columns=columns),
+                        pd.DataFrame(_records(candidates, columns), columns=columns)], ignore_index=True)
+    merged = merged.sort_values(column, ascending=False, kind='stable').head(limit)
+    return merged.astype(object).where(merged.notna(), None).to_dict('records')
+
+
+class VideoAggregates:
+    """视频数据的聚合表"""
+
+    def __init__(self):
+        self.rows = 0
+        self.fans_ranges = [0] * len(FANS_LABELS)
+        self.publish_hours = [0] * 24
+        self.numeric = {col: MetricStats(exact_only=True) for col in NUMERIC_COLUMNS}
+        self.top_liked: List[Dict] = []
+        self.comment_share: List[Dict] = []
+        # [用户名, 粉丝数]，按第一次出现的顺序
+        self.users: List[List] = []
+        self._user_names = set()
+
+    def update(self, df: pd.DataFrame):
+        """
+        聚合新增的视频数据
+        :param df: 标准化后的视频数据
+        """
+        if df.empty:
+            return
+        self.rows += len(df)
+        top_n = Config.MATERIALIZED_TOP_N
+
+        if 'fans_count' in df.columns:
+            fans_range = pd.cut(df['fans_count'], bins=FANS_BINS, labels=FANS_LABELS)
+            counts = fans_range.value_counts(sort=False)
+            for i, label in enumerate(FANS_LABELS):
+                self.fans_ranges[i] += int(counts[label])
+
+        if 'publish_time' in df.columns:
+            hours = df['publish_time'].dt.hour.dropna().to_numpy(dtype='int64')
+            for hour, count in enumerate(np.bincount(hours, minlength=24).tolist()):
+                self.publish_hours[hour] += count
+
+        for col, summary in self.numeric.items():
+            if col in df.columns:
+                summary.update(df[col])
+
+        self.top_liked = _merge_top(self.top_liked, df, 'like_count', TOP_LIKED_COLUMNS, top_n)
+        self.comment_share = _merge_top(self.comment_share, df, 'comment_count', COMMENT_SHARE_COLUMNS, top_n)
+
+        if 'user_name' in df.columns and 'fans_count' in df.columns:
+            first = df[['user_name', 'fans_count']].drop_duplicates('user_name')
+            for record in _records(first, ['user_name', 'fans_count']):
+                if record['user_name'] not in self._user_names:
+                    self._user_names.add(record['user_name'])
+                    self.users.append([record['user_name'], record['fans_count']])
+
+    def merge(self, other: 'VideoAggregates'):
+        """
+        合并另一个分区的聚合表（other 的行在本分区之后），结果与按顺序 update 两个分区一致
+        :param other: VideoAggregates
+        """
+        if other.rows == 0:
+            return
+        self.rows += other.rows
+        self.fans_ranges = [a + b for a, b in zip(self.fans_ranges, other.fans_ranges)]
+        self.publish_hours = [a + b for a, b in zip(self.publish_hours, other.publish_hours)]
+        for col, summary in other.numeric.items():
+            self.numeric[col].merge(summary)
+
+        top_n = Config.MATERIALIZED_TOP_N
+        top_liked = pd.DataFrame.from_records(other.top_liked, columns=TOP_LIKED_COLUMNS)
+        comment_share = pd.DataFrame.from_records(other.comment_share, columns=COMMENT_SHARE_COLUMNS)
+        self.top_liked = _merge_top(self.top_liked, top_liked, 'like_count', TOP_LIKED_COLUMNS, top_n)
+        self.comment_share = _merge_top(self.comment_share, comment_share, 'comment_count', COMMENT_SHARE_COLUMNS, top_n)
+        for user_name, fans_count in other.users:
+            if user_name not in self._user_names:
+                self._user_names.add(user_name)
+                self.users.append([user_name, fans_count])
+
+    def to_dict(self) -> Dict:
+        return {
+            'rows': self.rows,
+            'fans_ranges': self.fans_ranges,
+            'publish_hours': self.publish_hours,
+            'numeric': {col: summary.to_dict() for col, summary in self.numeric.items()},
+            'top_liked': self.top_liked,
+            'comment_share': self.comment_share,
+            'users': self.users,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'VideoAggregates':
+        aggregates = cls()
+        aggregates.rows = data['rows']
+        aggregates.fans_ranges = data['fans_ranges']
+        aggregates.publish_hours = data['publish_hours']
+        aggregates.numeric = {col: MetricStats.from_dict(summary) for col, summary in data['numeric'].items()}
+        aggregates.top_liked = data['top_liked']
+        aggregates.comment_share = data['comment_share']
+        aggregates.users = data['users']
+        aggregates._user_names = {user_name for user_name, _ in aggregates.users}
+        return aggregates
+
+
+class CommentAggregates:
+    """评论数据的聚合表"""
+
+    def __init__(self):
+        self.rows = 0
+        self.ip_counts: Dict[str, int] = {}
+
+    def update(self, df: pd.DataFrame):
+        """
+        聚合新增的评论数据
+        :param df: 标准化后的评论数据（至少包含user_ip列）
+        """
+        if df.empty:
+            return
+        self.rows += len(df)
+        if 'user_ip' in df.columns:
+            counts = df['user_ip'].value_counts()
+            for ip, count in counts[counts > 0].items():
+                self.ip_counts[str(ip)] = self.ip_counts.get(str(ip), 0) + int(count)
+
+    def merge(self, other: 'CommentAggregates'):
+        """
+        合并另一个分区的聚合表
+        :param other: CommentAggregates
+        """
+        self.rows += other.rows
+        for ip, count in other.ip_counts.items():
+            self.ip_counts[ip] = self.ip_counts.get(ip, 0) + count
+
+    def to_dict(self) -> Dict:
+        return {'rows': self.rows, 'ip_counts': self.ip_counts}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CommentAggregates':
+        aggregates = cls()
+        aggregates.rows = data['rows']
+        aggregates.ip_counts = data['ip_counts']
+        return aggregates
+
+
+def _csv_rewritten(path: str, cursor: Optional[Dict], size: int) -> bool:
+    """
+    CSV在游标之前的内容是否变化（不是只追加写入），变化时需要从头读取
+    :param path: CSV文件路径
+    :param cursor: 上次的游标，None表示从头读取
+    :param size: 当前文件大小
+    :return: 是否需要从头读取
+    """
+    return cursor is None or cursor['offset'] > size \
+        or file_fingerprint(path, cursor['offset']) != cursor['fingerprint']
+
+
+def read_csv_delta(path: str, normalizer, cursor: Optional[Dict]) -> Tuple[Optional[pd.DataFrame], Optional[Dict], bool]:
+    """
+    读取CSV在游标之后追加的行
+    :param path: CSV文件路径
+    :param normalizer: 标准化函数
+    :param cursor: {'signature', 'offset', 'fingerprint', 'columns'}，None表示从头读取
+    :return: (新增的行（无新增时为None）, 新游标, 是否需要重建)
+    """
+    if not os.path.exists(path):
+        return None, None, cursor is not None
+    stat = os.stat(path)
+    signature = [stat.st_mtime_ns, stat.st_size]
+    if cursor is not None and cursor['signature'] == signature:
+        return None, cursor, False
+
+    # 只追加写入时从上次的位置继续读，否则从头读取
+    reset = _csv_rewritten(path, cursor, stat.st_size)
+    if reset:
+        chunk = read_csv_from(path)
+    else:
+        chunk = read_csv_from(path, cursor['offset'], cursor['columns'])
+
+    new_cursor = {
+        'signature': signature,
+        'offset': chunk.offset,
+        'fingerprint': file_fingerprint(path, chunk.offset),
+        'columns': chunk.columns,
+    }
+    df = normalizer(chunk.frame) if not chunk.frame.empty else None
+    return df, new_cursor, reset
+
+
+def iter_csv_delta(path: str, normalizer, cursor: Optional[Dict], usecols: Optional[List[str]] = None,
+                   chunk_rows: int = 10000) -> Tuple[Optional[Iterator[pd.DataFrame]], Optional[Dict], bool]:
+    """
+    按块读取CSV在游标之后追加的行（全量重建时内存占用也只与块大小有关），游标与 read_csv_delta 通用
+    :param path: CSV文件路径
+    :param normalizer: 标准化函数
+    :param cursor: {'signature', 'offset', 'fingerprint', 'columns'}，None表示从头读取
+    :param usecols: 只读取的原始列，None表示全部
+    :param chunk_rows: 每块行数
+    :return: (标准化后的新增行生成器（无新增时为None）, 读完后的新游标, 是否需要重建)
+             生成器在行写到一半时抛出 pd.errors.ParserError，此时不应使用新游标
+    """
+    if not os.path.exists(path):
+        return None, None, cursor is not None
+    stat = os.stat(path)
+    signature = [stat.st_mtime_ns, stat.st_size]
+    if cursor is not None and cursor['signature'] == signature:
+        return None, cursor, False
+
+    # 只追加写入时从上次的位置继续读，否则从头读取
+    reset = _csv_rewritten(path, cursor, stat.st_size)
+    offset = 0 if reset else cursor['offset']
+    if reset:
+        try:
+            columns = list(pd.read_csv(path, encoding='utf-8', nrows=0).columns)
+        except pd.errors.EmptyDataError:
+            return None, None, True
+    else:
+        columns = cursor['columns']
+    end = complete_rows_end(path, offset)
+
+    new_cursor = {
+        'signature': signature,
+        'offset': end,
+        'fingerprint': file_fingerprint(path, end),
+        'columns': columns,
+    }
+    if end <= offset:
+        return None, new_cursor, reset
+    chunks = (normalizer(chunk) for chunk in iter_csv_range(path, offset, end, columns if offset > 0 else None,
+                                                            usecols, chunk_rows))
+    return chunks, new_cursor, reset
+
+
+def read_orm_delta(source: str, cursor: Optional[Dict]) -> Tuple[Optional[pd.DataFrame], Optional[Dict], bool]:
+    """
+    读取数据库中主键大于游标的行
+    视频表会被原地更新，游标失效（invalidate）后全量读取
+    :param source: 'video' / 'comment'
+    :param cursor: {'max_id'}，None表示全量读取
+    :return: (新增的行（无新增时为None）, 新游标, 是否需要重建)
+    """
+    from django.db.models import Max
+    from video.models import VideoData, CommentData
+
+    model = VideoData if source == 'video' else CommentData
+    max_id = model.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+    last_id = cursor['max_id'] if cursor is not None else 0
+    reset = cursor is None or max_id < last_id
+    if reset:
+        last_id = 0
+    elif max_id == last_id:
+        return None, cursor, False
+
+    queryset = model.objects.filter(id__gt=last_id, id__lte=max_id)
+    if source == 'video':
+        from data.repository import get_repository
+        if reset:
+            df = get_repository('orm').videos()
+        else:
+            ids = list(queryset.values_list('awemeId', flat=True))
+            df = get_repository('orm').videos(filters={'aweme_id__in': ids}) if ids else None
+    else:
+        df = pd.DataFrame({'user_ip': list(queryset.values_list('userIP', flat=True))})
+    return df, {'max_id': max_id}, reset
+
+
+class MaterializedAggregates:
+    """
+    预计算聚合表
+
+    refresh() 读取数据源新增的行并合并到聚合表，有变化时写入JSON文件；
+    section() 返回与 DataAnalyzer 各方法格式一致的统计结果。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._file_signature = None
+        self.backend = None
+        self.video = VideoAggregates()
+        self.comment = CommentAggregates()
+        self.cursors: Dict[str, Optional[Dict]] = {'video': None, 'comment': None}
+        self.updated_at = None
+
+    def _path(self) -> str:
+        return self.path or os.path.join(str(Config.MATERIALIZED_AGGREGATES_DIR), 'aggregates.json')
+
+    def _load(self):
+        """其他进程更新了聚合文件时重新读取"""
+        path = self._path()
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._file_signature:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') != FORMAT_VERSION:
+                return
+            self.backend = data['backend']
+            self.video = VideoAggregates.from_dict(data['video'])
+            self.comment = CommentAggregates.from_dict(data['comment'])
+            self.cursors = data['cursors']
+            self.updated_at = data['updated_at']
+            self._file_signature = signature
+        except Exception as e:
+            logger.error(f"读取聚合文件失败: {e}")
+
+    def _save(self):
+        """原子替换聚合文件"""
+        path = self._path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = {
+            'format': FORMAT_VERSION,
+            'backend': self.backend,
+            'video': self.video.to_dict(),
+            'comment': self.comment.to_dict(),
+            'cursors': self.cursors,
+            'updated_at': self.updated_at,
+        }
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        stat = os.stat(path)
+        self._file_signature = (stat.st_mtime_ns, stat.st_size)
+
+    def _read_delta(self, source: str):
+        if self.backend == 'orm':
+            return read_orm_delta(source, self.cursors[source])
+        if source == 'video':
+            return read_csv_delta(VIDEO_CSV_PATH, normalize_video_data, self.cursors[source])
+        return read_csv_delta(COMMENT_CSV_PATH, normalize_comment_data, self.cursors[source])
+
+    def refresh(self) -> bool:
+        """
+        合并数据源新增的行
+        :return: 聚合表是否有变化
+        """
+        with self._lock:
+            self._load()
+            if self.backend != Config.DATASET_BACKEND:
+                self.backend = Config.DATASET_BACKEND
+                self.cursors = {'video': None, 'comment': None}
+
+            changed = False
+            for source in ('video', 'comment'):
+                df, cursor, reset = self._read_delta(source)
+                if reset:
+                    setattr(self, source, VideoAggregates() if source == 'video' else CommentAggregates())
+                if df is not None:
+                    getattr(self, source).update(df)
+                    logger.info(f"聚合表{'重建' if reset else '增量更新'}: {source}, 新增 {len(df)} 条")
+                changed = changed or reset or cursor != self.cursors[source]
+                self.cursors[source] = cursor
+
+            if changed:
+                self.updated_at = time.strftime('%Y-%m-%d %H:%M:%S')
+                self._save()
+            return changed
+
+    def invalidate(self, source: Optional[str] = None):
+        """
+        下次刷新时全量重建
+        :param source: 'video' / 'comment'，None表示全部
+        """
+        with self._lock:
+            self._load()
+            for name in ([source] if source else ['video', 'comment']):
+                self.cursors[name] = None
+            if os.path.exists(self._path()):
+                self._save()
+        # 数据被原地更新，接口缓存和报告快照随之失效
+        bump_data_change_token()
+
+    def section(self, name: str, limit: int = 10, refresh: bool = True):
+        """
+        读取一项统计
+        :param name: 报告部分名称，见 data.report.REPORT_SECTIONS，另有 'comment_share'
+        :param limit: 排行数量
+        :param refresh: 是否先合并新增的行
+        :return: 统计结果，排行数量超过预先保存的条数时返回None
+        """
+        with self._lock:
+            if refresh:
+                self.refresh()
+            return self._section(name, limit)
+
+    def _section(self, name: str, limit: int):
+        video = self.video
+
+        if name == 'general_statistics':
+            return {'total_videos': video.rows, 'total_comments': self.comment.rows}
+
+        if name == 'user_ip_distribution':
+            counts = pd.Series(self.comment.ip_counts, dtype='int64').sort_index()
+            counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+            return {k: int(v) for k, v in counts.head(10).items()}
+
+        if name in ('top_users', 'top_videos', 'like_collect_relation', 'comment_share'):
+            if name == 'top_users':
+                if video.rows == 0:
+                    return []
+                return compute_top_users(pd.DataFrame(video.users, columns=['user_name', 'fans_count']), limit)
+            top = video.comment_share if name == 'comment_share' else video.top_liked
+            if limit > len(top) and len(top) >= Config.MATERIALIZED_TOP_N:
+                return None
+            if name == 'like_collect_relation':
+                return compute_like_collect_relation(pd.DataFrame.from_records(top[:limit], columns=TOP_LIKED_COLUMNS))
+            return top[:limit]
+
+        if video.rows == 0:
+            return {}
+
+        if name == 'fans_distribution':
+            return pd.Series(video.fans_ranges, index=FANS_LABELS).sort_values(ascending=False).to_dict()
+
+        if name == 'video_statistics':
+            return {col: summary.result() for col, summary in video.numeric.items() if summary.count > 0}
+
+        if name == 'publish_time_distribution':
+            return {str(hour): count for hour, count in enumerate(video.publish_hours) if count > 0}
+
+        raise ValueError(f"未知的聚合表: {name}")
+
+
+# 全局聚合表
+materialized_aggregates = MaterializedAggregates()
+
+
+if __name__ == '__main__':
+    # 刷新聚合表并输出: python -m data.aggregates
+    logging.basicConfig(level=logging.INFO)
+    from data.report import REPORT_SECTIONS
+
+    start = time.perf_counter()
+    materialized_aggregates.refresh()
+    print(f"刷新耗时: {(time.perf_counter() - start) * 1000:.1f}ms")
+    for section in REPORT_SECTIONS + ['comment_share']:
+        print(section, materialized_aggregates.section(section))
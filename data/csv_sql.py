@@ -54,7 +54,8 @@ import pandas as pd
 import os
 import logging
 from video.models import VideoData, CommentData
-from datetime import datetime
+from data.normalize import CSV_DTYPES, normalize_video_data, normalize_comment_data
+from data.aggregates import materialized_aggregates
 
 logger = logging.getLogger(__name__)
 
@@ -63,51 +64,6 @@ VIDEO_CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data'
 COMMENT_CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'comment.csv')
 
 
-def parse_duration(duration_str):
-    """
-    解析视频时长字符串，转换为秒数
-    例如: "01:59" -> 119秒
-    """
-    try:
-        parts = duration_str.split(':')
-        if len(parts) == 2:
-            minutes = int(parts[0])
-            seconds = int(parts[1])
-            return minutes * 60 + seconds
-        elif len(parts) == 3:
-            hours = int(parts[0])
-            minutes = int(parts[1])
-            seconds = int(parts[2])
-            return hours * 3600 + minutes * 60 + seconds
-        return 0
-    except:
-        return 0
-
-
-def parse_publish_time(time_str):
-    """
-    解析发布时间字符串，转换为datetime对象
-    例如: "2025-07-19 " -> datetime对象
-    """
-    try:
-        # 去除空格
-        time_str = time_str.strip()
-        if not time_str:
-            return None
-
-        # 尝试解析不同格式
-        for fmt in ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M']:
-            try:
-                return datetime.strptime(time_str, fmt)
-            except ValueError:
-                continue
-
-        return None
-    except Exception as e:
-        logger.warning(f"解析时间失败: {time_str}, 错误: {e}")
-        return None
-
-
 def import_video_data():
     """
     从CSV文件导入视频数据到数据库
@@ -121,37 +77,14 @@ def import_video_data():
         logger.info(f"开始导入视频数据: {VIDEO_CSV_PATH}")
 
         # 读取CSV文件
-        df = pd.read_csv(VIDEO_CSV_PATH, encoding='utf-8')
+        df = pd.read_csv(VIDEO_CSV_PATH, encoding='utf-8', dtype=CSV_DTYPES)
 
         logger.info(f"CSV文件共 {len(df)} 条数据")
 
-        # 列名映射
-        column_mapping = {
-            '用户名': 'user_name',
-            '粉丝数量': 'fans_count',
-            '视频描述': 'description',
-            '发布时间': 'publish_time',
-            '视频时长': 'duration',
-            '点赞数': 'like_count',
-            '收藏数': 'collect_count',
-            '评论数': 'comment_count',
-            '分享数': 'share_count',
-            '视频ID': 'aweme_id'
-        }
-
-        # 重命名列
-        df = df.rename(columns=column_mapping)
-
-        # 数据清洗和转换
-        df['publish_time'] = df['publish_time'].apply(parse_publish_time)
-        df['duration'] = df['duration'].apply(parse_duration)
-
-        # 填充缺失值
-        df['fans_count'] = df['fans_count'].fillna(0)
-        df['like_count'] = df['like_count'].fillna(0)
-        df['comment_count'] = df['comment_count'].fillna(0)
-        df['share_count'] = df['share_count'].fillna(0)
-        df['collect_count'] = df['collect_count'].fillna(0)
+        # 列名映射、数值转换、解析时长和发布时间
+        df = normalize_video_data(df)
+        # 无法解析的发布时间存为None
+        df['publish_time'] = df['publish_time'].astype(object).where(df['publish_time'].notna(), None)
 
         count = 0
         for _, row in df.iterrows():
@@ -181,6 +114,9 @@ def import_video_data():
                 logger.error(f"导入视频数据失败: {row['aweme_id']}, 错误: {e}")
                 continue
 
+        # 视频聚合表下次读取时重建
+        materialized_aggregates.invalidate('video')
+
         logger.info(f"视频数据导入完成，共导入 {count} 条记录")
         return count
 
@@ -202,29 +138,14 @@ def import_comment_data():
         logger.info(f"开始导入评论数据: {COMMENT_CSV_PATH}")
 
         # 读取CSV文件
-        df = pd.read_csv(COMMENT_CSV_PATH, encoding='utf-8')
+        df = pd.read_csv(COMMENT_CSV_PATH, encoding='utf-8', dtype=CSV_DTYPES)
 
         logger.info(f"CSV文件共 {len(df)} 条数据")
 
-        # 列名映射
-        column_mapping = {
-            '用户id': 'user_id',
-            '用户名': 'user_name',
-            '评论内容': 'content',
-            '评论时间': 'comment_time',
-            'IP地址': 'user_ip',
-            '点赞数': 'like_count',
-            '视频id': 'aweme_id'
-        }
-
-        # 重命名列
-        df = df.rename(columns=column_mapping)
-
-        # 数据清洗和转换
-        df['comment_time'] = df['comment_time'].apply(parse_publish_time)
-
-        # 填充缺失值
-        df['like_count'] = df['like_count'].fillna(0)
+        # 列名映射、数值转换、解析评论时间
+        df = normalize_comment_data(df)
+        # 无法解析的评论时间存为None
+        df['comment_time'] = df['comment_time'].astype(object).where(df['comment_time'].notna(), None)
 
         count = 0
         for _, row in df.iterrows():
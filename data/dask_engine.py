@@ -0,0 +1,419 @@
+"""
+Dask执行模式 - 分区的CSV / Parquet输入在多个CPU核上并行聚合
+
+开启 Config.ANALYSIS_ENGINE = 'dask' 后：
+    - DataAnalyzer 各统计方法和 ReportEngine（未开启预计算聚合时）一次并行扫描视频、评论的全部分区，
+      每个分区计算与预计算聚合表相同的可合并中间结果（data.aggregates），按分区顺序合并，
+      结果与pandas模式一致（排行中并列的行同样保持原来的先后顺序，数值统计的分位数为精确值）；
+    - 流式评论分析（data.streaming.run_comment_pipelines）的各聚合器按分区并行执行后合并。
+
+输入：
+    CSV分区为爬虫原始格式（中文列名），每个文件按 DASK_CSV_BLOCKSIZE 在行边界切分为多段，各段读取后标准化；
+    Parquet分区为标准化后的数据（英文列名），可由 write_partitions() 生成。
+聚合结果按输入文件的 (修改时间, 大小) 缓存，输入未变化时不重新计算。
+
+dask为可选依赖，未安装时记录警告并回退为pandas模式。
+"""
+
+import copy
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from data.aggregates import VideoAggregates, CommentAggregates, MaterializedAggregates
+from data.dataset import VIDEO_CSV_PATH, COMMENT_CSV_PATH, complete_rows_end, drop_header_rows
+from data.normalize import normalize_video_data, normalize_comment_data
+
+logger = logging.getLogger(__name__)
+
+# 已提示过未安装dask
+_warned = False
+
+# 聚合结果缓存：(输入签名, MaterializedAggregates)
+_cache: Optional[Tuple[Tuple, MaterializedAggregates]] = None
+_cache_lock = threading.Lock()
+
+# 查找CSV切分位置时每次读取的字节数
+CSV_SCAN_BYTES = 1 << 20
+
+
+def _import_dask():
+    """延迟导入dask，未安装时返回None"""
+    try:
+        import dask
+        import dask.dataframe  # noqa: F401
+        return dask
+    except ImportError:
+        return None
+
+
+def dask_enabled() -> bool:
+    """
+    是否使用Dask执行
+    :return: 配置为dask且已安装dask时返回True
+    """
+    global _warned
+    if Config.ANALYSIS_ENGINE != 'dask':
+        return False
+    if _import_dask() is None:
+        if not _warned:
+            logger.warning("未安装dask，使用pandas执行（pip install \"dask[dataframe]\"）")
+            _warned = True
+        return False
+    return True
+
+
+def input_paths(source: str) -> List[str]:
+    """
+    数据源的分区文件
+    :param source: 'video' / 'comment'
+    :return: 文件或Parquet目录列表（按名称排序，即合并顺序）
+    """
+    pattern = Config.DASK_VIDEO_INPUT if source == 'video' else Config.DASK_COMMENT_INPUT
+    if not pattern:
+        path = VIDEO_CSV_PATH if source == 'video' else COMMENT_CSV_PATH
+        return [path] if os.path.exists(path) else []
+    return sorted(glob.glob(str(pattern)))
+
+
+def _is_parquet(path: str) -> bool:
+    return os.path.isdir(path) or path.endswith('.parquet')
+
+
+def input_signature(paths: List[str]) -> Tuple:
+    """
+    输入文件签名，任一分区变化时改变
+    :param paths: 分区文件或目录
+    :return: ((路径, 修改时间ns, 大小), ...)
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '**', '*.parquet'), recursive=True)))
+        else:
+            files.append(path)
+    signature = []
+    for path in files:
+        stat = os.stat(path)
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def csv_ranges(path: str, blocksize: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    把CSV按约 blocksize 字节切分为若干段，只在引号外的换行处切分（评论内容中的换行不会把一行拆开）
+    :param path: CSV文件路径
+    :param blocksize: 每段字节数，None表示按并行数均分
+    :return: [(起始偏移, 结束偏移), ...]，第一段从表头开始，最后一段到最后一个完整行为止
+    """
+    end = complete_rows_end(path)
+    if blocksize is None:
+        blocksize = -(-end // (Config.DASK_WORKERS or os.cpu_count() or 1))
+    blocksize = max(1, blocksize)
+
+    boundaries = [0]
+    target = blocksize
+    quotes = 0
+    header = True
+    with open(path, 'rb') as f:
+        position = 0
+        while position < end and target < end:
+            block = np.frombuffer(f.read(min(CSV_SCAN_BYTES, end - position)), dtype=np.uint8)
+            # 换行之前的引号个数为偶数时在引号外
+            inside = (np.cumsum(block == ord('"')) + quotes) % 2 == 1
+            for index in np.flatnonzero((block == ord('\n')) & ~inside).tolist():
+                boundary = position + index + 1
+                if header:
+                    # 表头行不单独成为一段
+                    header = False
+                elif target <= boundary < end:
+                    boundaries.append(boundary)
+                    target = boundary + blocksize
+            quotes += int(np.count_nonzero(block == ord('"')))
+            position += len(block)
+    boundaries.append(end)
+    return [(start, stop) for start, stop in zip(boundaries, boundaries[1:]) if stop > start]
+
+
+def _read_csv_range(path: str, start: int, end: int, columns: List[str]) -> pd.DataFrame:
+    """
+    读取CSV的一段，全部按字符串读取，由标准化函数统一转换类型（各段推断的类型可能不一致）
+    :param path: CSV文件路径
+    :param start: 起始字节偏移，0表示从表头开始
+    :param end: 结束字节偏移
+    :param columns: 原始列名
+    :return: 原始DataFrame
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = BytesIO(f.read(end - start))
+    if start == 0:
+        return pd.read_csv(data, dtype=str, encoding='utf-8')
+    return pd.read_csv(data, dtype=str, encoding='utf-8', header=None, names=columns)
+
+
+def read_partitions(source: str, paths: Optional[List[str]] = None):
+    """
+    读取分区（不立即计算）
+    :param source: 'video' / 'comment'
+    :param paths: 分区文件，默认为 input_paths(source)
+    :return: (分区的delayed对象列表, 是否需要标准化)
+    """
+    import dask.dataframe as dd
+    from dask import delayed
+    from dask.utils import parse_bytes
+
+    paths = input_paths(source) if paths is None else paths
+    if not paths:
+        return [], False
+    if all(_is_parquet(path) for path in paths):
+        return list(dd.read_parquet(paths).to_delayed()), False
+
+    # 原始CSV按 DASK_CSV_BLOCKSIZE 切分（默认按并行数均分），单个CSV文件也在多个CPU核上并行读取、聚合
+    blocksize = Config.DASK_CSV_BLOCKSIZE
+    if isinstance(blocksize, str):
+        blocksize = parse_bytes(blocksize)
+    partitions = []
+    for path in paths:
+        try:
+            columns = list(pd.read_csv(path, encoding='utf-8', nrows=0).columns)
+        except pd.errors.EmptyDataError:
+            continue
+        partitions.extend(delayed(_read_csv_range)(path, start, end, columns)
+                          for start, end in csv_ranges(path, blocksize))
+    return partitions, True
+
+
+def _prepare(partition: pd.DataFrame, source: str, normalize: bool) -> pd.DataFrame:
+    """分区标准化（原始CSV分区）"""
+    if not normalize:
+        return partition
+    partition = drop_header_rows(partition)
+    return normalize_video_data(partition) if source == 'video' else normalize_comment_data(partition)
+
+
+def _aggregate_partition(partition: pd.DataFrame, source: str, normalize: bool):
+    """一个分区的聚合表"""
+    aggregates = VideoAggregates() if source == 'video' else CommentAggregates()
+    aggregates.update(_prepare(partition, source, normalize))
+    return aggregates
+
+
+def _compute(tasks: List):
+    """按配置的调度器并行计算"""
+    dask = _import_dask()
+    return dask.compute(*tasks, scheduler=Config.DASK_SCHEDULER, num_workers=Config.DASK_WORKERS)
+
+
+def compute_aggregates(use_cache: bool = True) -> Optional[MaterializedAggregates]:
+    """
+    一次并行扫描视频、评论的全部分区，得到与预计算聚合表结构相同的结果
+    :param use_cache: 输入未变化时直接返回上次的结果
+    :return: MaterializedAggregates（不写文件，读取时使用 section(name, limit, refresh=False)），
+             未启用或计算失败时返回None
+    """
+    global _cache
+    if not dask_enabled():
+        return None
+
+    from dask import delayed
+
+    try:
+        paths = {source: input_paths(source) for source in ('video', 'comment')}
+        signature = tuple(input_signature(paths[source]) for source in ('video', 'comment'))
+        with _cache_lock:
+            if use_cache and _cache is not None and _cache[0] == signature:
+                return _cache[1]
+
+        start = time.perf_counter()
+        tasks, counts = [], {}
+        for source in ('video', 'comment'):
+            partitions, normalize = read_partitions(source, paths[source])
+            counts[source] = len(partitions)
+            tasks.extend(delayed(_aggregate_partition)(partition, source, normalize) for partition in partitions)
+        partials = _compute(tasks)
+
+        result = MaterializedAggregates()
+        result.backend = 'dask'
+        for partial in partials[:counts['video']]:
+            result.video.merge(partial)
+        for partial in partials[counts['video']:]:
+            result.comment.merge(partial)
+        result.updated_at = time.strftime('%Y-%m-%d %H:%M:%S')
+
+        logger.info(f"Dask聚合完成: 视频 {counts['video']} 个分区, 评论 {counts['comment']} 个分区, "
+                    f"耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+        with _cache_lock:
+            _cache = (signature, result)
+        return result
+    except Exception as e:
+        logger.error(f"Dask聚合失败: {e}")
+        return None
+
+
+def _run_partition(partition: pd.DataFrame, aggregators: Dict, normalize: bool,
+                   aweme_ids: Optional[List[str]]) -> Dict:
+    """一个分区上执行各流式聚合器（使用聚合器的副本）"""
+    aggregators = copy.deepcopy(aggregators)
+    chunk = _prepare(partition, 'comment', normalize)
+    if aweme_ids is not None:
+        chunk = chunk[chunk['aweme_id'].isin(aweme_ids)]
+    if not chunk.empty:
+        for aggregator in aggregators.values():
+            aggregator.update(chunk)
+    return aggregators
+
+
+def run_comment_pipelines_dask(aggregators: Dict, path: str = COMMENT_CSV_PATH,
+                               aweme_ids: Optional[List[str]] = None) -> Optional[Dict[str, any]]:
+    """
+    各评论分区并行执行流式聚合器，按分区顺序合并
+    :param aggregators: {名称: 聚合器}（data.streaming.StreamingAggregator）
+    :param path: 评论CSV路径，为默认路径时读取 Config.DASK_COMMENT_INPUT 配置的分区
+    :param aweme_ids: 只统计这些视频的评论，None表示全部
+    :return: {名称: 分析结果}，计算失败时返回None
+    """
+    from dask import delayed
+
+    try:
+        paths = input_paths('comment') if path == COMMENT_CSV_PATH else [path]
+        partitions, normalize = read_partitions('comment', paths)
+        partials = _compute([delayed(_run_partition)(partition, aggregators, normalize, aweme_ids)
+                             for partition in partitions])
+        for partial in partials:
+            for name, aggregator in aggregators.items():
+                aggregator.merge(partial[name])
+        logger.info(f"Dask流式分析完成: {len(partials)} 个分区")
+        return {name: aggregator.result() for name, aggregator in aggregators.items()}
+    except Exception as e:
+        logger.error(f"Dask流式分析失败: {e}")
+        return None
+
+
+def write_partitions(df: pd.DataFrame, out_dir: str, prefix: str, copies: int = 1,
+                     partitions: Optional[int] = None, vary_columns: Optional[List[str]] = None) -> List[str]:
+    """
+    将标准化后的数据写为Parquet分区（可重复多份，用于放大数据量测试）
+    :param df: 标准化后的DataFrame
+    :param out_dir: 输出目录
+    :param prefix: 文件名前缀
+    :param copies: 重复份数
+    :param partitions: 分区数，None表示CPU核数的2倍
+    :param vary_columns: 第k份复制的这些数值列加上k，放大后的数据有新的不同取值（不只是重复已有取值）
+    :return: 分区文件列表
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    if copies > 1:
+        frames = []
+        for k in range(copies):
+            frame = df.copy() if vary_columns and k > 0 else df
+            for col in vary_columns or []:
+                if k > 0 and col in frame.columns:
+                    frame[col] = frame[col] + k
+            frames.append(frame)
+        data = pd.concat(frames, ignore_index=True)
+    else:
+        data = df
+    partitions = max(1, min(partitions or 2 * (os.cpu_count() or 1), len(data)))
+    rows_per_partition = -(-len(data) // partitions)
+    paths = []
+    for start in range(0, max(len(data), 1), rows_per_partition):
+        path = os.path.join(out_dir, f'{prefix}-{len(paths):05d}.parquet')
+        data.iloc[start:start + rows_per_partition].to_parquet(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def benchmark(scales: Tuple[int, ...] = (1, 10, 100), out_dir: Optional[str] = None) -> List[Dict[str, any]]:
+    """
+    pandas模式与Dask模式生成报告统计的耗时对比：当前数据重复 1x / 10x / 100x 写为Parquet分区
+    （每份复制的数值列加上复制序号，放大后的数据有新的不同取值）
+    pandas模式读取全部分区后在一个DataFrame上计算（与 ReportEngine 相同的 compute_* 函数），
+    Dask模式按分区并行聚合后合并，并检查两种模式的结果一致
+    :param scales: 数据放大倍数
+    :param out_dir: 分区输出目录，默认为临时目录
+    :return: [{'scale', 'videos', 'comments', 'pandas_ms', 'dask_ms', 'match'}]
+    """
+    import shutil
+    import tempfile
+
+    from data.dataset import load_video_data, load_comment_data
+    from data.report import (NUMERIC_COLUMNS, REPORT_SECTIONS, compute_ip_distribution, compute_like_collect_relation,
+                             compute_fans_distribution, compute_top_users, compute_video_statistics,
+                             compute_publish_time_distribution)
+
+    if _import_dask() is None:
+        raise RuntimeError("未安装dask")
+
+    videos = load_video_data()
+    comments = load_comment_data()
+    base_dir = out_dir or tempfile.mkdtemp(prefix='dask_benchmark_')
+    saved = (Config.ANALYSIS_ENGINE, Config.DASK_VIDEO_INPUT, Config.DASK_COMMENT_INPUT)
+    results = []
+    try:
+        for scale in scales:
+            scale_dir = os.path.join(base_dir, f'x{scale}')
+            video_paths = write_partitions(videos, scale_dir, 'video', scale, vary_columns=NUMERIC_COLUMNS)
+            comment_paths = write_partitions(comments, scale_dir, 'comment', scale)
+
+            start = time.perf_counter()
+            video_data = pd.concat([pd.read_parquet(path) for path in video_paths], ignore_index=True)
+            comment_data = pd.concat([pd.read_parquet(path, columns=['user_ip']) for path in comment_paths],
+                                     ignore_index=True)
+            top_liked = video_data.sort_values('like_count', ascending=False, kind='stable').head(10)
+            expected = {
+                'general_statistics': {'total_videos': len(video_data), 'total_comments': len(comment_data)},
+                'user_ip_distribution': compute_ip_distribution(comment_data, top_n=10),
+                'like_collect_relation': compute_like_collect_relation(top_liked),
+                'fans_distribution': compute_fans_distribution(video_data),
+                'top_users': compute_top_users(video_data, 10),
+                'top_videos': top_liked.to_dict('records'),
+                'video_statistics': compute_video_statistics(video_data),
+                'publish_time_distribution': compute_publish_time_distribution(video_data),
+            }
+            pandas_ms = (time.perf_counter() - start) * 1000
+            del video_data, comment_data
+
+            Config.ANALYSIS_ENGINE = 'dask'
+            Config.DASK_VIDEO_INPUT = os.path.join(scale_dir, 'video-*.parquet')
+            Config.DASK_COMMENT_INPUT = os.path.join(scale_dir, 'comment-*.parquet')
+            start = time.perf_counter()
+            aggregates = compute_aggregates(use_cache=False)
+            actual = {section: aggregates.section(section, 10, refresh=False) for section in REPORT_SECTIONS}
+            dask_ms = (time.perf_counter() - start) * 1000
+
+            match = all(_same(expected[section], actual[section], section) for section in REPORT_SECTIONS)
+            results.append({
+                'scale': scale,
+                'videos': len(videos) * scale,
+                'comments': len(comments) * scale,
+                'pandas_ms': round(pandas_ms, 1),
+                'dask_ms': round(dask_ms, 1),
+                'match': match,
+            })
+            shutil.rmtree(scale_dir, ignore_errors=True)
+    finally:
+        Config.ANALYSIS_ENGINE, Config.DASK_VIDEO_INPUT, Config.DASK_COMMENT_INPUT = saved
+        if out_dir is None:
+            shutil.rmtree(base_dir, ignore_errors=True)
+    return results
+
+
+def _same(expected, actual, section: str) -> bool:
+    """
+    比较两种模式的结果（热门视频只比较保存的列）
+    数值统计的分位数两边都是精确值（聚合表保存不限个数的取值计数），要求完全一致
+    """
+    if section == 'top_videos':
+        columns = list(actual[0].keys()) if actual else []
+        expected = [{col: row[col] for col in columns} for row in expected]
+    return json.dumps(expected, sort_keys=True, default=str) == json.dumps(actual, sort_keys=True, default=str)
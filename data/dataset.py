@@ -0,0 +1,936 @@
+"""
+数据集缓存模块 - 进程内共享的CSV数据加载与缓存
+
+所有分析接口统一通过 load_video_data() / load_comment_data() 获取数据，
+CSV文件只在首次访问或文件发生变化（修改时间、文件大小）时重新解析，
+爬虫追加写入时只解析新增的尾部。
+解析结果同时写入列式快照（Parquet/Feather），进程重启后直接读取快照并补读CSV新增部分。
+开启紧凑类型后，重复值多的列存为category，自由文本存为Arrow字符串，降低常驻内存。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from io import BufferedReader, BytesIO, RawIOBase
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from data.normalize import CSV_DTYPES, ids_to_str, normalize_video_data, normalize_comment_data
+
+logger = logging.getLogger(__name__)
+
+# CSV文件路径
+VIDEO_CSV_PATH = os.path.join(os.path.dirname(__file__), 'video_data.csv')
+COMMENT_CSV_PATH = os.path.join(os.path.dirname(__file__), 'comment.csv')
+
+# 快照中以int64存储的ID列
+SNAPSHOT_ID_COLUMNS = ['aweme_id', 'user_id']
+
+# 计算CSV指纹时采样的字节数
+FINGERPRINT_BYTES = 4096
+
+# 紧凑类型：重复值多的列存为category，自由文本存为Arrow字符串
+COMPACT_CATEGORY_COLUMNS = ['user_ip', 'aweme_id']
+COMPACT_STRING_COLUMNS = ['user_name', 'content', 'description']
+
+# 快照文件扩展名
+SNAPSHOT_EXTENSIONS = {
+    'parquet': '.parquet',
+    'feather': '.feather',
+    'pickle': '.pkl',
+}
+
+
+def _freeze(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    将DataFrame的底层数组设为只读，防止调用方原地修改缓存数据
+    :param df: DataFrame
+    :return: 只读DataFrame
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+            columns[col] = series.array
+            continue
+        values = series.to_numpy()
+        values.flags.writeable = False
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def _has_pyarrow() -> bool:
+    """检查是否安装了pyarrow"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def memory_usage_mb(df: pd.DataFrame) -> float:
+    """
+    计算DataFrame占用的内存（包含字符串对象本身）
+    :param df: DataFrame
+    :return: MB
+    """
+    return round(float(df.memory_usage(deep=True).sum()) / 1024 / 1024, 2)
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    转换为紧凑类型：COMPACT_CATEGORY_COLUMNS 转为category，COMPACT_STRING_COLUMNS 转为Arrow字符串
+    （未安装pyarrow时保持原类型）
+    :param df: 标准化后的DataFrame
+    :return: 紧凑类型的DataFrame
+    """
+    string_dtype = 'string[pyarrow]' if _has_pyarrow() else None
+    for col in COMPACT_CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    if string_dtype is not None:
+        for col in COMPACT_STRING_COLUMNS:
+            if col in df.columns and not isinstance(df[col].dtype, pd.StringDtype):
+                df[col] = df[col].astype(string_dtype)
+    return df
+
+
+def expand_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    紧凑类型还原为object列（写快照时使用，快照始终保存标准类型）
+    :param df: DataFrame
+    :return: DataFrame
+    """
+    for col in COMPACT_CATEGORY_COLUMNS + COMPACT_STRING_COLUMNS:
+        if col in df.columns and df[col].dtype != object:
+            values = df[col].astype(object)
+            df[col] = values.where(values.notna(), None)
+    return df
+
+
+def concat_frames(head: pd.DataFrame, tail: pd.DataFrame) -> pd.DataFrame:
+    """
+    拼接缓存数据和新增数据，category列合并类别（新类别追加在末尾，原有编码不变），
+    保证拼接后仍为category
+    :param head: 缓存数据
+    :param tail: 新增数据
+    :return: 拼接后的DataFrame
+    """
+    head = head.copy(deep=False)
+    tail = tail.copy(deep=False)
+    for col in head.columns:
+        if col not in tail.columns or not isinstance(head[col].dtype, pd.CategoricalDtype):
+            continue
+        categories = head[col].cat.categories
+        new_categories = pd.Index(tail[col].dropna().unique()).difference(categories)
+        if len(new_categories) > 0:
+            categories = categories.append(new_categories)
+            head[col] = head[col].cat.add_categories(new_categories)
+        tail[col] = pd.Categorical(tail[col], categories=categories)
+    return pd.concat([head, tail], ignore_index=True)
+
+
+def get_snapshot_format() -> str:
+    """
+    获取实际使用的快照格式
+    :return: 'parquet' / 'feather' / 'pickle'
+    """
+    fmt = Config.DATASET_SNAPSHOT_FORMAT
+    if fmt not in SNAPSHOT_EXTENSIONS:
+        raise ValueError(f"不支持的快照格式: {fmt}")
+    if fmt in ('parquet', 'feather') and not _has_pyarrow():
+        logger.warning(f"未安装pyarrow，快照格式由 {fmt} 回退为 pickle")
+        return 'pickle'
+    return fmt
+
+
+def get_snapshot_path(csv_path: str, fmt: Optional[str] = None) -> str:
+    """
+    获取CSV对应的快照文件路径
+    :param csv_path: CSV文件路径
+    :param fmt: 快照格式，默认使用配置
+    :return: 快照文件路径
+    """
+    fmt = fmt or get_snapshot_format()
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(str(Config.DATASET_SNAPSHOT_DIR), name + SNAPSHOT_EXTENSIONS[fmt])
+
+
+def encode_snapshot_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    标准化DataFrame -> 快照DataFrame：紧凑类型还原，ID列转为int64（可空）
+    :param df: 标准化后的DataFrame
+    :return: 快照DataFrame
+    """
+    df = expand_frame(df.copy(deep=False))
+    for col in SNAPSHOT_ID_COLUMNS:
+        if col in df.columns:
+            values = df[col] if pd.api.types.is_numeric_dtype(df[col]) else df[col].astype(str).str.strip()
+            df[col] = pd.to_numeric(values, errors='coerce', dtype_backend='numpy_nullable')
+    return df.reset_index(drop=True)
+
+
+def decode_snapshot_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    快照DataFrame -> 标准化DataFrame：aweme_id还原为字符串
+    :param df: 快照DataFrame
+    :return: 标准化后的DataFrame
+    """
+    if 'aweme_id' in df.columns:
+        df['aweme_id'] = ids_to_str(df['aweme_id'])
+    return df
+
+
+def write_snapshot(df: pd.DataFrame, snapshot_path: str, fmt: str, meta: Optional[Dict] = None):
+    """
+    写入快照文件（先写临时文件再原子替换）
+    :param df: 标准化后的DataFrame
+    :param snapshot_path: 快照文件路径
+    :param fmt: 快照格式
+    :param meta: 快照对应的CSV读取位置（offset、fingerprint、columns）
+    """
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    frame = encode_snapshot_frame(df)
+    if fmt == 'parquet':
+        frame.to_parquet(tmp_path, index=False)
+    elif fmt == 'feather':
+        frame.to_feather(tmp_path)
+    else:
+        frame.to_pickle(tmp_path)
+    os.replace(tmp_path, snapshot_path)
+
+    if meta is not None:
+        meta = dict(meta, rows=len(df))
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, snapshot_path + '.json')
+
+
+def read_snapshot(snapshot_path: str, fmt: str) -> pd.DataFrame:
+    """
+    读取快照文件
+    :param snapshot_path: 快照文件路径
+    :param fmt: 快照格式
+    :return: 标准化后的DataFrame
+    """
+    if fmt == 'parquet':
+        frame = pd.read_parquet(snapshot_path)
+    elif fmt == 'feather':
+        frame = pd.read_feather(snapshot_path)
+    else:
+        frame = pd.read_pickle(snapshot_path)
+    return decode_snapshot_frame(frame)
+
+
+def read_snapshot_meta(snapshot_path: str) -> Optional[Dict]:
+    """
+    读取快照元数据
+    :param snapshot_path: 快照文件路径
+    :return: 元数据字典，不存在时返回None
+    """
+    try:
+        with open(snapshot_path + '.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def file_fingerprint(path: str, offset: int) -> str:
+    """
+    计算文件在offset之前内容的指纹（文件头 + offset前一段字节）
+    用于判断CSV是追加写入还是被改写
+    :param path: 文件路径
+    :param offset: 已读取的字节偏移
+    :return: 指纹
+    """
+    with open(path, 'rb') as f:
+        head = f.read(min(offset, FINGERPRINT_BYTES))
+        f.seek(max(0, offset - FINGERPRINT_BYTES))
+        tail = f.read(min(offset, FINGERPRINT_BYTES))
+    return hashlib.sha1(head + tail).hexdigest()
+
+
+def _parse_csv_bytes(data: bytes, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    解析CSV字节内容，去掉爬虫追加写入时重复写入的表头行
+    :param data: CSV字节内容
+    :param columns: 原始列名，None表示data以表头开始
+    :return: 原始DataFrame
+    """
+    if columns is None:
+        df = pd.read_csv(BytesIO(data), encoding='utf-8', dtype=CSV_DTYPES)
+    else:
+        df = pd.read_csv(BytesIO(data), encoding='utf-8', dtype=CSV_DTYPES, header=None, names=columns)
+
+    return drop_header_rows(df)
+
+
+def drop_header_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    去掉爬虫每次运行时重复追加的表头行
+    :param df: 原始DataFrame
+    :return: DataFrame
+    """
+    if not df.empty:
+        first = df.columns[0]
+        header_rows = df[first] == first
+        if header_rows.any():
+            df = df[~header_rows].reset_index(drop=True)
+    return df
+
+
+class CsvChunk:
+    """从CSV读取的一段完整行"""
+
+    def __init__(self, frame: pd.DataFrame, columns: List[str], offset: int):
+        # 原始（未标准化）数据
+        self.frame = frame
+        # 原始列名
+        self.columns = columns
+        # 读取结束位置（最后一个换行符之后）
+        self.offset = offset
+
+
+def read_csv_from(path: str, offset: int = 0, columns: Optional[List[str]] = None) -> CsvChunk:
+    """
+    从指定字节偏移读取CSV，只解析到最后一个完整行，未写完的行留到下次读取
+    :param path: CSV文件路径
+    :param offset: 起始字节偏移，0表示从表头开始
+    :param columns: 原始列名（offset > 0 时必须提供）
+    :return: CsvChunk
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+
+    end = data.rfind(b'\n') + 1
+    if offset == 0 and end == 0:
+        end = len(data)
+    if end == 0:
+        return CsvChunk(pd.DataFrame(columns=columns), columns, offset)
+
+    try:
+        frame = _parse_csv_bytes(data[:end], columns if offset > 0 else None)
+    except pd.errors.ParserError:
+        if offset == 0:
+            raise
+        # 多行评论内容写到一半，等待下次读取
+        return CsvChunk(pd.DataFrame(columns=columns), columns, offset)
+    return CsvChunk(frame, list(frame.columns) if columns is None else columns, offset + end)
+
+
+def complete_rows_end(path: str, offset: int = 0) -> int:
+    """
+    文件中最后一个完整行的结束位置（最后一个换行符之后），从文件末尾向前查找
+    :param path: 文件路径
+    :param offset: 起始字节偏移，0表示从表头开始（只有一行且没有换行符时为文件末尾）
+    :return: 结束位置，offset之后没有完整行时为offset
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        position = size
+        while position > offset:
+            start = max(offset, position - 65536)
+            f.seek(start)
+            index = f.read(position - start).rfind(b'\n')
+            if index >= 0:
+                return start + index + 1
+            position = start
+    return size if offset == 0 else offset
+
+
+class _ByteRange(RawIOBase):
+    """文件中 [start, end) 字节范围的只读流"""
+
+    def __init__(self, f, start: int, end: int):
+        self._f = f
+        self._f.seek(start)
+        self._remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        data = self._f.read(size)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+
+def iter_csv_range(path: str, start: int, end: int, columns: Optional[List[str]] = None,
+                   usecols: Optional[List[str]] = None, chunk_rows: int = 10000) -> Iterator[pd.DataFrame]:
+    """
+    按块读取CSV中 [start, end) 字节范围内的行，内存占用与块大小成正比
+    :param path: CSV文件路径
+    :param start: 起始字节偏移，0表示从表头开始
+    :param end: 结束字节偏移（完整行的结束位置，见 complete_rows_end）
+    :param columns: 原始列名（start > 0 时必须提供）
+    :param usecols: 只读取的原始列，None表示全部
+    :param chunk_rows: 每块行数
+    :return: 原始DataFrame生成器（已去掉重复写入的表头行），行写到一半时抛出 pd.errors.ParserError
+    """
+    with open(path, 'rb') as f:
+        stream = BufferedReader(_ByteRange(f, start, end))
+        if start == 0:
+            reader = pd.read_csv(stream, encoding='utf-8', dtype=CSV_DTYPES, usecols=usecols, chunksize=chunk_rows)
+        else:
+            reader = pd.read_csv(stream, encoding='utf-8', dtype=CSV_DTYPES, header=None, names=columns,
+                                 usecols=usecols, chunksize=chunk_rows)
+        with reader:
+            for chunk in reader:
+                chunk = drop_header_rows(chunk)
+                if not chunk.empty:
+                    yield chunk
+
+
+def build_snapshot(csv_path: str, normalizer: Callable[[pd.DataFrame], pd.DataFrame]) -> Optional[str]:
+    """
+    从CSV构建快照文件
+    :param csv_path: CSV文件路径
+    :param normalizer: 标准化函数
+    :return: 快照文件路径，CSV不存在时返回None
+    """
+    if not os.path.exists(csv_path):
+        logger.warning(f"CSV文件不存在: {csv_path}")
+        return None
+
+    fmt = get_snapshot_format()
+    snapshot_path = get_snapshot_path(csv_path, fmt)
+    chunk = read_csv_from(csv_path)
+    df = normalizer(chunk.frame)
+    write_snapshot(df, snapshot_path, fmt, {
+        'offset': chunk.offset,
+        'fingerprint': file_fingerprint(csv_path, chunk.offset),
+        'columns': chunk.columns,
+    })
+    logger.info(f"快照已生成: {snapshot_path}, 共 {len(df)} 条")
+    return snapshot_path
+
+
+class DatasetEntry:
+    """缓存条目：标准化数据 + 已读取到的CSV位置"""
+
+    def __init__(self, frame: pd.DataFrame, columns: List[str], offset: int, fingerprint: str):
+        self.frame = frame
+        self.columns = columns
+        self.offset = offset
+        self.fingerprint = fingerprint
+        self.signature = None
+        # 共享数据集模式下挂载的版本号
+        self.version = None
+        # 基于frame构建的派生结构（如ID索引），随条目一起失效
+        self.derived: Dict[str, object] = {}
+
+
+class DatasetCache:
+    """
+    进程内数据集缓存
+
+    以 文件路径 + 修改时间 + 文件大小 作为缓存键，文件未变化时直接返回已解析的数据，
+    返回的DataFrame底层数组只读，调用方新增列不会影响缓存。
+
+    爬虫以追加方式写CSV，缓存记录已读取的字节偏移：文件变长且已读部分未被改写时，
+    只解析新增的尾部并拼接到缓存数据上；文件变短或被改写时完整重新加载。
+    """
+
+    def __init__(self, shared: bool = True):
+        """
+        :param shared: 开启 Config.DATASET_SHARED_ENABLED 时是否使用多进程共享数据集
+        """
+        self.shared = shared
+        self._lock = threading.RLock()
+        self._entries: Dict[str, DatasetEntry] = {}
+        self._shared_entries: Dict[str, DatasetEntry] = {}
+        # 共享模式下负责构建数据的本地缓存（只在构建数据的进程中使用）
+        self._builder: Optional['DatasetCache'] = None
+
+    @staticmethod
+    def file_signature(path: str) -> Optional[Tuple[int, int]]:
+        """
+        获取文件签名
+        :param path: 文件路径
+        :return: (修改时间ns, 文件大小)，文件不存在时返回None
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _entry(self, path: str, normalizer: Callable[[pd.DataFrame], pd.DataFrame]) -> Optional[DatasetEntry]:
+        """
+        获取最新的缓存条目，文件变化时增量或完整重新解析
+        :param path: CSV文件路径
+        :param normalizer: 标准化函数
+        :return: 缓存条目，文件不存在时返回None
+        """
+        signature = self.file_signature(path)
+        if signature is None:
+            logger.warning(f"CSV文件不存在: {path}")
+            return None
+
+        if self.shared and Config.DATASET_SHARED_ENABLED:
+            entry = self._shared_entry(path, normalizer, signature)
+            if entry is not None:
+                return entry
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                entry = self._load(path, normalizer)
+            elif entry.signature != signature:
+                entry = self._refresh(path, normalizer, entry)
+            entry.signature = signature
+            self._entries[path] = entry
+        return entry
+
+    def _shared_entry(self, path: str, normalizer: Callable[[pd.DataFrame], pd.DataFrame],
+                      signature: Tuple[int, int]) -> Optional[DatasetEntry]:
+        """
+        共享数据集模式：CSV有更新且已发布的数据落后时，抢到构建锁的进程重新构建并发布，
+        其余进程继续使用当前版本；最终都挂载最新发布的版本（零拷贝）
+        :param path: CSV文件路径
+        :param normalizer: 标准化函数
+        :param signature: CSV当前签名
+        :return: 缓存条目，尚未发布且未能构建时返回None（回退为进程内缓存）
+        """
+        from data.shared_dataset import shared_store
+
+        with self._lock:
+            entry = self._shared_entries.get(path)
+            if (entry is None or entry.signature != signature) and shared_store.is_stale(path, signature):
+                lock_path = shared_store.try_lock(path)
+                if lock_path is not None:
+                    try:
+                        if self._builder is None:
+                            self._builder = DatasetCache(shared=False)
+                        shared_store.publish(path, self._builder.get(path, normalizer), signature)
+                    except Exception as e:
+                        logger.error(f"发布共享数据集失败: {e}")
+                    finally:
+                        shared_store.release_lock(lock_path)
+
+            dataset = shared_store.attach(path) or shared_store.wait_published(path)
+            if dataset is None:
+                return None
+            if entry is None or entry.version != dataset.version:
+                entry = DatasetEntry(dataset.frame, [], 0, '')
+                entry.version = dataset.version
+            entry.signature = signature
+            self._shared_entries[path] = entry
+            return entry
+
+    def get(self, path: str, normalizer: Callable[[pd.DataFrame], pd.DataFrame]) -> pd.DataFrame:
+        """
+        获取数据集，文件变化时增量或完整重新解析
+        :param path: CSV文件路径
+        :param normalizer: 标准化函数
+        :return: DataFrame（浅拷贝，底层数据只读）
+        """
+        entry = self._entry(path, normalizer)
+        if entry is None:
+            return pd.DataFrame()
+        return entry.frame.copy(deep=False)
+
+    def get_derived(self, path: str, normalizer: Callable[[pd.DataFrame], pd.DataFrame],
+                    name: str, builder: Callable[[pd.DataFrame], object]) -> Tuple[pd.DataFrame, object]:
+        """
+        获取数据集及其派生结构，派生结构按条目缓存，数据变化后首次访问时重新构建
+        :param path: CSV文件路径
+        :param normalizer: 标准化函数
+        :param name: 派生结构名称
+        :param builder: 构建函数，参数为缓存的DataFrame
+        :return: (DataFrame（只读，不可修改）, 派生结构)，文件不存在时返回 (空DataFrame, None)
+        """
+        entry = self._entry(path, normalizer)
+        if entry is None:
+            return pd.DataFrame(), None
+        with self._lock:
+            if name not in entry.derived:
+                entry.derived[name] = builder(entry.frame)
+            return entry.frame, entry.derived[name]
+
+    def _load(self, path: str, normalizer: Callable[[pd.DataFrame], pd.DataFrame]) -> DatasetEntry:
+        """
+        首次加载：快照有效时读取快照并补读CSV新增部分，否则完整解析CSV并刷新快照
+        :param path: CSV文件路径
+        :param normalizer: 标准化函数
+        :return: 缓存条目
+        """
+        if not Config.DATASET_SNAPSHOT_ENABLED:
+            return self._full_read(path, normalizer)
+
+        fmt = get_snapshot_format()
+        snapshot_path = get_snapshot_path(path, fmt)
+        try:
+            meta = read_snapshot_meta(snapshot_path)
+            if meta is not None and os.path.getsize(path) >= meta['offset'] \
+                    and file_fingerprint(path, meta['offset']) == meta['fingerprint']:
+                df = read_snapshot(snapshot_path, fmt)
+                if len(df) == meta['rows']:
+                    logger.info(f"从快照加载数据: {snapshot_path}, 共 {len(df)} 条")
+                    df = self._compact(path, df)
+                    entry = DatasetEntry(_freeze(df), meta['columns'], meta['offset'], meta['fingerprint'])
+                    return self._refresh(path, normalizer, entry)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"读取快照失败，改为解析CSV: {e}")
+
+        entry = self._full_read(path, normalizer)
+        try:
+            write_snapshot(entry.frame, snapshot_path, fmt, {
+                'offset': entry.offset,
+                'fingerprint': entry.fingerprint,
+                'columns': entry.columns,
+            })
+        except Exception as e:
+            logger.warning(f"写入快照失败: {e}")
+        return entry
+
+    @staticmethod
+    def _compact(path: str, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        按配置转换为紧凑类型，并记录转换前后的内存占用
+        :param path: CSV文件路径
+        :param df: 标准化后的DataFrame
+        :return: DataFrame
+        """
+        if not Config.DATASET_COMPACT_DTYPES:
+            return df
+        before = memory_usage_mb(df)
+        df = compact_frame(df)
+        logger.info(f"紧凑类型转换: {path}, 内存 {before}MB -> {memory_usage_mb(df)}MB")
+        return df
+
+    def _full_read(self, path: str, normalizer: Callable[[pd.DataFrame], pd.DataFrame]) -> DatasetEntry:
+        """
+        完整解析CSV
+        :param path: CSV文件路径
+        :param normalizer: 标准化函数
+        :return: 缓存条目
+        """
+        chunk = read_csv_from(path)
+        df = normalizer(chunk.frame)
+        logger.info(f"从CSV加载数据: {path}, 共 {len(df)} 条")
+        df = self._compact(path, df)
+        return DatasetEntry(_freeze(df), chunk.columns, chunk.offset, file_fingerprint(path, chunk.offset))
+
+    def _refresh(self, path: str, normalizer: Callable[[pd.DataFrame], pd.DataFrame],
+                 entry: DatasetEntry) -> DatasetEntry:
+        """
+        文件变化后刷新：追加写入时只解析新增尾部，否则完整重新加载
+        :param path: CSV文件路径
+        :param normalizer: 标准化函数
+        :param entry: 当前缓存条目
+        :return: 新的缓存条目
+        """
+        size = os.path.getsize(path)
+        if size < entry.offset or file_fingerprint(path, entry.offset) != entry.fingerprint:
+            logger.info(f"CSV文件已被改写，完整重新加载: {path}")
+            return self._full_read(path, normalizer)
+        if size == entry.offset:
+            return entry
+
+        chunk = read_csv_from(path, entry.offset, entry.columns)
+        if chunk.offset == entry.offset:
+            return entry
+
+        frame = entry.frame
+        if not chunk.frame.empty:
+            tail = normalizer(chunk.frame)
+            if Config.DATASET_COMPACT_DTYPES:
+                tail = compact_frame(tail)
+            frame = _freeze(concat_frames(entry.frame, tail))
+            logger.info(f"增量加载CSV: {path}, 新增 {len(tail)} 条, 共 {len(frame)} 条")
+
+        return DatasetEntry(frame, entry.columns, chunk.offset, file_fingerprint(path, chunk.offset))
+
+    def invalidate(self, path: Optional[str] = None):
+        """
+        清除缓存
+        :param path: 文件路径，None表示清除全部
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._shared_entries.clear()
+            else:
+                self._entries.pop(path, None)
+                self._shared_entries.pop(path, None)
+
+
+# 全局共享缓存
+dataset_cache = DatasetCache()
+
+
+def load_video_data() -> pd.DataFrame:
+    """
+    加载标准化后的视频数据
+    :return: DataFrame
+    """
+    try:
+        return dataset_cache.get(VIDEO_CSV_PATH, normalize_video_data)
+    except Exception as e:
+        logger.error(f"从CSV加载视频数据失败: {e}")
+        return pd.DataFrame()
+
+
+def load_comment_data() -> pd.DataFrame:
+    """
+    加载标准化后的评论数据
+    :return: DataFrame
+    """
+    try:
+        return dataset_cache.get(COMMENT_CSV_PATH, normalize_comment_data)
+    except Exception as e:
+        logger.error(f"从CSV加载评论数据失败: {e}")
+        return pd.DataFrame()
+
+
+def dataset_version() -> str:
+    """
+    数据版本：视频、评论CSV的(修改时间, 文件大小)，任一文件变化时改变
+    :return: 版本字符串
+    """
+    signatures = [DatasetCache.file_signature(path) for path in (VIDEO_CSV_PATH, COMMENT_CSV_PATH)]
+    return '-'.join(f'{s[0]}.{s[1]}' if s else '0' for s in signatures)
+
+
+def data_change_token() -> str:
+    """
+    数据变化标记（见 Config.DATA_CHANGE_TOKEN_PATH），多进程共享
+    :return: 标记字符串，从未标记过时为 '0'
+    """
+    try:
+        with open(Config.DATA_CHANGE_TOKEN_PATH, 'r', encoding='utf-8') as f:
+            return f.read().strip() or '0'
+    except FileNotFoundError:
+        return '0'
+
+
+def bump_data_change_token() -> str:
+    """
+    改写数据变化标记（原子替换），数据被原地更新后调用
+    :return: 新的标记
+    """
+    path = str(Config.DATA_CHANGE_TOKEN_PATH)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    token = f'{time.time_ns()}.{os.getpid()}'
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(token)
+    os.replace(tmp_path, path)
+    return token
+
+
+def build_id_index(df: pd.DataFrame) -> Dict[str, int]:
+    """
+    构建 aweme_id -> 行位置 的索引，重复ID取第一条
+    :param df: 标准化后的视频DataFrame
+    :return: 索引字典
+    """
+    if df.empty or 'aweme_id' not in df.columns:
+        return {}
+    ids = df['aweme_id']
+    first = (~ids.duplicated(keep='first') & ids.notna()).to_numpy()
+    return dict(zip(ids[first].astype(str), np.flatnonzero(first).tolist()))
+
+
+def get_video(aweme_id) -> Optional[pd.Series]:
+    """
+    按视频ID获取单条视频数据，通过ID索引定位，不扫描整列
+    :param aweme_id: 视频ID
+    :return: 视频数据（Series），不存在时返回None
+    """
+    if aweme_id is None or aweme_id == '':
+        return None
+    try:
+        df, index = dataset_cache.get_derived(VIDEO_CSV_PATH, normalize_video_data, 'id_index', build_id_index)
+        position = index.get(str(aweme_id).strip()) if index else None
+        if position is None:
+            return None
+        return df.iloc[position]
+    except Exception as e:
+        logger.error(f"获取视频数据失败: {e}")
+        return None
+
+
+# 预先排序的列（视频数据）
+RANK_COLUMNS = ['like_count', 'fans_count', 'comment_count', 'share_count']
+
+
+def _sort_keys(series: pd.Series, ascending: bool) -> np.ndarray:
+    """
+    数值列 -> 升序排序键（降序时取负），缺失值排在最后，与 sort_values 一致
+    :param series: 数值列
+    :param ascending: 是否升序
+    :return: numpy数组
+    """
+    if series.dtype.kind in 'iu' and not series.hasnans:
+        values = series.to_numpy(dtype='int64')
+        return values if ascending else -values
+    values = series.to_numpy(dtype='float64', na_value=np.nan)
+    keys = values if ascending else -values
+    return np.where(np.isnan(keys), np.inf, keys)
+
+
+def top_positions(series: pd.Series, k: int, ascending: bool = False) -> np.ndarray:
+    """
+    部分排序：返回稳定排序后前k行的位置，结果与 sort_values(kind='stable').head(k) 一致
+    先用 np.partition 找到第k个值，只对不超过该值的候选行排序，复杂度约为 O(n + m log m)
+    :param series: 数值列
+    :param k: 行数
+    :param ascending: 是否升序
+    :return: 行位置数组
+    """
+    keys = _sort_keys(series, ascending)
+    if k <= 0:
+        return np.array([], dtype='int64')
+    if k >= len(keys):
+        return np.argsort(keys, kind='stable')
+    kth = np.partition(keys, k - 1)[k - 1]
+    candidates = np.flatnonzero(keys <= kth)
+    return candidates[np.argsort(keys[candidates], kind='stable')][:k]
+
+
+class RankIndex:
+    """
+    视频数据的排行索引：RANK_COLUMNS 各列按降序稳定排序后的行位置，
+    以及粉丝排行（同名用户只保留第一次出现的行）的行位置
+    """
+
+    def __init__(self, positions: Dict[str, np.ndarray], user_positions: np.ndarray):
+        self.positions = positions
+        self.user_positions = user_positions
+
+
+def build_rank_index(df: pd.DataFrame) -> RankIndex:
+    """
+    构建排行索引
+    :param df: 标准化后的视频DataFrame
+    :return: RankIndex
+    """
+    positions = {}
+    for col in RANK_COLUMNS:
+        if col in df.columns:
+            positions[col] = np.argsort(_sort_keys(df[col], ascending=False), kind='stable')
+
+    user_positions = np.array([], dtype='int64')
+    if 'fans_count' in positions and 'user_name' in df.columns:
+        first = (~df['user_name'].duplicated(keep='first')).to_numpy()
+        ranked = positions['fans_count']
+        user_positions = ranked[first[ranked]]
+    return RankIndex(positions, user_positions)
+
+
+def get_video_rank_index() -> Tuple[pd.DataFrame, Optional[RankIndex]]:
+    """
+    获取视频数据及其排行索引（每个数据版本构建一次）
+    :return: (DataFrame（只读，不可修改）, RankIndex)，文件不存在时返回 (空DataFrame, None)
+    """
+    return dataset_cache.get_derived(VIDEO_CSV_PATH, normalize_video_data, 'rank_index', build_rank_index)
+
+
+class CommentPartition:
+    """
+    按视频分组的评论数据：评论按aweme_id稳定排序（同一视频内保持原顺序），
+    每个视频对应一段连续的行 [start, end)
+    """
+
+    def __init__(self, frame: pd.DataFrame, offsets: Dict[str, Tuple[int, int]]):
+        self.frame = frame
+        self.offsets = offsets
+
+    def get(self, aweme_id) -> pd.DataFrame:
+        """
+        获取指定视频的评论（排序后数据的切片视图，不复制数据）
+        :param aweme_id: 视频ID
+        :return: DataFrame，无评论时为空DataFrame
+        """
+        start, end = self.offsets.get(str(aweme_id).strip(), (0, 0))
+        return self.frame.iloc[start:end]
+
+
+def build_comment_partition(df: pd.DataFrame) -> CommentPartition:
+    """
+    构建按视频分组的评论数据
+    :param df: 标准化后的评论DataFrame
+    :return: CommentPartition
+    """
+    if df.empty or 'aweme_id' not in df.columns:
+        return CommentPartition(df, {})
+
+    codes, uniques = pd.factorize(df['aweme_id'])
+    # 缺失ID(code=-1)排在最前面，不属于任何视频
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    ends = int((codes < 0).sum()) + np.cumsum(counts)
+    starts = ends - counts
+    offsets = {str(vid): (int(start), int(end)) for vid, start, end in zip(uniques, starts, ends)}
+
+    # 已按视频分组排列（如共享数据集）时直接使用原数据，不复制
+    if (np.diff(codes) >= 0).all():
+        return CommentPartition(df, offsets)
+    order = np.argsort(codes, kind='stable')
+    return CommentPartition(_freeze(df.take(order)), offsets)
+
+
+def get_video_comments(aweme_id) -> pd.DataFrame:
+    """
+    获取指定视频的评论，耗时只与该视频的评论数有关
+    :param aweme_id: 视频ID
+    :return: DataFrame（只读视图）
+    """
+    try:
+        _, partition = dataset_cache.get_derived(COMMENT_CSV_PATH, normalize_comment_data,
+                                                 'video_partition', build_comment_partition)
+        if partition is None:
+            return pd.DataFrame()
+        return partition.get(aweme_id)
+    except Exception as e:
+        logger.error(f"获取视频评论失败: {e}")
+        return pd.DataFrame()
+
+
+def build_all_snapshots() -> Dict[str, Optional[str]]:
+    """
+    为视频和评论CSV构建快照
+    :return: {'video': 快照路径, 'comment': 快照路径}
+    """
+    return {
+        'video': build_snapshot(VIDEO_CSV_PATH, normalize_video_data),
+        'comment': build_snapshot(COMMENT_CSV_PATH, normalize_comment_data),
+    }
+
+
+def memory_report() -> Dict[str, Dict]:
+    """
+    对比视频、评论数据在标准类型和紧凑类型下的内存占用
+    :return: {'video': {'rows', 'object_mb', 'compact_mb'}, 'comment': {...}}
+    """
+    report = {}
+    for name, loader in [('video', load_video_data), ('comment', load_comment_data)]:
+        df = loader()
+        report[name] = {
+            'rows': len(df),
+            'object_mb': memory_usage_mb(expand_frame(df.copy(deep=False))),
+            'compact_mb': memory_usage_mb(compact_frame(df.copy(deep=False))),
+        }
+    return report
+
+
+if __name__ == '__main__':
+    # 构建列式快照并输出内存对比: python -m data.dataset
+    logging.basicConfig(level=logging.INFO)
+    print(build_all_snapshots())
+    print(memory_report())
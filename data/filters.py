@@ -0,0 +1,382 @@
+"""
+筛选模块 - 各统计接口共用的筛选条件（关键词 / 话题、发布日期范围、粉丝数范围、作者）
+
+FilterSpec 由查询参数构建，拆分为若干单列条件：
+    keyword=cos           描述包含关键词
+    hashtag=coser         描述中带有 #coser 话题（不区分大小写，#cosers 不算）
+    start=2025-01-01      发布时间不早于该日期（带时区时换算为本地时间）
+    end=2025-12-31        发布时间不晚于该日期（只有日期时包含当天）
+    fans_min / fans_max   粉丝数范围（含）
+    creator=xxx           作者（user_name）
+
+CSV后端：掩码在视频数据上向量化计算并按数据版本缓存（LRU）：每个单列条件只扫描一次，
+同一筛选条件的组合掩码也只计算一次，仪表盘上多个图表使用同一筛选条件时直接复用。
+评论按筛选出的视频ID过滤，评论掩码同样缓存。掩码挂在数据集缓存条目上（数据变化后重新计算）。
+
+数据库后端：筛选条件转换为数据仓库的查询条件（orm_filters()），在SQL中执行，
+评论通过视频ID子查询过滤，不把整表读入内存。
+"""
+
+import itertools
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from data.dataset import VIDEO_CSV_PATH, COMMENT_CSV_PATH, dataset_cache, get_video_rank_index
+from data.normalize import normalize_video_data, normalize_comment_data
+from data.repository import CsvRepository, get_repository
+
+logger = logging.getLogger(__name__)
+
+# 支持的查询参数
+FILTER_PARAMS = ('keyword', 'hashtag', 'start', 'end', 'fans_min', 'fans_max', 'creator')
+
+
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _integer(name: str, value) -> Optional[int]:
+    value = _text(value)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"筛选参数 {name} 必须为整数: {value}")
+
+
+def _local_naive(timestamp: pd.Timestamp) -> pd.Timestamp:
+    """
+    带时区的时间换算为本地时间后去掉时区（publish_time 为不带时区的本地时间，
+    数据库后端按当前时区处理，见 OrmRepository._aware）
+    """
+    from django.conf import settings
+    from django.utils import timezone
+
+    if not settings.configured:
+        return timestamp.tz_convert(None)
+    return timestamp.tz_convert(timezone.get_current_timezone()).tz_localize(None)
+
+
+def _timestamp(name: str, value) -> Optional[pd.Timestamp]:
+    value = _text(value)
+    if value is None:
+        return None
+    try:
+        timestamp = pd.Timestamp(value)
+    except ValueError:
+        raise ValueError(f"筛选参数 {name} 不是有效的日期: {value}")
+    if timestamp is pd.NaT:
+        raise ValueError(f"筛选参数 {name} 不是有效的日期: {value}")
+    return _local_naive(timestamp) if timestamp.tzinfo is not None else timestamp
+
+
+class FilterSpec:
+    """
+    统计接口的筛选条件
+    conditions() 返回单列条件 (列名, 操作, 值)，key() 作为缓存键
+    """
+
+    def __init__(self, keyword: Optional[str] = None, hashtag: Optional[str] = None, start=None, end=None,
+                 fans_min=None, fans_max=None, creator: Optional[str] = None):
+        self.keyword = _text(keyword)
+        self.hashtag = _text((hashtag or '').lstrip('#'))
+        self.start = _timestamp('start', start)
+        self.end = _timestamp('end', end)
+        self.fans_min = _integer('fans_min', fans_min)
+        self.fans_max = _integer('fans_max', fans_max)
+        self.creator = _text(creator)
+
+    @classmethod
+    def from_params(cls, params) -> 'FilterSpec':
+        """
+        由查询参数构建（如 request.GET）
+        :param params: 支持 .get() 的映射
+        :return: FilterSpec
+        """
+        return cls(**{name: params.get(name) for name in FILTER_PARAMS})
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.conditions()
+
+    def conditions(self) -> List[Tuple[str, str, object]]:
+        """
+        单列条件
+        :return: [(列名, 操作, 值)]
+        """
+        conditions = []
+        if self.keyword:
+            conditions.append(('description', 'contains', self.keyword))
+        if self.hashtag:
+            conditions.append(('description', 'hashtag', self.hashtag.lower()))
+        if self.start is not None:
+            conditions.append(('publish_time', 'gte', self.start))
+        if self.end is not None:
+            # 只有日期时包含当天
+            if self.end == self.end.normalize():
+                conditions.append(('publish_time', 'lt', self.end + pd.Timedelta(days=1)))
+            else:
+                conditions.append(('publish_time', 'lte', self.end))
+        if self.fans_min is not None:
+            conditions.append(('fans_count', 'gte', self.fans_min))
+        if self.fans_max is not None:
+            conditions.append(('fans_count', 'lte', self.fans_max))
+        if self.creator:
+            conditions.append(('user_name', 'exact', self.creator))
+        return conditions
+
+    def key(self) -> Tuple:
+        return tuple((column, lookup, str(value)) for column, lookup, value in self.conditions())
+
+    def to_dict(self) -> Dict[str, any]:
+        return {name: str(getattr(self, name)) for name in FILTER_PARAMS if getattr(self, name) is not None}
+
+    def __repr__(self):
+        return f"FilterSpec({self.to_dict()})"
+
+
+def is_filtered(spec: Optional[FilterSpec]) -> bool:
+    """是否有筛选条件"""
+    return spec is not None and not spec.is_empty
+
+
+def hashtag_pattern(tag: str) -> str:
+    """
+    话题的正则：#话题 后为空白、# 或结尾（Python 与 MySQL 8 的正则都支持）
+    :param tag: 话题（不带#）
+    :return: 正则表达式
+    """
+    return '#' + re.escape(tag) + r'(?:\s|#|$)'
+
+
+def orm_filters(spec: FilterSpec) -> Dict[str, object]:
+    """
+    筛选条件 -> 数据仓库的查询条件
+    例如: FilterSpec(hashtag='cos', fans_min=1000)
+        -> {'description__iregex': '#cos(?:\\s|#|$)', 'fans_count__gte': 1000}
+    :param spec: 筛选条件
+    :return: 查询条件字典
+    """
+    filters = {}
+    for column, lookup, value in spec.conditions():
+        if lookup == 'hashtag':
+            lookup, value = 'iregex', hashtag_pattern(value)
+        filters[column if lookup == 'exact' else f'{column}__{lookup}'] = value
+    return filters
+
+
+def condition_mask(df: pd.DataFrame, column: str, lookup: str, value) -> np.ndarray:
+    """
+    计算单列条件的布尔掩码
+    :param df: 视频数据
+    :param column: 列名
+    :param lookup: 操作（与数据仓库一致，另外支持 hashtag）
+    :param value: 值
+    :return: 布尔数组，列不存在时全部为False
+    """
+    if column not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    if lookup == 'hashtag':
+        lookup, value = 'iregex', hashtag_pattern(value)
+    return CsvRepository._mask(df[column], lookup, value)
+
+
+# 掩码缓存的编号，区分不同数据版本的视频掩码
+_tokens = itertools.count(1)
+
+
+class FilterMasks:
+    """
+    一个数据版本上的掩码缓存（LRU，最多 Config.FILTER_MASK_CACHE_SIZE 项）
+    除掩码外也可以缓存按筛选条件计算的派生结果（如时间汇总）
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        self.token = next(_tokens)
+        self._lock = threading.Lock()
+        self._items: 'OrderedDict[Tuple, object]' = OrderedDict()
+
+    def cached(self, key: Tuple, builder: Callable[[], object]):
+        """
+        读取缓存，不存在时构建
+        :param key: 缓存键
+        :param builder: 构建函数
+        :return: 缓存值
+        """
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        value = builder()
+        with self._lock:
+            self._items[key] = value
+            while len(self._items) > Config.FILTER_MASK_CACHE_SIZE:
+                self._items.popitem(last=False)
+        return value
+
+    def condition(self, column: str, lookup: str, value) -> np.ndarray:
+        """单列条件的掩码（只读）"""
+        def build():
+            mask = np.array(condition_mask(self.frame, column, lookup, value), dtype=bool)
+            mask.flags.writeable = False
+            return mask
+
+        return self.cached(('condition', column, lookup, str(value)), build)
+
+    def mask(self, spec: FilterSpec) -> np.ndarray:
+        """
+        筛选条件的组合掩码（只读）
+        :param spec: 筛选条件
+        :return: 布尔数组
+        """
+        def build():
+            mask = np.ones(len(self.frame), dtype=bool)
+            for column, lookup, value in spec.conditions():
+                mask &= self.condition(column, lookup, value)
+            mask.flags.writeable = False
+            return mask
+
+        return self.cached(('mask', spec.key()), build)
+
+
+def get_filter_masks(source: str = 'video') -> FilterMasks:
+    """
+    获取数据源当前版本的掩码缓存（只用于CSV后端，数据库后端的筛选在SQL中执行）
+    :param source: 'video' / 'comment'
+    :return: FilterMasks
+    """
+    path, normalizer = (VIDEO_CSV_PATH, normalize_video_data) if source == 'video' \
+        else (COMMENT_CSV_PATH, normalize_comment_data)
+    _, masks = dataset_cache.get_derived(path, normalizer, 'filter_masks', FilterMasks)
+    return masks if masks is not None else FilterMasks(pd.DataFrame())
+
+
+def filtered_videos(spec: FilterSpec, columns: Optional[List[str]] = None, order: Optional[List[str]] = None,
+                    limit: Optional[int] = None) -> pd.DataFrame:
+    """
+    按筛选条件取视频数据
+    :param spec: 筛选条件
+    :param columns: 需要的列，None表示全部
+    :param order: 排序，如 ['-like_count']（CSV后端按排行索引过滤，不重新排序）
+    :param limit: 返回数量
+    :return: DataFrame
+    """
+    if Config.DATASET_BACKEND != 'csv':
+        return get_repository().videos(filters=orm_filters(spec), columns=columns, order=order, limit=limit)
+
+    masks = get_filter_masks('video')
+    if masks.frame.empty:
+        return masks.frame
+    rank_index = None
+    if order:
+        frame, rank_index = get_video_rank_index()
+        # 数据在两次读取之间发生变化时不使用排行索引
+        if frame is not masks.frame:
+            rank_index = None
+    return CsvRepository.query(masks.frame, columns=columns, order=order, limit=limit,
+                               mask=masks.mask(spec), rank_index=rank_index)
+
+
+def filtered_video_ids(spec: FilterSpec, masks: Optional[FilterMasks] = None) -> List[str]:
+    """
+    筛选出的视频ID
+    :param spec: 筛选条件
+    :param masks: 视频掩码缓存，默认取当前版本（CSV后端）
+    :return: 视频ID列表
+    """
+    if Config.DATASET_BACKEND != 'csv':
+        ids = get_repository().videos(filters=orm_filters(spec), columns=['aweme_id'])['aweme_id']
+        return ids.dropna().astype(str).unique().tolist()
+
+    masks = masks or get_filter_masks('video')
+    if 'aweme_id' not in masks.frame.columns:
+        return []
+    ids = masks.frame['aweme_id'][masks.mask(spec)]
+    return ids.dropna().astype(str).unique().tolist()
+
+
+def comment_mask(spec: FilterSpec) -> Tuple[FilterMasks, np.ndarray]:
+    """
+    评论掩码：评论的视频ID属于筛选出的视频（CSV后端）
+    :param spec: 筛选条件
+    :return: (评论掩码缓存, 布尔数组)
+    """
+    videos = get_filter_masks('video')
+    comments = get_filter_masks('comment')
+
+    def build():
+        if comments.frame.empty or 'aweme_id' not in comments.frame.columns:
+            return np.zeros(len(comments.frame), dtype=bool)
+        # 评论的aweme_id为字符串（CSV后端为字符串类别），直接按ID集合匹配
+        mask = np.asarray(comments.frame['aweme_id'].isin(filtered_video_ids(spec, videos)), dtype=bool)
+        mask.flags.writeable = False
+        return mask
+
+    # 视频数据变化后视频ID可能不同，键中带上视频掩码缓存的编号
+    return comments, comments.cached(('videos', videos.token, spec.key()), build)
+
+
+def _orm_comment_filters(spec: FilterSpec) -> Dict[str, object]:
+    """数据库后端的评论查询条件：视频ID属于筛选出的视频（子查询）"""
+    return {'aweme_id__in': get_repository().video_id_query(orm_filters(spec))}
+
+
+def filtered_comments(spec: FilterSpec, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    按筛选条件取评论数据（只保留筛选出的视频的评论）
+    :param spec: 筛选条件
+    :param columns: 需要的列，None表示全部
+    :return: DataFrame
+    """
+    if Config.DATASET_BACKEND != 'csv':
+        return get_repository().comments(filters=_orm_comment_filters(spec), columns=columns)
+
+    comments, mask = comment_mask(spec)
+    if comments.frame.empty:
+        return comments.frame
+    return CsvRepository.query(comments.frame, columns=columns, mask=mask)
+
+
+def count_filtered(spec: FilterSpec) -> Dict[str, int]:
+    """
+    筛选后的视频数、评论数
+    :param spec: 筛选条件
+    :return: {'total_videos': ..., 'total_comments': ...}
+    """
+    if Config.DATASET_BACKEND != 'csv':
+        repo = get_repository()
+        return {
+            'total_videos': repo.count_videos(orm_filters(spec)),
+            'total_comments': repo.count_comments(_orm_comment_filters(spec)),
+        }
+
+    _, mask = comment_mask(spec)
+    return {
+        'total_videos': int(get_filter_masks('video').mask(spec).sum()),
+        'total_comments': int(mask.sum()),
+    }
+
+
+if __name__ == '__main__':
+    # 首次与重复筛选的耗时: python -m data.filters [话题]
+    import sys
+    import time
+
+    logging.basicConfig(level=logging.WARNING)
+    spec = FilterSpec(hashtag=sys.argv[1] if len(sys.argv) > 1 else 'cosplay', fans_min=1000)
+    for label in ('首次', '重复'):
+        start_time = time.perf_counter()
+        counts = count_filtered(spec)
+        print(f"{label}: {spec} -> {counts}, {(time.perf_counter() - start_time) * 1000:.1f}ms")
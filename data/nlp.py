@@ -5,15 +5,14 @@
 
 import pandas as pd
 import jieba
-from snownlp import SnowNLP
+
+from data.sentiment_scoring import score_many
 
 def nlpdemo(df):
     with open('stopwords.txt', 'r', encoding='utf-8') as f:
         # stopwords = [line.strip() for line in f.readlines()]
         stopwords = [line.strip() for line in f]
 
-    # 存储结果
-    scors = []
     # 分词结果
     segmented_comments = []
 
@@ -22,13 +21,11 @@ def nlpdemo(df):
 
         words = jieba.cut(comment)
         filter_words = [word for word in words if word not in stopwords]
-        filter_text = ' '.join(filter_words)
         segmented_comments.append(' '.join(filter_words))
-        if not filter_text.strip():
-            scors.append(0.5)
-        else:
-            s = SnowNLP(filter_text)
-            scors.append(s.sentiments)
+
+    # 批量打分（多进程），分词后为空的评论记为0.5
+    texts = [text if text.strip() else '' for text in segmented_comments]
+    scors = [0.5 if score is None else score for score in score_many(texts).scores]
     df['scores'] = scors
     df['segmented'] = segmented_comments
 
@@ -0,0 +1,281 @@
+"""
+数据标准化模块 - 将爬虫CSV的原始DataFrame转换为统一的英文列名和类型
+
+视频、评论数据的列名映射、数值转换、时长解析、时间解析和ID转换都在这里完成，
+全部按列向量化处理：时长、时间等重复值较多的列先去重再解析，最后按编码映射回整列。
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 视频CSV列名映射
+VIDEO_COLUMN_MAPPING = {
+    '用户名': 'user_name',
+    '粉丝数量': 'fans_count',
+    '视频描述': 'description',
+    '发布时间': 'publish_time',
+    '视频时长': 'duration',
+    '点赞数': 'like_count',
+    '收藏数': 'collect_count',
+    '评论数': 'comment_count',
+    '分享数': 'share_count',
+    '视频ID': 'aweme_id'
+}
+
+# 评论CSV列名映射
+COMMENT_COLUMN_MAPPING = {
+    '用户id': 'user_id',
+    '用户名': 'user_name',
+    '评论内容': 'content',
+    '评论时间': 'comment_time',
+    'IP地址': 'user_ip',
+    '点赞数': 'like_count',
+    '视频id': 'aweme_id'
+}
+
+VIDEO_NUMERIC_COLUMNS = ['fans_count', 'like_count', 'collect_count', 'comment_count', 'share_count']
+COMMENT_NUMERIC_COLUMNS = ['like_count']
+
+# 读取CSV时按字符串读取的ID列，避免缺失值导致转为float丢失精度
+CSV_DTYPES = {
+    '视频ID': str,
+    '视频id': str,
+    '用户id': str,
+}
+
+# 支持的时间格式，按顺序尝试
+# 爬虫写入的是 "2025-07-19 "，手工导入的数据可能带时分秒
+DATETIME_FORMATS = [
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y/%m/%d',
+    '%m-%d %H:%M',
+]
+
+
+def parse_duration_column(series: pd.Series) -> pd.Series:
+    """
+    向量化解析视频时长列，支持 MM:SS 和 HH:MM:SS，无法解析的值为0
+    :param series: 时长列
+    :return: 秒数列(int64)
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.fillna(0).astype('int64')
+
+    codes, uniques = pd.factorize(series)
+    if len(uniques) == 0:
+        return pd.Series(0, index=series.index, dtype='int64', name=series.name)
+
+    parts = pd.Series(uniques.astype(str)).str.strip().str.split(':', expand=True)
+    n_parts = parts.notna().sum(axis=1).to_numpy()
+    parts = parts.reindex(columns=range(3))
+    numbers = np.column_stack([
+        pd.to_numeric(parts[i], errors='coerce').to_numpy(dtype='float64') for i in range(3)
+    ])
+    # 含非整数部分的时长视为无法解析
+    numbers[np.mod(numbers, 1) != 0] = np.nan
+
+    seconds = np.zeros(len(uniques), dtype='float64')
+    two = n_parts == 2
+    three = n_parts == 3
+    seconds[two] = numbers[two, 0] * 60 + numbers[two, 1]
+    seconds[three] = numbers[three, 0] * 3600 + numbers[three, 1] * 60 + numbers[three, 2]
+    seconds[~np.isfinite(seconds)] = 0
+
+    # 末尾追加0，供缺失值(code=-1)使用
+    lookup = np.append(seconds.astype('int64'), 0)
+    return pd.Series(lookup[codes], index=series.index, name=series.name)
+
+
+def parse_datetime_column(series: pd.Series, formats: List[str] = None) -> pd.Series:
+    """
+    向量化解析时间列，按 DATETIME_FORMATS 依次尝试，无法解析的值为NaT
+    例如: "2025-07-19 " -> Timestamp('2025-07-19')
+    :param series: 时间列
+    :param formats: 时间格式列表，默认使用 DATETIME_FORMATS
+    :return: datetime64列
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+
+    codes, uniques = pd.factorize(series)
+    values = pd.Series(uniques.astype(str)).str.strip()
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for fmt in formats or DATETIME_FORMATS:
+        pending = parsed.isna() & (values != '')
+        if not pending.any():
+            break
+        parsed[pending] = pd.to_datetime(values[pending], format=fmt, errors='coerce')
+
+    lookup = np.append(parsed.to_numpy(), np.datetime64('NaT'))
+    return pd.Series(lookup[codes], index=series.index, name=series.name)
+
+
+def ids_to_str(series: pd.Series) -> pd.Series:
+    """
+    将ID列转换为字符串，重复ID只转换一次，缺失值为None
+    :param series: ID列（int64 / Int64 / 字符串）
+    :return: 字符串ID列
+    """
+    if pd.api.types.is_float_dtype(series):
+        series = series.astype('Int64')
+    codes, uniques = pd.factorize(series)
+    labels = np.asarray(pd.Index(uniques).astype(str), dtype=object)
+    labels = np.append(labels, None)
+    return pd.Series(labels[codes], index=series.index, name=series.name)
+
+
+def coerce_numeric_columns(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """
+    数值列转换，无法转换的值填0
+    :param df: DataFrame
+    :param columns: 数值列
+    :return: DataFrame
+    """
+    for col in columns:
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors='coerce')
+            df[col] = values.where(np.isfinite(values), 0).astype('int64')
+    return df
+
+
+def normalize_video_data(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    视频数据标准化：重命名列、数值转换、解析时长和发布时间、ID转字符串
+    :param df: 原始视频DataFrame
+    :return: 标准化后的DataFrame
+    """
+    df = df.rename(columns=VIDEO_COLUMN_MAPPING)
+    df = coerce_numeric_columns(df, VIDEO_NUMERIC_COLUMNS)
+
+    # 将aweme_id转换为字符串，便于API查找
+    if 'aweme_id' in df.columns:
+        df['aweme_id'] = ids_to_str(df['aweme_id'])
+
+    if 'duration' in df.columns:
+        df['duration'] = parse_duration_column(df['duration'])
+
+    if 'publish_time' in df.columns:
+        df['publish_time'] = parse_datetime_column(df['publish_time'])
+
+    return df
+
+
+def normalize_comment_data(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    评论数据标准化：重命名列、数值转换、解析评论时间、ID转换
+    :param df: 原始评论DataFrame
+    :return: 标准化后的DataFrame
+    """
+    df = df.rename(columns=COMMENT_COLUMN_MAPPING)
+    df = coerce_numeric_columns(df, COMMENT_NUMERIC_COLUMNS)
+
+    if 'user_id' in df.columns:
+        df['user_id'] = pd.to_numeric(df['user_id'], errors='coerce', dtype_backend='numpy_nullable')
+
+    # 将aweme_id转换为字符串，便于筛选
+    if 'aweme_id' in df.columns:
+        df['aweme_id'] = ids_to_str(df['aweme_id'])
+
+    if 'comment_time' in df.columns:
+        df['comment_time'] = parse_datetime_column(df['comment_time'])
+
+    return df
+
+
+def _legacy_parse_duration(duration_str):
+    """逐个解析视频时长的旧实现（"01:59" -> 119秒），仅用于性能对比"""
+    if pd.isna(duration_str) or duration_str == '':
+        return 0
+    parts = str(duration_str).strip().split(':')
+    try:
+        if len(parts) == 2:
+            return int(parts[0]) * 60 + int(parts[1])
+        if len(parts) == 3:
+            return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
+    except (ValueError, TypeError):
+        return 0
+    return 0
+
+
+def _legacy_parse_datetime(datetime_str):
+    """逐个尝试时间格式的旧实现，仅用于性能对比"""
+    if pd.isna(datetime_str) or datetime_str == '':
+        return None
+    datetime_str = str(datetime_str).strip()
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(datetime_str, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _legacy_normalize_video_data(df: pd.DataFrame) -> pd.DataFrame:
+    """逐行解析的旧实现，仅用于性能对比"""
+    df = df.rename(columns=VIDEO_COLUMN_MAPPING)
+    for col in VIDEO_NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    df['aweme_id'] = df['aweme_id'].astype(str)
+    df['duration'] = df['duration'].apply(_legacy_parse_duration)
+    df['publish_time'] = df['publish_time'].apply(_legacy_parse_datetime)
+    return df
+
+
+def benchmark(n_rows: int = 1_000_000, seed: int = 42) -> Dict[str, float]:
+    """
+    在合成的视频CSV上对比逐行解析与向量化标准化的耗时
+    :param n_rows: 行数
+    :param seed: 随机种子
+    :return: {'legacy': 秒, 'vectorized': 秒}
+    """
+    import time
+    from io import StringIO
+
+    rng = np.random.default_rng(seed)
+    minutes = rng.integers(0, 60, n_rows)
+    seconds = rng.integers(0, 60, n_rows)
+    durations = pd.Series([f"{m:02d}:{s:02d}" for m, s in zip(minutes, seconds)])
+    long_rows = rng.random(n_rows) < 0.01
+    durations[long_rows] = '01:' + durations[long_rows]
+    dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 700, n_rows), unit='D')
+    publish_time = dates.strftime('%Y-%m-%d ').to_series(index=range(n_rows))
+    with_time = rng.random(n_rows) < 0.2
+    publish_time[with_time] = dates[with_time].strftime('%Y-%m-%d %H:%M:%S')
+
+    raw = pd.DataFrame({
+        '用户名': rng.integers(0, 50_000, n_rows).astype(str),
+        '粉丝数量': rng.integers(0, 10_000_000, n_rows),
+        '视频描述': '#coser',
+        '发布时间': publish_time,
+        '视频时长': durations,
+        '点赞数': rng.integers(0, 1_000_000, n_rows),
+        '收藏数': rng.integers(0, 100_000, n_rows),
+        '评论数': rng.integers(0, 10_000, n_rows),
+        '分享数': rng.integers(0, 10_000, n_rows),
+        '视频ID': rng.integers(7 * 10 ** 18, 8 * 10 ** 18, n_rows, dtype='int64'),
+    })
+    csv_text = raw.to_csv(index=False)
+
+    timings = {}
+    for name, normalizer, dtype in [('legacy', _legacy_normalize_video_data, None),
+                                    ('vectorized', normalize_video_data, CSV_DTYPES)]:
+        frame = pd.read_csv(StringIO(csv_text), dtype=dtype)
+        start = time.perf_counter()
+        normalizer(frame)
+        timings[name] = round(time.perf_counter() - start, 3)
+    return timings
+
+
+if __name__ == '__main__':
+    # 标准化性能对比: python -m data.normalize
+    print(benchmark())
@@ -0,0 +1,345 @@
+"""
+报告预计算模块 - 后台生成完整分析报告和各视频的评论汇总，视图只读取最近一次完成的快照
+
+ReportRefresher 在后台线程中按 REPORT_REFRESH_INTERVAL 检查数据版本（repo.version() 和数据变化标记，
+数据库中的视频被原地更新时标记也会变化），版本变化时重新生成报告（data.report.ReportEngine）和各视频汇总，
+生成完成后整体替换快照：
+    - 进程内：替换快照对象的引用，读取方拿到的总是完整的一份；
+    - 文件：写临时文件后 os.replace，其他进程（如单独运行的 python -m data.precompute）生成的快照
+      也能被视图进程读取。
+多个worker进程各有一个刷新线程，生成前获取锁文件，同一版本只由一个进程生成，其他进程读取它发布的快照。
+视图读取快照不会等待分析计算；还没有任何快照时启动后台生成并返回None。
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import pandas as pd
+
+from config import Config
+from data.dataset import data_change_token
+from data.report import ReportEngine
+from data.repository import get_repository
+from data.streaming import iter_comment_chunks
+
+logger = logging.getLogger(__name__)
+
+# 快照文件格式版本
+FORMAT_VERSION = 1
+
+# 视频汇总使用的列
+SUMMARY_VIDEO_COLUMNS = ['aweme_id', 'user_name', 'description', 'like_count', 'fans_count']
+SUMMARY_COMMENT_COLUMNS = ['aweme_id', 'like_count', 'comment_time', 'user_ip']
+
+# 每个视频保留的IP数量
+SUMMARY_TOP_IPS = 3
+
+# 生成锁超过该时间（秒）未释放时视为持有锁的进程已退出
+LOCK_TIMEOUT = 600
+
+
+def _comment_partials(chunk: pd.DataFrame):
+    """一块评论数据的按视频汇总：(数量、点赞、首末评论时间, 各IP评论数)，aweme_id、user_ip为类别时按编码分组"""
+    chunk = chunk.assign(like_count=chunk['like_count'].fillna(0))
+    totals = chunk.groupby('aweme_id', observed=True, sort=False).agg(
+        comments=('like_count', 'size'),
+        comment_likes=('like_count', 'sum'),
+        first_comment=('comment_time', 'min'),
+        last_comment=('comment_time', 'max'),
+    )
+    ips = chunk.groupby(['aweme_id', 'user_ip'], observed=True, sort=False).size()
+    totals.index = totals.index.astype(str)
+    ips.index = ips.index.set_levels([level.astype(str) for level in ips.index.levels])
+    return totals, ips
+
+
+def data_version() -> str:
+    """
+    快照对应的数据版本：数据仓库版本 + 数据变化标记
+    :return: 版本字符串
+    """
+    return f'{get_repository().version()}+{data_change_token()}'
+
+
+def build_video_summaries() -> Dict[str, Dict]:
+    """
+    各视频的评论汇总：评论数、评论点赞合计、首末评论时间、评论最多的IP
+    开启流式分析时逐块读取评论，各块的中间结果合并
+    :return: {aweme_id: 汇总}
+    """
+    repo = get_repository()
+    videos = repo.videos(columns=SUMMARY_VIDEO_COLUMNS)
+    if videos.empty:
+        return {}
+
+    if Config.COMMENT_STREAMING_ENABLED and Config.DATASET_BACKEND == 'csv':
+        chunks = iter_comment_chunks(columns=SUMMARY_COMMENT_COLUMNS)
+    else:
+        chunks = [repo.comments(columns=SUMMARY_COMMENT_COLUMNS)]
+
+    totals, ips = [], []
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        chunk_totals, chunk_ips = _comment_partials(chunk)
+        totals.append(chunk_totals)
+        ips.append(chunk_ips)
+
+    if totals:
+        totals = pd.concat(totals).groupby(level=0).agg(
+            {'comments': 'sum', 'comment_likes': 'sum', 'first_comment': 'min', 'last_comment': 'max'})
+        ips = pd.concat(ips).groupby(level=[0, 1]).sum()
+        ips = ips.sort_values(ascending=False, kind='stable').groupby(level=0).head(SUMMARY_TOP_IPS)
+    else:
+        totals, ips = pd.DataFrame(), pd.Series(dtype='int64')
+
+    top_ips: Dict[str, Dict[str, int]] = {}
+    for (aweme_id, ip), count in ips.items():
+        top_ips.setdefault(aweme_id, {})[ip] = int(count)
+
+    summaries = {}
+    videos = videos.drop_duplicates('aweme_id')
+    for video in videos.itertuples(index=False):
+        aweme_id = str(video.aweme_id)
+        summary = {
+            'aweme_id': aweme_id,
+            'user_name': '' if pd.isna(video.user_name) else str(video.user_name),
+            'description': '' if pd.isna(video.description) else str(video.description),
+            'like_count': int(video.like_count),
+            'fans_count': int(video.fans_count),
+            'comments': 0,
+            'comment_likes': 0,
+            'first_comment': None,
+            'last_comment': None,
+            'top_ips': top_ips.get(aweme_id, {}),
+        }
+        if aweme_id in totals.index:
+            row = totals.loc[aweme_id]
+            summary['comments'] = int(row['comments'])
+            summary['comment_likes'] = int(row['comment_likes'])
+            for col in ('first_comment', 'last_comment'):
+                if pd.notna(row[col]):
+                    summary[col] = row[col].strftime('%Y-%m-%d %H:%M:%S')
+        summaries[aweme_id] = summary
+    return summaries
+
+
+class ReportSnapshot:
+    """一次完成的预计算结果（生成后不再修改）"""
+
+    def __init__(self, version: str, report: Dict, video_summaries: Dict[str, Dict], built_at: str,
+                 build_ms: float, errors: Optional[Dict[str, str]] = None):
+        self.version = version
+        self.report = report
+        self.video_summaries = video_summaries
+        self.built_at = built_at
+        self.build_ms = build_ms
+        self.errors = errors or {}
+
+    def to_dict(self) -> Dict:
+        return {
+            'format': FORMAT_VERSION,
+            'version': self.version,
+            'report': self.report,
+            'video_summaries': self.video_summaries,
+            'built_at': self.built_at,
+            'build_ms': self.build_ms,
+            'errors': self.errors,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ReportSnapshot':
+        return cls(data['version'], data['report'], data['video_summaries'], data['built_at'],
+                   data['build_ms'], data.get('errors'))
+
+
+class ReportRefresher:
+    """
+    后台报告刷新
+
+    latest() 返回最近一次完成的快照（不等待计算），refresh() 在数据版本变化时生成新快照，
+    start() 启动后台线程循环调用 refresh()。
+    """
+
+    def __init__(self, path: Optional[str] = None, interval: Optional[float] = None):
+        self.path = path
+        self.interval = interval
+        self._snapshot: Optional[ReportSnapshot] = None
+        self._file_signature = None
+        # 同一进程内只有一个线程生成报告
+        self._build_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _path(self) -> str:
+        return self.path or str(Config.REPORT_SNAPSHOT_PATH)
+
+    def _load(self):
+        """其他进程发布了新快照时读取"""
+        path = self._path()
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._file_signature:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._file_signature = signature
+            if data.get('format') != FORMAT_VERSION:
+                return
+            snapshot = ReportSnapshot.from_dict(data)
+            if self._snapshot is None or snapshot.built_at >= self._snapshot.built_at:
+                self._snapshot = snapshot
+        except Exception as e:
+            logger.error(f"读取报告快照失败: {e}")
+
+    def _publish(self, snapshot: ReportSnapshot):
+        """发布快照：先写文件（临时文件 + os.replace），再替换进程内的引用"""
+        path = self._path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot.to_dict(), f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+            stat = os.stat(path)
+            self._file_signature = (stat.st_mtime_ns, stat.st_size)
+        except Exception as e:
+            logger.error(f"写入报告快照失败: {e}")
+        self._snapshot = snapshot
+
+    def _try_lock(self) -> Optional[str]:
+        """
+        获取生成锁（锁文件），已被其他进程持有时返回None，避免多个worker同时生成同一版本的报告
+        :return: 锁文件路径
+        """
+        lock_path = self._path() + '.lock'
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        try:
+            if time.time() - os.path.getmtime(lock_path) > LOCK_TIMEOUT:
+                os.remove(lock_path)
+        except OSError:
+            pass
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return None
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        return lock_path
+
+    def latest(self) -> Optional[ReportSnapshot]:
+        """
+        最近一次完成的快照，不等待计算（首次调用时启动后台刷新线程）
+        关闭 REPORT_REFRESH_ENABLED 时在当前线程中刷新（数据版本变化时阻塞）
+        :return: ReportSnapshot，还没有生成过时返回None
+        """
+        if not Config.REPORT_REFRESH_ENABLED:
+            self.refresh()
+            return self._snapshot
+
+        self.start()
+        self._load()
+        return self._snapshot
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        数据版本变化时重新生成报告和视频汇总（其他进程正在生成时直接返回，之后读取它发布的快照）
+        :param force: 版本未变化时也重新生成
+        :return: 是否发布了新快照
+        """
+        with self._build_lock:
+            self._load()
+            version = data_version()
+            if not force and self._snapshot is not None and self._snapshot.version == version:
+                return False
+
+            lock_path = self._try_lock()
+            if lock_path is None:
+                logger.info("其他进程正在生成报告快照，跳过本次刷新")
+                return False
+            try:
+                # 等待锁期间其他进程可能已发布了这个版本
+                self._load()
+                if not force and self._snapshot is not None and self._snapshot.version == version:
+                    return False
+                self._build(version)
+                return True
+            finally:
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+
+    def _build(self, version: str):
+        """生成并发布快照"""
+        start = time.perf_counter()
+        engine = ReportEngine()
+        report = engine.build()
+        try:
+            summaries = build_video_summaries()
+        except Exception as e:
+            logger.error(f"生成视频汇总失败: {e}")
+            engine.errors['video_summaries'] = str(e)
+            summaries = self._snapshot.video_summaries if self._snapshot is not None else {}
+
+        build_ms = round((time.perf_counter() - start) * 1000, 2)
+        self._publish(ReportSnapshot(version, report, summaries, datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                                     build_ms, dict(engine.errors)))
+        logger.info(f"报告快照已更新: 版本 {version}, 耗时 {build_ms}ms")
+
+    def _run(self):
+        interval = self.interval or Config.REPORT_REFRESH_INTERVAL
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"后台刷新报告失败: {e}")
+            self._stop.wait(interval)
+
+    def start(self):
+        """启动后台刷新线程（已启动时不重复启动）"""
+        if not Config.REPORT_REFRESH_ENABLED:
+            return
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='report-refresher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止后台刷新线程"""
+        self._stop.set()
+        with self._thread_lock:
+            if self._thread is not None:
+                self._thread.join(timeout)
+                self._thread = None
+
+
+# 全局报告刷新器
+report_refresher = ReportRefresher()
+
+
+if __name__ == '__main__':
+    # 单独运行刷新循环（与Web进程共享快照文件）: python -m data.precompute [间隔秒数]
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    interval = float(sys.argv[1]) if len(sys.argv) > 1 else Config.REPORT_REFRESH_INTERVAL
+    refresher = ReportRefresher(interval=interval)
+    try:
+        while True:
+            refresher.refresh()
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,457 @@
+"""
+分析报告模块 - 一次加载数据，在同一份DataFrame上计算完整分析报告的各个部分
+
+DataAnalyzer 的各个统计方法分别从数据仓库取数，仪表盘一次生成完整报告时会重复取数、重复排序。
+ReportEngine 只取一次视频数据和评论IP列，点赞排行只取一次供热门视频、点赞收藏关系共用，
+数值统计使用可合并统计（data.stats_sketch），各部分单独计时、单独捕获异常。
+取数之后各部分互相独立，在线程池中并行计算（pandas/numpy的多数计算释放GIL），每个部分有超时，
+超时或失败的部分返回默认值并记录在 errors 中，报告耗时取决于最慢的部分；
+CPU密集的部分可以配置到进程池中计算（Config.REPORT_PROCESS_SECTIONS）。
+开启预计算聚合（Config.MATERIALIZED_AGGREGATES_ENABLED）时各部分直接读取聚合表，见 data.aggregates。
+有筛选条件（data.filters）时不使用聚合表，视频数据、评论IP列取筛选后的行（筛选掩码按数据版本缓存）。
+
+compute_* 函数只做计算，DataAnalyzer 的单项统计方法也使用这些函数，结果格式与原接口一致。
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from data.filters import (FilterSpec, is_filtered, filtered_videos, filtered_comments, filtered_video_ids,
+                          count_filtered)
+from data.repository import DatasetRepository, get_repository
+from data.stats_sketch import exact_result
+from data.streaming import stream_ip_distribution
+
+logger = logging.getLogger(__name__)
+
+# 粉丝数量区间
+FANS_BINS = [-1, 100, 1000, 10000, 100000, float('inf')]
+FANS_LABELS = ['0-99', '100-999', '1000-9999', '10000-99999', '100000+']
+
+# 视频数值统计的列
+NUMERIC_COLUMNS = ['comment_count', 'like_count', 'share_count', 'collect_count']
+
+# 热门视频返回的列
+TOP_VIDEO_COLUMNS = ['aweme_id', 'user_name', 'description', 'like_count', 'comment_count', 'share_count',
+                     'collect_count']
+
+# 报告各部分（顺序即报告中的顺序）
+REPORT_SECTIONS = [
+    'general_statistics',
+    'user_ip_distribution',
+    'like_collect_relation',
+    'fans_distribution',
+    'top_users',
+    'top_videos',
+    'video_statistics',
+    'publish_time_distribution',
+]
+
+
+def compute_ip_distribution(comment_data: pd.DataFrame, top_n: int = 10) -> Dict[str, int]:
+    """
+    统计IP地址分布
+    :param comment_data: 评论数据（至少包含user_ip列）
+    :param top_n: 返回前N个IP
+    :return: IP分布字典
+    """
+    if comment_data.empty or 'user_ip' not in comment_data.columns:
+        return {}
+
+    # user_ip为category时按编码计数，去掉未出现的类别；次数相同的按IP排序（与预计算聚合表一致）
+    counts = comment_data['user_ip'].value_counts(sort=False)
+    counts = counts[counts > 0]
+    counts.index = counts.index.astype(str)
+    counts = counts.sort_index().sort_values(ascending=False, kind='stable').head(top_n)
+    return {k: int(v) for k, v in counts.items()}
+
+
+def compute_like_collect_relation(top_liked: pd.DataFrame) -> Dict[str, any]:
+    """
+    计算收藏/点赞比
+    :param top_liked: 按点赞数降序排列的视频（已截取前N条）
+    :return: {'data': [...]}
+    """
+    if top_liked.empty:
+        return {}
+
+    result = top_liked[['description', 'like_count', 'collect_count']].copy()
+    result['ratio'] = (result['collect_count'] / result['like_count']).round(4)
+    return {'data': result.to_dict('records')}
+
+
+def compute_fans_distribution(video_data: pd.DataFrame) -> Dict[str, int]:
+    """
+    粉丝数量区间分布
+    :param video_data: 视频数据（至少包含fans_count列）
+    :return: {区间: 视频数}
+    """
+    if video_data.empty or 'fans_count' not in video_data.columns:
+        return {}
+
+    fans_range = pd.cut(video_data['fans_count'], bins=FANS_BINS, labels=FANS_LABELS)
+    return fans_range.value_counts().to_dict()
+
+
+def compute_top_users(video_data: pd.DataFrame, limit: int = 10) -> List[Dict]:
+    """
+    粉丝数量排行（同名用户取第一条）
+    :param video_data: 视频数据（至少包含user_name、fans_count列）
+    :param limit: 返回数量
+    :return: 用户排行列表
+    """
+    if video_data.empty or 'user_name' not in video_data.columns or 'fans_count' not in video_data.columns:
+        return []
+
+    result = video_data[['user_name', 'fans_count']] \
+        .drop_duplicates('user_name') \
+        .sort_values('fans_count', ascending=False, kind='stable') \
+        .head(limit)
+    return result.to_dict('records')
+
+
+def compute_video_statistics(video_data: pd.DataFrame) -> Dict[str, Dict]:
+    """
+    视频数值统计：各列的合计、均值、最大、最小、中位数以及 p50 / p90 / p99
+    :param video_data: 视频数据
+    :return: {列名: 统计结果}
+    """
+    columns = [col for col in NUMERIC_COLUMNS if col in video_data.columns]
+    if video_data.empty or not columns:
+        return {}
+
+    # 整列数据已在内存中，分位数精确计算（草图只用于增量更新的聚合表）
+    stats = {}
+    for col in columns:
+        result = exact_result(video_data[col])
+        if result:
+            stats[col] = result
+    return stats
+
+
+def compute_publish_time_distribution(video_data: pd.DataFrame) -> Dict[str, int]:
+    """
+    视频发布时间分布（按小时）
+    :param video_data: 视频数据（至少包含publish_time列）
+    :return: {小时: 视频数}，只包含有视频的小时
+    """
+    if video_data.empty or 'publish_time' not in video_data.columns:
+        return {}
+
+    # publish_time 在加载时已解析为时间类型，按小时直接计数
+    publish_time = video_data['publish_time']
+    if not pd.api.types.is_datetime64_any_dtype(publish_time):
+        publish_time = pd.to_datetime(publish_time)
+    hours = publish_time.dt.hour.dropna().to_numpy(dtype='int64')
+    counts = np.bincount(hours, minlength=24)
+    return {str(hour): int(count) for hour, count in enumerate(counts) if count > 0}
+
+
+# 可在进程池中计算的部分（只依赖数据帧）：部分名称 -> (计算函数, 数据源, 需要的列)
+PROCESS_SECTIONS = {
+    'user_ip_distribution': (compute_ip_distribution, 'comment', ['user_ip']),
+    'fans_distribution': (compute_fans_distribution, 'video', ['fans_count']),
+    'video_statistics': (compute_video_statistics, 'video', NUMERIC_COLUMNS),
+    'publish_time_distribution': (compute_publish_time_distribution, 'video', ['publish_time']),
+}
+
+# 进程池（首次使用时创建，各次报告共用）
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    获取报告计算的进程池（spawn方式启动，避免在多线程的Web进程中fork）
+    :return: ProcessPoolExecutor
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=Config.REPORT_PROCESS_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return _process_pool
+
+
+class ReportEngine:
+    """
+    完整分析报告：视频数据、评论IP列各取一次，所有部分在同一份数据上计算
+
+    timings 记录各部分耗时（毫秒），errors 记录失败或超时部分的异常信息。
+    """
+
+    def __init__(self, repository: Optional[DatasetRepository] = None, limit: int = 10,
+                 filters: Optional[FilterSpec] = None, parallel: Optional[bool] = None):
+        self.repository = repository or get_repository()
+        self.limit = limit
+        self.filters = filters if is_filtered(filters) else None
+        self.parallel = Config.REPORT_PARALLEL_ENABLED if parallel is None else parallel
+        self.timings: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        # 并行计算时，多个部分共用的延迟取数（点赞排行、聚合表条数不够时的数据帧）只执行一次
+        self._lock = threading.Lock()
+
+        self._video_data: Optional[pd.DataFrame] = None
+        self._comment_data: Optional[pd.DataFrame] = None
+        self._top_liked: Optional[pd.DataFrame] = None
+        self._aggregates = None
+
+    def _load(self):
+        """
+        取数：开启预计算聚合时只合并聚合表的新增行，Dask模式下各分区并行聚合，
+        否则视频数据取全部列，评论数据只取IP列（流式模式下不加载评论）
+        """
+        if Config.MATERIALIZED_AGGREGATES_ENABLED and self.filters is None:
+            from data.aggregates import materialized_aggregates
+            materialized_aggregates.refresh()
+            self._aggregates = materialized_aggregates
+            return
+        if self.filters is None:
+            from data.dask_engine import compute_aggregates
+            self._aggregates = compute_aggregates()
+            if self._aggregates is not None:
+                return
+        self._load_frames()
+
+    def _load_frames(self):
+        if self.filters is not None:
+            self._video_data = filtered_videos(self.filters)
+        else:
+            self._video_data = self.repository.videos()
+
+        if Config.COMMENT_STREAMING_ENABLED:
+            self._comment_data = None
+        elif self.filters is not None:
+            self._comment_data = filtered_comments(self.filters, columns=['user_ip'])
+        else:
+            self._comment_data = self.repository.comments(columns=['user_ip'])
+
+    def _top_liked_videos(self) -> pd.DataFrame:
+        """按点赞数降序取前N条，热门视频与点赞收藏关系共用"""
+        with self._lock:
+            if self._top_liked is None:
+                self._top_liked = self._load_top_liked()
+        return self._top_liked
+
+    def _load_top_liked(self) -> pd.DataFrame:
+        video_data = self._video_data
+        if video_data.empty or 'like_count' not in video_data.columns:
+            return video_data.iloc[0:0]
+        if self.filters is not None:
+            return filtered_videos(self.filters, order=['-like_count'], limit=self.limit)
+        # CSV后端直接取排行索引的前N条，数据库后端为 ORDER BY ... LIMIT
+        return self.repository.videos(order=['-like_count'], limit=self.limit)
+
+    def general_statistics(self) -> Dict[str, int]:
+        if self._comment_data is None and self.filters is not None:
+            total_comments = count_filtered(self.filters)['total_comments']
+        elif self._comment_data is None:
+            total_comments = self.repository.count_comments()
+        else:
+            total_comments = len(self._comment_data)
+        return {
+            'total_videos': len(self._video_data),
+            'total_comments': total_comments,
+        }
+
+    def user_ip_distribution(self) -> Dict[str, int]:
+        if self._comment_data is None:
+            aweme_ids = filtered_video_ids(self.filters) if self.filters is not None else None
+            return stream_ip_distribution(top_n=10, aweme_ids=aweme_ids)
+        return compute_ip_distribution(self._comment_data, top_n=10)
+
+    def like_collect_relation(self) -> Dict[str, any]:
+        return compute_like_collect_relation(self._top_liked_videos())
+
+    def fans_distribution(self) -> Dict[str, int]:
+        return compute_fans_distribution(self._video_data)
+
+    def top_users(self) -> List[Dict]:
+        if self._video_data.empty:
+            return []
+        if self.filters is not None:
+            return compute_top_users(self._video_data, self.limit)
+        return self.repository.top_users(self.limit).to_dict('records')
+
+    def top_videos(self) -> List[Dict]:
+        top_liked = self._top_liked_videos()
+        columns = [col for col in TOP_VIDEO_COLUMNS if col in top_liked.columns]
+        return top_liked[columns].to_dict('records')
+
+    def video_statistics(self) -> Dict[str, Dict]:
+        return compute_video_statistics(self._video_data)
+
+    def publish_time_distribution(self) -> Dict[str, int]:
+        return compute_publish_time_distribution(self._video_data)
+
+    @staticmethod
+    def _default(section: str):
+        """部分失败时的默认值，与 DataAnalyzer 各方法失败时的返回值一致"""
+        if section == 'general_statistics':
+            return {'total_videos': 0, 'total_comments': 0}
+        if section in ('top_users', 'top_videos'):
+            return []
+        return {}
+
+    def _in_process(self, section: str):
+        """
+        在进程池中计算一个部分（只传入需要的列）
+        :param section: 部分名称
+        :return: 计算结果，数据不在内存中（如流式模式下的评论）时返回None
+        """
+        func, source, columns = PROCESS_SECTIONS[section]
+        data = self._video_data if source == 'video' else self._comment_data
+        if data is None:
+            return None
+        data = data[[col for col in columns if col in data.columns]]
+        return get_process_pool().submit(func, data).result()
+
+    def _run_section(self, section: str, func: Callable):
+        """执行一个部分并计时，异常时返回默认值"""
+        start = time.perf_counter()
+        try:
+            if self._aggregates is not None:
+                result = self._aggregates.section(section, self.limit, refresh=False)
+                if result is not None:
+                    return result
+                # 聚合表保存的排行条数不够时实时计算
+                with self._lock:
+                    if self._video_data is None:
+                        self._load_frames()
+            elif section in PROCESS_SECTIONS and section in Config.REPORT_PROCESS_SECTIONS:
+                result = self._in_process(section)
+                if result is not None:
+                    return result
+            return func()
+        except Exception as e:
+            logger.error(f"生成报告部分 {section} 失败: {e}")
+            self.errors[section] = str(e)
+            return self._default(section)
+        finally:
+            self.timings[section] = round((time.perf_counter() - start) * 1000, 2)
+
+    def _run_section_in_thread(self, section: str):
+        """线程池中执行一个部分，数据库后端结束时关闭本线程的数据库连接"""
+        try:
+            return self._run_section(section, getattr(self, section))
+        finally:
+            if Config.DATASET_BACKEND == 'orm':
+                from django.db import connections
+                connections.close_all()
+
+    def _run_parallel(self, start: float) -> Dict[str, any]:
+        """
+        各部分在线程池中并行计算，超时（从报告开始计算）的部分返回默认值
+        :param start: 报告开始时间（perf_counter）
+        :return: {部分名称: 结果}
+        """
+        timeout = Config.REPORT_SECTION_TIMEOUT
+        executor = ThreadPoolExecutor(max_workers=Config.REPORT_MAX_WORKERS or len(REPORT_SECTIONS),
+                                      thread_name_prefix='report-section')
+        try:
+            futures = {section: executor.submit(self._run_section_in_thread, section) for section in REPORT_SECTIONS}
+            remaining = None if timeout is None else max(0.0, timeout - (time.perf_counter() - start))
+            wait(futures.values(), timeout=remaining)
+        finally:
+            # 超时的部分不再等待（已开始的线程结束后自行退出）
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        report = {}
+        for section, future in futures.items():
+            if future.done() and not future.cancelled():
+                report[section] = future.result()
+            else:
+                logger.error(f"生成报告部分 {section} 超时（{timeout}秒）")
+                self.errors[section] = f"超时（{timeout}秒）"
+                self.timings[section] = round((time.perf_counter() - start) * 1000, 2)
+                report[section] = self._default(section)
+        return report
+
+    def build(self) -> Dict[str, any]:
+        """
+        生成完整分析报告
+        :return: {部分名称: 结果}，结构与 DataAnalyzer.generate_full_analysis_report() 一致
+        """
+        logger.info("开始生成完整分析报告...")
+        self.timings = {}
+        self.errors = {}
+        self._top_liked = None
+        self._aggregates = None
+
+        start = time.perf_counter()
+        try:
+            self._load()
+        except Exception as e:
+            logger.error(f"加载报告数据失败: {e}")
+            self.errors['load'] = str(e)
+            return {section: self._default(section) for section in REPORT_SECTIONS}
+        finally:
+            self.timings['load'] = round((time.perf_counter() - start) * 1000, 2)
+
+        if self.parallel:
+            report = self._run_parallel(start)
+        else:
+            report = {section: self._run_section(section, getattr(self, section)) for section in REPORT_SECTIONS}
+        self.timings['total'] = round((time.perf_counter() - start) * 1000, 2)
+
+        logger.info(f"完整分析报告生成完成，耗时 {self.timings['total']}ms")
+        logger.debug(f"报告各部分耗时(ms): {self.timings}")
+        return report
+
+
+def build_full_report() -> Dict[str, any]:
+    """
+    生成完整分析报告
+    :return: 分析报告
+    """
+    return ReportEngine().build()
+
+
+def benchmark(rounds: int = 5) -> Dict[str, float]:
+    """
+    对比逐项生成与单次取数生成完整报告的耗时（数据已缓存）
+    :param rounds: 重复次数
+    :return: {'per_section_ms': 逐项平均耗时, 'engine_ms': 单次取数平均耗时}
+    """
+    from data.analyzer import DataAnalyzer
+
+    def per_section():
+        return {
+            'general_statistics': DataAnalyzer.get_general_statistics(),
+            'user_ip_distribution': DataAnalyzer.analyze_user_ip_distribution(),
+            'like_collect_relation': DataAnalyzer.analyze_like_collect_relation(),
+            'fans_distribution': DataAnalyzer.categorize_fans_distribution(),
+            'top_users': DataAnalyzer.get_top_users_by_fans(limit=10),
+            'top_videos': DataAnalyzer.get_top_videos_by_likes(limit=10),
+            'video_statistics': DataAnalyzer.analyze_video_statistics(),
+            'publish_time_distribution': DataAnalyzer.analyze_publish_time_distribution(),
+        }
+
+    # 预热：解析CSV或读取快照
+    per_section()
+
+    results = {}
+    for name, func in [('per_section_ms', per_section), ('engine_ms', build_full_report)]:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        results[name] = round((time.perf_counter() - start) * 1000 / rounds, 2)
+    return results
+
+
+if __name__ == '__main__':
+    # 对比报告生成耗时: python -m data.report
+    logging.basicConfig(level=logging.WARNING)
+    print(benchmark())
+
+    engine = ReportEngine()
+    engine.build()
+    print(engine.timings)
@@ -0,0 +1,502 @@
+"""
+数据仓库模块 - 视频、评论数据的统一查询接口
+
+视图和分析模块通过 get_repository() 获取数据，不再区分数据来自CSV还是数据库：
+    repo.videos(filters={'like_count__gte': 1000}, columns=['aweme_id', 'like_count'],
+                order=['-like_count'], limit=10)
+
+后端由 Config.DATASET_BACKEND 选择：
+    'csv' - 共享数据集缓存（data.dataset），在内存中筛选、排序
+    'orm' - Django ORM（VideoData / CommentData），筛选、列、排序、分页都转换为SQL执行
+
+查询条件使用英文列名（与 data.normalize 中的映射一致），支持的写法：
+    {'aweme_id': '123'}            等于
+    {'like_count__gte': 1000}      gt / gte / lt / lte
+    {'user_ip__in': ['广东', '四川']}
+    {'description__contains': '猫'}
+    {'description__iregex': r'#猫(?:\s|#|$)'}   正则匹配，不区分大小写
+    {'publish_time__isnull': False}
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from data.dataset import (load_video_data, load_comment_data, get_video, get_video_comments, dataset_version,
+                          data_change_token, get_video_rank_index, top_positions, RankIndex)
+from data.normalize import VIDEO_NUMERIC_COLUMNS, COMMENT_NUMERIC_COLUMNS, coerce_numeric_columns, ids_to_str
+
+logger = logging.getLogger(__name__)
+
+# 英文列名 -> 模型字段名（顺序与CSV标准化后的列顺序一致）
+VIDEO_FIELDS = {
+    'user_name': 'userName',
+    'fans_count': 'fansCount',
+    'description': 'description',
+    'publish_time': 'publishTime',
+    'duration': 'duration',
+    'like_count': 'likeCount',
+    'collect_count': 'collectCount',
+    'comment_count': 'commentCount',
+    'share_count': 'shareCount',
+    'aweme_id': 'awemeId',
+}
+
+COMMENT_FIELDS = {
+    'user_id': 'userId',
+    'user_name': 'userName',
+    'content': 'content',
+    'comment_time': 'commentTime',
+    'user_ip': 'userIP',
+    'like_count': 'likeCount',
+    'aweme_id': 'awemeId',
+}
+
+# 模型中以文本存储的数值字段，筛选和排序时先转换为整数
+VIDEO_TEXT_NUMERIC_COLUMNS = ['duration', 'comment_count']
+
+# 支持的查询操作
+LOOKUPS = ('exact', 'in', 'gt', 'gte', 'lt', 'lte', 'contains', 'iregex', 'isnull')
+
+
+def split_lookup(key: str) -> Tuple[str, str]:
+    """
+    拆分查询条件
+    例如: 'like_count__gte' -> ('like_count', 'gte')
+    :param key: 查询条件
+    :return: (列名, 操作)
+    """
+    column, _, lookup = key.partition('__')
+    lookup = lookup or 'exact'
+    if lookup not in LOOKUPS:
+        raise ValueError(f"不支持的查询操作: {key}")
+    return column, lookup
+
+
+def split_order(order: str) -> Tuple[str, bool]:
+    """
+    拆分排序条件
+    例如: '-like_count' -> ('like_count', False)
+    :param order: 排序条件
+    :return: (列名, 是否升序)
+    """
+    if order.startswith('-'):
+        return order[1:], False
+    return order, True
+
+
+class DatasetRepository(ABC):
+    """
+    数据仓库接口（抽象基类，后端未实现全部查询方法时无法实例化）
+
+    filters: 查询条件字典，见模块说明
+    columns: 返回的列，None表示全部
+    order: 排序列列表，'-' 前缀表示降序
+    limit / offset: 分页
+    """
+
+    @abstractmethod
+    def videos(self, filters: Optional[Dict] = None, columns: Optional[List[str]] = None,
+               order: Optional[List[str]] = None, limit: Optional[int] = None, offset: int = 0) -> pd.DataFrame:
+        """查询视频数据"""
+
+    @abstractmethod
+    def comments(self, filters: Optional[Dict] = None, columns: Optional[List[str]] = None,
+                 order: Optional[List[str]] = None, limit: Optional[int] = None, offset: int = 0) -> pd.DataFrame:
+        """查询评论数据"""
+
+    @abstractmethod
+    def count_videos(self, filters: Optional[Dict] = None) -> int:
+        """统计视频数量"""
+
+    @abstractmethod
+    def count_comments(self, filters: Optional[Dict] = None) -> int:
+        """统计评论数量"""
+
+    def top_users(self, limit: int = 10) -> pd.DataFrame:
+        """
+        粉丝数量排行：同名用户取第一条，按粉丝数降序
+        :param limit: 返回数量
+        :return: DataFrame（user_name, fans_count）
+        """
+        df = self.videos(columns=['user_name', 'fans_count'])
+        if df.empty:
+            return df
+        return df.drop_duplicates('user_name').sort_values('fans_count', ascending=False, kind='stable').head(limit)
+
+    @abstractmethod
+    def version(self) -> str:
+        """
+        数据版本，数据变化时改变（用于接口缓存的ETag）
+        :return: 版本字符串
+        """
+
+    def get_video(self, aweme_id) -> Optional[pd.Series]:
+        """
+        获取单条视频数据
+        :param aweme_id: 视频ID
+        :return: 视频数据（Series），不存在时返回None
+        """
+        df = self.videos(filters={'aweme_id': str(aweme_id)}, limit=1)
+        return None if df.empty else df.iloc[0]
+
+    def video_comments(self, aweme_id, columns: Optional[List[str]] = None, order: Optional[List[str]] = None,
+                       limit: Optional[int] = None, offset: int = 0) -> pd.DataFrame:
+        """
+        查询指定视频的评论
+        :param aweme_id: 视频ID
+        :return: DataFrame
+        """
+        return self.comments(filters={'aweme_id': str(aweme_id)}, columns=columns, order=order,
+                             limit=limit, offset=offset)
+
+
+class CsvRepository(DatasetRepository):
+    """CSV后端：基于共享数据集缓存，在内存中执行查询"""
+
+    @staticmethod
+    def _mask(series: pd.Series, lookup: str, value) -> np.ndarray:
+        """
+        计算单个查询条件的布尔掩码
+        :param series: 列
+        :param lookup: 操作
+        :param value: 值
+        :return: 布尔数组
+        """
+        if series.name == 'aweme_id' and lookup in ('exact', 'in'):
+            value = [str(v) for v in value] if lookup == 'in' else str(value)
+
+        if lookup == 'exact':
+            mask = series == value
+        elif lookup == 'in':
+            mask = series.isin(value)
+        elif lookup == 'gt':
+            mask = series > value
+        elif lookup == 'gte':
+            mask = series >= value
+        elif lookup == 'lt':
+            mask = series < value
+        elif lookup == 'lte':
+            mask = series <= value
+        elif lookup == 'contains':
+            mask = series.astype(str).str.contains(str(value), regex=False, na=False)
+        elif lookup == 'iregex':
+            mask = series.astype(str).str.contains(str(value), case=False, regex=True, na=False)
+        else:
+            mask = series.isna() if value else series.notna()
+        return np.asarray(mask.fillna(False) if mask.dtype != bool else mask, dtype=bool)
+
+    @staticmethod
+    def _ordered_positions(df: pd.DataFrame, mask: Optional[np.ndarray], keys: List[Tuple[str, bool]],
+                           limit: Optional[int], offset: int,
+                           rank_index: Optional[RankIndex]) -> Optional[np.ndarray]:
+        """
+        单列排序时不对整个DataFrame排序，直接得到结果行的位置
+            - 降序且有排行索引：取索引（按筛选条件过滤后）的切片；
+            - 数值列且有limit：部分排序，只排序可能进入前 offset+limit 的行
+        :return: 行位置数组，不适用时返回None（整表排序）
+        """
+        if len(keys) != 1:
+            return None
+        column, ascending = keys[0]
+        end = None if limit is None else offset + limit
+
+        if not ascending and rank_index is not None and column in rank_index.positions:
+            ranked = rank_index.positions[column]
+            if mask is not None:
+                ranked = ranked[mask[ranked]]
+            return ranked[offset:end]
+
+        series = df[column]
+        if end is None or not (pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)):
+            return None
+        if mask is None:
+            return top_positions(series, end, ascending)[offset:]
+        candidates = np.flatnonzero(mask)
+        return candidates[top_positions(series.iloc[candidates], end, ascending)][offset:]
+
+    @classmethod
+    def query(cls, df: pd.DataFrame, filters: Optional[Dict] = None, columns: Optional[List[str]] = None,
+              order: Optional[List[str]] = None, limit: Optional[int] = None, offset: int = 0,
+              rank_index: Optional[RankIndex] = None, mask: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """
+        在DataFrame上执行查询
+        :param df: 标准化后的DataFrame
+        :param rank_index: df的排行索引，按索引中的列降序排序时直接切片
+        :param mask: 预先计算的布尔掩码（如 data.filters 缓存的筛选掩码），与filters同时生效，不会被修改
+        :return: 查询结果
+        """
+        if df.empty:
+            return df
+
+        if filters:
+            mask = np.ones(len(df), dtype=bool) if mask is None else mask.copy()
+            for key, value in filters.items():
+                column, lookup = split_lookup(key)
+                mask &= cls._mask(df[column], lookup, value)
+
+        if order:
+            keys = [split_order(o) for o in order]
+            positions = cls._ordered_positions(df, mask, keys, limit, offset, rank_index)
+            if positions is not None:
+                df = df.iloc[positions]
+                return df if columns is None else df[columns]
+
+        if mask is not None:
+            df = df[mask]
+
+        if order:
+            df = df.sort_values([k for k, _ in keys], ascending=[asc for _, asc in keys], kind='stable')
+
+        if offset or limit is not None:
+            df = df.iloc[offset:None if limit is None else offset + limit]
+
+        if columns is not None:
+            df = df[columns]
+        return df
+
+    def videos(self, filters=None, columns=None, order=None, limit=None, offset=0) -> pd.DataFrame:
+        if order:
+            # 排序查询使用排行索引，数据与索引来自同一缓存条目
+            df, rank_index = get_video_rank_index()
+            return self.query(df, filters, columns, order, limit, offset, rank_index)
+        return self.query(load_video_data(), filters, columns, order, limit, offset)
+
+    def comments(self, filters=None, columns=None, order=None, limit=None, offset=0) -> pd.DataFrame:
+        return self.query(load_comment_data(), filters, columns, order, limit, offset)
+
+    def count_videos(self, filters=None) -> int:
+        return len(self.query(load_video_data(), filters))
+
+    def count_comments(self, filters=None) -> int:
+        return len(self.query(load_comment_data(), filters))
+
+    def top_users(self, limit=10) -> pd.DataFrame:
+        # 排行索引中已按粉丝数排好的各用户第一条
+        df, rank_index = get_video_rank_index()
+        if rank_index is None or df.empty or 'user_name' not in df.columns or 'fans_count' not in df.columns:
+            return pd.DataFrame()
+        return df.iloc[rank_index.user_positions[:limit]][['user_name', 'fans_count']]
+
+    def version(self) -> str:
+        # CSV文件的修改时间和大小
+        return dataset_version()
+
+    def get_video(self, aweme_id) -> Optional[pd.Series]:
+        # 通过ID索引定位
+        return get_video(aweme_id)
+
+    def video_comments(self, aweme_id, columns=None, order=None, limit=None, offset=0) -> pd.DataFrame:
+        # 直接取该视频的评论分组
+        return self.query(get_video_comments(aweme_id), None, columns, order, limit, offset)
+
+
+class OrmRepository(DatasetRepository):
+    """数据库后端：查询条件、列、排序、分页转换为SQL，只返回需要的行和列"""
+
+    @staticmethod
+    def _models():
+        from video.models import VideoData, CommentData
+        return VideoData, CommentData
+
+    @staticmethod
+    def _field(column: str, fields: Dict[str, str], text_numeric: List[str]) -> str:
+        """
+        英文列名 -> 查询使用的字段名（文本存储的数值字段使用转换后的注解字段）
+        """
+        if column not in fields:
+            raise ValueError(f"未知的列: {column}")
+        if column in text_numeric:
+            return f'{fields[column]}_int'
+        return fields[column]
+
+    @staticmethod
+    def _id_value(value, lookup: str, integer: bool):
+        """
+        视频ID查询值转换：视频表存文本，评论表存整数（非数字ID返回None）
+        """
+        from django.db.models import QuerySet
+
+        def convert(v):
+            v = str(v).strip()
+            if not integer:
+                return v
+            return int(v) if v.isdigit() else None
+
+        if isinstance(value, QuerySet):
+            # 子查询（如 video_id_query()）直接交给数据库
+            return value
+        if lookup == 'in':
+            return [v for v in map(convert, value) if v is not None]
+        return convert(value)
+
+    @staticmethod
+    def _aware(value: pd.Timestamp):
+        """
+        时间查询值转换：不带时区的时间按本地时间处理（与 _to_frame 返回的时间一致）
+        """
+        from django.conf import settings
+        from django.utils import timezone
+
+        value = value.to_pydatetime()
+        if settings.USE_TZ and timezone.is_naive(value):
+            value = timezone.make_aware(value, timezone.get_current_timezone())
+        return value
+
+    def _queryset(self, model, fields: Dict[str, str], text_numeric: List[str], filters: Optional[Dict],
+                  order: Optional[List[str]], integer_ids: bool = False):
+        """
+        构建QuerySet：查询条件和排序
+        :param integer_ids: aweme_id是否以整数存储
+        """
+        from django.db.models import BigIntegerField
+        from django.db.models.functions import Cast
+
+        queryset = model.objects.all()
+
+        used = set()
+        for key in filters or {}:
+            used.add(split_lookup(key)[0])
+        for o in order or []:
+            used.add(split_order(o)[0])
+        annotations = {f'{fields[col]}_int': Cast(fields[col], BigIntegerField())
+                       for col in text_numeric if col in used}
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+
+        conditions = {}
+        for key, value in (filters or {}).items():
+            column, lookup = split_lookup(key)
+            if column == 'aweme_id' and lookup in ('exact', 'in'):
+                value = self._id_value(value, lookup, integer_ids)
+                if value is None:
+                    return queryset.none()
+            if isinstance(value, pd.Timestamp):
+                value = self._aware(value)
+            field = self._field(column, fields, text_numeric)
+            conditions[field if lookup == 'exact' else f'{field}__{lookup}'] = value
+        if conditions:
+            queryset = queryset.filter(**conditions)
+
+        if order:
+            ordering = []
+            for o in order:
+                column, ascending = split_order(o)
+                field = self._field(column, fields, text_numeric)
+                ordering.append(field if ascending else f'-{field}')
+            # 主键作为最后的排序键，保证分页结果稳定
+            queryset = queryset.order_by(*ordering, 'id')
+        else:
+            queryset = queryset.order_by('id')
+        return queryset
+
+    @staticmethod
+    def _slice(queryset, limit: Optional[int], offset: int):
+        """分页（转换为 LIMIT / OFFSET）"""
+        if limit is not None:
+            return queryset[offset:offset + limit]
+        if offset:
+            return queryset[offset:]
+        return queryset
+
+    @staticmethod
+    def _to_frame(rows: List[Dict], fields: Dict[str, str], columns: List[str],
+                  numeric_columns: List[str]) -> pd.DataFrame:
+        """
+        查询结果 -> 标准化DataFrame（列名、类型与CSV后端一致）
+        """
+        df = pd.DataFrame.from_records(rows, columns=[fields[col] for col in columns])
+        df.columns = columns
+        df = coerce_numeric_columns(df, numeric_columns)
+
+        if 'aweme_id' in df.columns:
+            df['aweme_id'] = ids_to_str(df['aweme_id'])
+        if 'user_id' in df.columns:
+            df['user_id'] = pd.to_numeric(df['user_id'], errors='coerce', dtype_backend='numpy_nullable')
+        for col in ('publish_time', 'comment_time'):
+            if col in df.columns:
+                values = pd.to_datetime(df[col])
+                # 数据库时间带时区，转换为本地时间后去掉时区，与CSV一致
+                if values.dt.tz is not None:
+                    from django.utils import timezone
+                    values = values.dt.tz_convert(timezone.get_current_timezone()).dt.tz_localize(None)
+                df[col] = values
+        return df
+
+    def _select(self, model, fields, text_numeric, numeric_columns, filters, columns, order, limit, offset,
+                integer_ids=False):
+        columns = list(columns) if columns is not None else list(fields)
+        queryset = self._queryset(model, fields, text_numeric, filters, order, integer_ids)
+        rows = list(self._slice(queryset, limit, offset).values(*[fields[col] for col in columns]))
+        return self._to_frame(rows, fields, columns, numeric_columns)
+
+    def videos(self, filters=None, columns=None, order=None, limit=None, offset=0) -> pd.DataFrame:
+        video_model, _ = self._models()
+        return self._select(video_model, VIDEO_FIELDS, VIDEO_TEXT_NUMERIC_COLUMNS,
+                            VIDEO_NUMERIC_COLUMNS + ['duration'], filters, columns, order, limit, offset)
+
+    def comments(self, filters=None, columns=None, order=None, limit=None, offset=0) -> pd.DataFrame:
+        _, comment_model = self._models()
+        return self._select(comment_model, COMMENT_FIELDS, [],
+                            COMMENT_NUMERIC_COLUMNS, filters, columns, order, limit, offset, integer_ids=True)
+
+    def count_videos(self, filters=None) -> int:
+        video_model, _ = self._models()
+        return self._queryset(video_model, VIDEO_FIELDS, VIDEO_TEXT_NUMERIC_COLUMNS, filters, None).count()
+
+    def count_comments(self, filters=None) -> int:
+        _, comment_model = self._models()
+        return self._queryset(comment_model, COMMENT_FIELDS, [], filters, None, integer_ids=True).count()
+
+    def video_id_query(self, filters: Optional[Dict] = None):
+        """
+        符合条件的视频ID子查询（整数，与评论表的 awemeId 类型一致）
+        用于评论查询，视频ID不取回Python：
+            repo.comments(filters={'aweme_id__in': repo.video_id_query({'fans_count__gte': 1000})})
+        :param filters: 视频查询条件
+        :return: QuerySet
+        """
+        from django.db.models import BigIntegerField
+        from django.db.models.functions import Cast
+
+        video_model, _ = self._models()
+        queryset = self._queryset(video_model, VIDEO_FIELDS, VIDEO_TEXT_NUMERIC_COLUMNS, filters, None)
+        return queryset.order_by().annotate(aweme_id_int=Cast('awemeId', BigIntegerField())).values('aweme_id_int')
+
+    def version(self) -> str:
+        # 各表的行数和最大主键，加上数据变化标记（原地更新的行不改变行数和主键，由导入时改写标记区分）
+        from django.db.models import Count, Max
+
+        parts = []
+        for model in self._models():
+            stats = model.objects.aggregate(count=Count('id'), max_id=Max('id'))
+            parts.append(f"{stats['count']}.{stats['max_id'] or 0}")
+        parts.append(data_change_token())
+        return '-'.join(parts)
+
+
+# 后端实例
+_repositories: Dict[str, DatasetRepository] = {}
+
+REPOSITORY_BACKENDS = {
+    'csv': CsvRepository,
+    'orm': OrmRepository,
+}
+
+
+def get_repository(backend: Optional[str] = None) -> DatasetRepository:
+    """
+    获取数据仓库
+    :param backend: 'csv' / 'orm'，默认使用 Config.DATASET_BACKEND
+    :return: DatasetRepository
+    """
+    backend = backend or Config.DATASET_BACKEND
+    if backend not in REPOSITORY_BACKENDS:
+        raise ValueError(f"不支持的数据后端: {backend}")
+    if backend not in _repositories:
+        _repositories[backend] = REPOSITORY_BACKENDS[backend]()
+    return _repositories[backend]
@@ -9,88 +9,109 @@ SnowNLP情感分析模块
 import logging
 import pandas as pd
 import os
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+from django.db import transaction
+from django.db.models import Avg, Count, Q
 from snownlp import SnowNLP
 
+from config import Config
 from video.models import CommentData
+from data.repository import get_repository
+from data.sentiment_pipeline import sentiment_pipeline
+from data.sentiment_scoring import POSITIVE_THRESHOLD, NEGATIVE_THRESHOLD, sentiment_label, analyze_texts
+from data.streaming import stream_sentiment_totals
 
 logger = logging.getLogger(__name__)
 
-# CSV文件路径
-COMMENT_CSV_PATH = os.path.join(os.path.dirname(__file__), 'comment.csv')
-
 
 class SentimentAnalyzer:
     """情感分析类"""
 
     # 情感阈值
-    POSITIVE_THRESHOLD = 0.6
-    NEGATIVE_THRESHOLD = 0.4
+    POSITIVE_THRESHOLD = POSITIVE_THRESHOLD
+    NEGATIVE_THRESHOLD = NEGATIVE_THRESHOLD
 
     @staticmethod
     def load_comments_from_csv():
         """
-        从CSV文件加载评论数据
+        从数据仓库加载评论数据
         :return: DataFrame
         """
-        try:
-            if os.path.exists(COMMENT_CSV_PATH):
-                df = pd.read_csv(COMMENT_CSV_PATH, encoding='utf-8')
-
-                # 列名映射
-                column_mapping = {
-                    '用户id': 'user_id',
-                    '用户名': 'user_name',
-                    '评论内容': 'content',
-                    '评论时间': 'comment_time',
-                    'IP地址': 'user_ip',
-                    '点赞数': 'like_count',
-                    '视频id': 'aweme_id'
-                }
-
-                # 重命名列
-                df = df.rename(columns=column_mapping)
-
-                # 数据类型转换
-                if 'like_count' in df.columns:
-                    df['like_count'] = pd.to_numeric(df['like_count'], errors='coerce').fillna(0)
-
-                return df
-            else:
-                logger.warning(f"评论CSV文件不存在: {COMMENT_CSV_PATH}")
-                return pd.DataFrame()
-        except Exception as e:
-            logger.error(f"从CSV加载评论数据失败: {e}")
-            return pd.DataFrame()
+        return get_repository().comments(columns=['content', 'user_name'])
+
+    @staticmethod
+    def label(score: float) -> str:
+        """
+        根据得分确定情感标签
+        :param score: 情感得分
+        :return: 'positive' / 'negative' / 'neutral'
+        """
+        return sentiment_label(score)
 
     @staticmethod
     def analyze_text(text: str) -> Tuple[float, str]:
         """
-        分析文本情感
+        分析文本情感（开启情感缓存时先查缓存）
         :param text: 文本内容
         :return: (情感得分, 情感标签)
         """
         if not text or not isinstance(text, str):
             return 0.0, 'neutral'
 
-        try:
-            s = SnowNLP(text)
-            score = s.sentiments
-
-            # 根据得分确定情感标签
-            if score >= SentimentAnalyzer.POSITIVE_THRESHOLD:
-                label = 'positive'
-            elif score <= SentimentAnalyzer.NEGATIVE_THRESHOLD:
-                label = 'negative'
-            else:
-                label = 'neutral'
-
-            return round(score, 4), label
+        if Config.SENTIMENT_CACHE_ENABLED:
+            return SentimentAnalyzer.analyze_texts([text])[0]
 
+        try:
+            score = SnowNLP(text).sentiments
+            return round(score, 4), SentimentAnalyzer.label(score)
         except Exception as e:
             logger.error(f"情感分析失败: {e}")
             return 0.0, 'neutral'
 
+    @staticmethod
+    def analyze_texts(texts: List[str]) -> List[Tuple[float, str]]:
+        """
+        批量分析文本情感（见 data.sentiment_scoring.analyze_texts）
+        :param texts: 文本列表
+        :return: 与 texts 一一对应的 (情感得分, 情感标签)，空文本或失败时为 (0.0, 'neutral')
+        """
+        return analyze_texts(texts)
+
+    @staticmethod
+    def _summarize(df: pd.DataFrame) -> Dict[str, any]:
+        """
+        评论情感统计
+        :param df: 评论数据（content、user_name列）
+        :return: 统计结果
+        """
+        contents = [str(content) if pd.notna(content) else '' for content in df['content']]
+        results = SentimentAnalyzer.analyze_texts(contents)
+
+        labels = {'positive': 0, 'negative': 0, 'neutral': 0}
+        total_score = 0.0
+        comments_list = []
+        for content, user_name, (score, label) in zip(contents, df['user_name'], results):
+            # 收集评论列表（取前100条）
+            if len(comments_list) < 100:
+                comments_list.append({
+                    'content': content,
+                    'sentiment': score,
+                    'user_name': str(user_name) if pd.notna(user_name) else ''
+                })
+            labels[label] += 1
+            total_score += score
+
+        analyzed_count = len(results)
+        return {
+            'total': len(df),
+            'analyzed': analyzed_count,
+            'positive': labels['positive'],
+            'negative': labels['negative'],
+            'neutral': labels['neutral'],
+            'average_score': round(total_score / analyzed_count, 4) if analyzed_count > 0 else 0.0,
+            'comments': comments_list
+        }
+
     @staticmethod
     def analyze_comment(comment: CommentData) -> Dict[str, any]:
         """
@@ -103,7 +124,7 @@ class SentimentAnalyzer:
         # 更新评论的情感信息
         comment.sentiment_score = score
         comment.sentiment_label = label
-        comment.save()
+        comment.save(update_fields=['sentiment_score', 'sentiment_label'])
 
         result = {
             'comment_id': comment.id,
@@ -122,6 +143,22 @@ class SentimentAnalyzer:
         """
         logger.info("开始分析所有评论情感...")
 
+        # 增量统计（爬虫批次之后由刷新命令打分），还没有生成过时按下面的方式实时分析
+        result = sentiment_pipeline.summary(refresh=False) if Config.SENTIMENT_PIPELINE_ENABLED else None
+        if result is not None:
+            logger.info(f"评论情感分析完成（增量统计）: 共 {result['total']} 条")
+            return result
+
+        # 数据库后端：回填未分析的评论后按保存的得分统计
+        if Config.DATASET_BACKEND == 'orm':
+            return SentimentAnalyzer._stored_summary()
+
+        # 评论数据超过内存时按块统计
+        if Config.COMMENT_STREAMING_ENABLED:
+            result = stream_sentiment_totals()
+            logger.info(f"评论情感分析完成（流式）: 共 {result['total']} 条")
+            return result
+
         # 从CSV加载评论数据
         df = SentimentAnalyzer.load_comments_from_csv()
 
@@ -137,46 +174,7 @@ class SentimentAnalyzer:
                 'comments': []
             }
 
-        total = len(df)
-        positive_count = 0
-        negative_count = 0
-        neutral_count = 0
-        total_score = 0.0
-        analyzed_count = 0
-        comments_list = []
-
-        for _, row in df.iterrows():
-            content = row['content'] if pd.notna(row['content']) else ''
-            score, label = SentimentAnalyzer.analyze_text(str(content))
-
-            # 收集评论列表（取前100条）
-            if len(comments_list) < 100:
-                comments_list.append({
-                    'content': str(content),
-                    'sentiment': score,
-                    'user_name': str(row['user_name']) if pd.notna(row['user_name']) else ''
-                })
-
-            # 统计
-            if label == 'positive':
-                positive_count += 1
-            elif label == 'negative':
-                negative_count += 1
-            else:
-                neutral_count += 1
-
-            total_score += score
-            analyzed_count += 1
-
-        result = {
-            'total': total,
-            'analyzed': analyzed_count,
-            'positive': positive_count,
-            'negative': negative_count,
-            'neutral': neutral_count,
-            'average_score': round(total_score / analyzed_count, 4) if analyzed_count > 0 else 0.0,
-            'comments': comments_list
-        }
+        result = SentimentAnalyzer._summarize(df)
 
         logger.info(f"评论情感分析完成: {result}")
         return result
@@ -190,24 +188,17 @@ class SentimentAnalyzer:
         """
         logger.info(f"开始分析视频 {video_id} 的评论情感...")
 
-        # 从CSV加载评论数据
-        df = SentimentAnalyzer.load_comments_from_csv()
+        result = sentiment_pipeline.summary(video_id, refresh=False) if Config.SENTIMENT_PIPELINE_ENABLED else None
+        if result is not None:
+            if result['total'] > 0:
+                result['comments'] = SentimentAnalyzer._video_comment_list(video_id)
+            return result
 
-        if df.empty:
-            logger.warning("暂无评论数据")
-            return {
-                'total': 0,
-                'analyzed': 0,
-                'positive': 0,
-                'negative': 0,
-                'neutral': 0,
-                'average_score': 0.0,
-                'comments': []
-            }
+        if Config.DATASET_BACKEND == 'orm':
+            return SentimentAnalyzer._stored_summary(video_id)
 
-        # 筛选指定视频的评论
-        df['aweme_id'] = df['aweme_id'].astype(str)
-        df_video = df[df['aweme_id'] == str(video_id)]
+        # 获取指定视频的评论
+        df_video = get_repository().video_comments(video_id, columns=['content', 'user_name'])
 
         if df_video.empty:
             logger.warning(f"视频 {video_id} 没有评论数据")
@@ -221,108 +212,151 @@ class SentimentAnalyzer:
                 'comments': []
             }
 
-        total = len(df_video)
-        positive_count = 0
-        negative_count = 0
-        neutral_count = 0
-        total_score = 0.0
-        analyzed_count = 0
-        comments_list = []
-
-        for _, row in df_video.iterrows():
-            content = row['content'] if pd.notna(row['content']) else ''
-            score, label = SentimentAnalyzer.analyze_text(str(content))
-
-            # 收集评论列表（最多100条）
-            if len(comments_list) < 100:
-                comments_list.append({
-                    'content': str(content),
-                    'sentiment': score,
-                    'user_name': str(row['user_name']) if pd.notna(row['user_name']) else ''
-                })
-
-            # 统计
-            if label == 'positive':
-                positive_count += 1
-            elif label == 'negative':
-                negative_count += 1
-            else:
-                neutral_count += 1
-
-            total_score += score
-            analyzed_count += 1
-
-        result = {
-            'total': total,
-            'analyzed': analyzed_count,
-            'positive': positive_count,
-            'negative': negative_count,
-            'neutral': neutral_count,
-            'average_score': round(total_score / analyzed_count, 4) if analyzed_count > 0 else 0.0,
-            'comments': comments_list
-        }
+        result = SentimentAnalyzer._summarize(df_video)
 
         logger.info(f"视频 {video_id} 的评论情感分析完成: {result}")
         return result
 
+    @staticmethod
+    def _video_comment_list(video_id: str, limit: int = 100) -> List[Dict]:
+        """
+        视频的前 limit 条评论及得分（得分已在增量分析时缓存）
+        :param video_id: 视频ID
+        :param limit: 条数
+        :return: 评论列表
+        """
+        df = get_repository().video_comments(video_id, columns=['content', 'user_name'], limit=limit)
+        contents = [str(content) if pd.notna(content) else '' for content in df['content']]
+        return [{
+            'content': content,
+            'sentiment': score,
+            'user_name': str(user_name) if pd.notna(user_name) else ''
+        } for content, user_name, (score, _) in zip(contents, df['user_name'], analyze_texts(contents))]
+
     @staticmethod
     def analyze_comments_batch(comment_ids: List[str]) -> List[Dict]:
         """
-        批量分析评论情感
+        批量分析评论情感（一次查询、批量打分、批量更新）
         :param comment_ids: 评论ID列表
         :return: 分析结果列表
         """
-        results = []
-
+        ids = [int(comment_id) for comment_id in comment_ids if str(comment_id).isdigit()]
+        comments = CommentData.objects.only('id', 'content').in_bulk(ids)
+        found = []
         for comment_id in comment_ids:
-            try:
-                comment = CommentData.objects.get(id=comment_id)
-                result = SentimentAnalyzer.analyze_comment(comment)
-                results.append(result)
-            except CommentData.DoesNotExist:
+            comment = comments.get(int(comment_id)) if str(comment_id).isdigit() else None
+            if comment is None:
                 logger.warning(f"评论不存在: {comment_id}")
+                continue
+            found.append(comment)
 
-        return results
+        SentimentAnalyzer._score_and_update(found)
+        return [{
+            'comment_id': comment.id,
+            'content': comment.content,
+            'sentiment_score': comment.sentiment_score,
+            'sentiment_label': comment.sentiment_label
+        } for comment in found]
 
     @staticmethod
-    def get_sentiment_summary() -> Dict[str, any]:
+    def _score_and_update(comments: List[CommentData]):
         """
-        获取情感分析摘要
-        :return: 摘要数据
+        一批评论打分后用 bulk_update 写回（一个事务）
+        :param comments: CommentData实例列表
         """
-        comments = CommentData.objects.all()
+        results = SentimentAnalyzer.analyze_texts([comment.content for comment in comments])
+        for comment, (score, label) in zip(comments, results):
+            comment.sentiment_score = score
+            comment.sentiment_label = label
+        with transaction.atomic():
+            CommentData.objects.bulk_update(comments, ['sentiment_score', 'sentiment_label'],
+                                            batch_size=Config.SENTIMENT_BULK_UPDATE_BATCH)
 
-        if comments.count() == 0:
-            return {
-                'total': 0,
-                'positive': 0,
-                'negative': 0,
-                'neutral': 0,
-                'average_score': 0.0,
-                'distribution': {}
-            }
-
-        # 统计情感分布
-        positive_count = comments.filter(sentiment_label='positive').count()
-        negative_count = comments.filter(sentiment_label='negative').count()
-        neutral_count = comments.filter(sentiment_label='neutral').count()
+    @staticmethod
+    def _comment_queryset(video_id: Optional[str] = None):
+        """
+        评论QuerySet，指定视频时按视频ID筛选（评论表的视频ID为整数，非数字ID没有评论）
+        """
+        comments = CommentData.objects.all()
+        if video_id is not None:
+            video_id = str(video_id).strip()
+            if not video_id.isdigit():
+                return comments.none()
+            comments = comments.filter(awemeId=int(video_id))
+        return comments
 
-        # 计算平均得分
-        avg_score = comments.aggregate(avg_score=Avg('sentiment_score'))['avg_score'] or 0.0
+    @staticmethod
+    def backfill_scores(batch_size: Optional[int] = None, rescore: bool = False,
+                        video_id: Optional[str] = None) -> int:
+        """
+        为数据库中未分析的评论批量打分，按主键分批读取，每批用 bulk_update 写回
+        :param batch_size: 每批评论数，默认为 Config.SENTIMENT_BACKFILL_BATCH
+        :param rescore: 是否重新分析已有得分的评论（更换模型后使用）
+        :param video_id: 只回填该视频的评论
+        :return: 更新的评论数
+        """
+        batch_size = batch_size or Config.SENTIMENT_BACKFILL_BATCH
+        comments = SentimentAnalyzer._comment_queryset(video_id)
+        if not rescore:
+            comments = comments.filter(sentiment_label__isnull=True)
+        comments = comments.only('id', 'content').order_by('id')
+
+        updated = 0
+        last_id = 0
+        while True:
+            # 按主键翻页（已更新的行不再满足未分析条件，不能用OFFSET）
+            batch = list(comments.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            SentimentAnalyzer._score_and_update(batch)
+            updated += len(batch)
+            last_id = batch[-1].id
+            logger.info(f"已回填 {updated} 条评论情感")
+        return updated
 
-        result = {
-            'total': comments.count(),
-            'positive': positive_count,
-            'negative': negative_count,
-            'neutral': neutral_count,
-            'average_score': round(float(avg_score), 4),
-            'distribution': {
-                'positive': positive_count,
-                'negative': negative_count,
-                'neutral': neutral_count
-            }
+    @staticmethod
+    def get_sentiment_summary(video_id: Optional[str] = None) -> Dict[str, any]:
+        """
+        获取情感分析摘要：一条聚合查询统计保存的得分（使用情感标签索引）
+        :param video_id: 视频ID，None表示所有评论
+        :return: 摘要数据
+        """
+        stats = SentimentAnalyzer._comment_queryset(video_id).aggregate(
+            total=Count('id'),
+            analyzed=Count('sentiment_label'),
+            positive=Count('id', filter=Q(sentiment_label='positive')),
+            negative=Count('id', filter=Q(sentiment_label='negative')),
+            neutral=Count('id', filter=Q(sentiment_label='neutral')),
+            average_score=Avg('sentiment_score'),
+        )
+
+        distribution = {label: stats[label] for label in ('positive', 'negative', 'neutral')}
+        return {
+            'total': stats['total'],
+            'analyzed': stats['analyzed'],
+            **distribution,
+            'average_score': round(float(stats['average_score'] or 0.0), 4),
+            'distribution': distribution if stats['total'] else {}
         }
 
+    @staticmethod
+    def _stored_summary(video_id: Optional[str] = None) -> Dict[str, any]:
+        """
+        数据库后端的情感统计：只为未分析的评论打分，统计和评论列表直接查询保存的得分
+        :param video_id: 视频ID，None表示所有评论
+        :return: 与 _summarize 相同格式的统计结果
+        """
+        SentimentAnalyzer.backfill_scores(video_id=video_id)
+        result = SentimentAnalyzer.get_sentiment_summary(video_id)
+        del result['distribution']
+
+        rows = (SentimentAnalyzer._comment_queryset(video_id).order_by('id')
+                .values('content', 'sentiment_score', 'userName')[:100])
+        result['comments'] = [{
+            'content': row['content'] or '',
+            'sentiment': row['sentiment_score'] or 0.0,
+            'user_name': row['userName'] or ''
+        } for row in rows]
         return result
 
     @staticmethod
@@ -338,9 +372,6 @@ class SentimentAnalyzer:
                     .order_by('sentiment_score')[:limit])
 
 
-from django.db.models import Avg
-
-
 if __name__ == '__main__':
     # 测试情感分析
     test_texts = [
@@ -0,0 +1,198 @@
+"""
+情感得分缓存 - 评论内容不会变化，SnowNLP得分按 (文本哈希, 模型版本) 持久化到SQLite
+
+    - 键：规范化文本（去掉首尾空白、连续空白合并为一个空格）的SHA-1，和模型版本；
+    - 模型版本：默认为SnowNLP情感模型文件的哈希，更换或重新训练模型后旧得分自动失效，
+      也可以用 Config.SENTIMENT_MODEL_VERSION 指定；
+    - SQLite使用WAL模式，多个Web进程、后台任务共享同一个缓存文件，读写互不阻塞。
+
+批量查询时先按哈希查缓存，只对未命中的文本调用SnowNLP，新得分在一个事务中写入，
+重复分析同一批评论只剩查询。
+"""
+
+import hashlib
+import importlib.util
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 每条SQL查询的键数量（SQLite变量数上限为999）
+QUERY_BATCH = 500
+
+_WHITESPACE = re.compile(r'\s+')
+
+_model_version: Optional[str] = None
+
+
+def normalize_text(text: str) -> str:
+    """
+    规范化文本：去掉首尾空白，连续空白合并为一个空格
+    :param text: 文本
+    :return: 规范化后的文本
+    """
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def text_hash(text: str) -> str:
+    """
+    规范化文本的哈希
+    :param text: 规范化后的文本
+    :return: SHA-1十六进制字符串
+    """
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def model_version() -> str:
+    """
+    情感模型版本：Config.SENTIMENT_MODEL_VERSION，未指定时为SnowNLP情感模型文件的哈希（向量化引擎加 -vector 后缀）
+    :return: 版本字符串
+    """
+    global _model_version
+    if Config.SENTIMENT_MODEL_VERSION:
+        return str(Config.SENTIMENT_MODEL_VERSION)
+    if _model_version is None:
+        try:
+            # 只定位模型文件，不导入 snownlp.sentiment（导入时会加载整个模型）
+            package = importlib.util.find_spec('snownlp').submodule_search_locations[0]
+            data_path = os.path.join(package, 'sentiment', 'sentiment.marshal')
+            # Python 3 下加载的模型文件带 .3 后缀
+            path = data_path + '.3'
+            if not os.path.exists(path):
+                path = data_path
+            with open(path, 'rb') as f:
+                _model_version = 'snownlp-' + hashlib.sha1(f.read()).hexdigest()[:16]
+        except Exception as e:
+            logger.error(f"读取情感模型版本失败: {e}")
+            _model_version = 'snownlp'
+    # 两个引擎的得分在浮点误差内一致，分开缓存以免混用
+    if Config.SENTIMENT_ENGINE == 'vector':
+        return _model_version + '-vector'
+    return _model_version
+
+
+class SentimentCache:
+    """
+    SQLite情感得分缓存（每个线程一个连接）
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._local = threading.local()
+
+    def _path(self) -> str:
+        return str(self.path or Config.SENTIMENT_CACHE_PATH)
+
+    def _connection(self) -> sqlite3.Connection:
+        # fork出的子进程不能使用父进程的连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid != os.getpid():
+            conn = None
+        if conn is None:
+            path = self._path()
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            conn = sqlite3.connect(path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS sentiment_scores ('
+                         'model TEXT NOT NULL, text_hash TEXT NOT NULL, score REAL NOT NULL, '
+                         'PRIMARY KEY (model, text_hash)) WITHOUT ROWID')
+            conn.commit()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, hashes: Iterable[str], model: Optional[str] = None) -> Dict[str, float]:
+        """
+        批量查询得分
+        :param hashes: 文本哈希
+        :param model: 模型版本，默认为当前版本
+        :return: {文本哈希: 得分}，只包含命中的
+        """
+        model = model or model_version()
+        hashes = list(hashes)
+        conn = self._connection()
+        found = {}
+        for start in range(0, len(hashes), QUERY_BATCH):
+            batch = hashes[start:start + QUERY_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            rows = conn.execute(f'SELECT text_hash, score FROM sentiment_scores '
+                                f'WHERE model = ? AND text_hash IN ({placeholders})', [model, *batch])
+            found.update(rows)
+        return found
+
+    def put_many(self, scores: Dict[str, float], model: Optional[str] = None):
+        """
+        批量写入得分（一个事务）
+        :param scores: {文本哈希: 得分}
+        :param model: 模型版本，默认为当前版本
+        """
+        if not scores:
+            return
+        model = model or model_version()
+        conn = self._connection()
+        with conn:
+            conn.executemany('INSERT OR REPLACE INTO sentiment_scores (model, text_hash, score) VALUES (?, ?, ?)',
+                             [(model, key, float(score)) for key, score in scores.items()])
+
+    def score_many(self, texts: List[str], scorer: Callable[[List[str]], List[Optional[float]]]) -> List[float]:
+        """
+        批量取得分，未命中的文本一次交给 scorer 计算后写入缓存
+        :param texts: 文本列表
+        :param scorer: 批量计算规范化文本得分的函数，返回与输入对应的得分，失败的为None（不缓存）
+        :return: 与 texts 一一对应的得分，计算失败的为None
+        """
+        normalized = [normalize_text(text) for text in texts]
+        keys = [text_hash(text) for text in normalized]
+        try:
+            scores = self.get_many(set(keys))
+        except sqlite3.Error as e:
+            logger.error(f"读取情感缓存失败: {e}")
+            scores = {}
+
+        # 未命中的文本去重后计算
+        missing = {}
+        for key, text in zip(keys, normalized):
+            if key not in scores and key not in missing:
+                missing[key] = text
+        computed = dict(zip(missing.keys(), scorer(list(missing.values())))) if missing else {}
+
+        new_scores = {key: score for key, score in computed.items() if score is not None}
+        if new_scores:
+            try:
+                self.put_many(new_scores)
+            except sqlite3.Error as e:
+                logger.error(f"写入情感缓存失败: {e}")
+            logger.debug(f"情感缓存: 命中 {len(scores)} 条, 新增 {len(new_scores)} 条")
+        scores.update(computed)
+        return [scores[key] for key in keys]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        各模型版本缓存的条数
+        :return: {模型版本: 条数}
+        """
+        rows = self._connection().execute('SELECT model, COUNT(*) FROM sentiment_scores GROUP BY model')
+        return dict(rows)
+
+    def clear(self, model: Optional[str] = None):
+        """
+        清除缓存
+        :param model: 只清除该模型版本，None表示全部
+        """
+        conn = self._connection()
+        with conn:
+            if model is None:
+                conn.execute('DELETE FROM sentiment_scores')
+            else:
+                conn.execute('DELETE FROM sentiment_scores WHERE model = ?', [model])
+
+
+# 全局情感得分缓存
+sentiment_cache = SentimentCache()
@@ -0,0 +1,412 @@
+"""
+增量情感分析 - 记录已分析到的位置，每次只为新增的评论打分，情感统计在原有结果上累加
+
+    - 游标：CSV后端为 comment.csv 已读取的字节偏移（文件被改写时全量重建，见 data.aggregates.iter_csv_delta），
+      数据库后端为已统计的最大评论主键（新评论先回填 sentiment_score / sentiment_label 再统计）；
+    - 新增的评论按块读取、打分、累加（块的行数按流式分析的内存预算估算），全量重建时内存占用也不随数据增长；
+    - 统计：全部评论和各视频的数量、各情感标签数量、得分合计，以及前100条评论的得分，按新增的行累加；
+    - 情感模型版本变化（更换模型、切换打分引擎）或数据后端变化时全量重建。
+
+打分只在爬虫批次之后运行的刷新命令中进行：
+    python -m data.sentiment_pipeline                 （CSV后端）
+    python manage.py refresh_sentiment                （数据库后端）
+多个进程同时刷新时只有持有锁文件的进程打分。结果保存在 SENTIMENT_PIPELINE_PATH（原子替换），
+Web进程只读取统计结果，每次刷新的耗时与新增的评论数成正比。
+"""
+
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from config import Config
+from data.aggregates import iter_csv_delta
+from data.dataset import COMMENT_CSV_PATH, bump_data_change_token
+from data.normalize import COMMENT_COLUMN_MAPPING, normalize_comment_data, ids_to_str
+from data.sentiment_cache import model_version
+from data.sentiment_scoring import analyze_texts
+from data.streaming import estimate_chunk_rows
+
+logger = logging.getLogger(__name__)
+
+# 统计文件格式版本，结构变化时递增，旧文件自动重建
+FORMAT_VERSION = 1
+
+# 情感标签
+LABELS = ('positive', 'negative', 'neutral')
+
+# 读取的评论列
+PIPELINE_COLUMNS = ['content', 'user_name', 'aweme_id']
+PIPELINE_RAW_COLUMNS = [raw for raw, column in COMMENT_COLUMN_MAPPING.items() if column in PIPELINE_COLUMNS]
+
+# 刷新锁超过该时间（秒）未更新时视为持有锁的进程已退出
+LOCK_TIMEOUT = 600
+
+# 保存的评论列表条数（与 SentimentAnalyzer 的统计结果一致）
+COMMENT_SAMPLE_SIZE = 100
+
+
+def empty_summary() -> Dict[str, any]:
+    """没有评论时的统计结果"""
+    return {
+        'total': 0,
+        'analyzed': 0,
+        'positive': 0,
+        'negative': 0,
+        'neutral': 0,
+        'average_score': 0.0,
+        'comments': []
+    }
+
+
+class SentimentAggregates:
+    """情感统计（全部评论和各视频），可按新增的行累加"""
+
+    def __init__(self):
+        self.rows = 0
+        self.labels = {label: 0 for label in LABELS}
+        self.score_sum = 0.0
+        self.comments: List[Dict] = []
+        # aweme_id -> [评论数, 积极数, 消极数, 中性数, 得分合计]
+        self.videos: Dict[str, List] = {}
+
+    def update(self, df: pd.DataFrame):
+        """
+        累加新增评论的情感
+        :param df: 新增的评论（content、user_name、aweme_id、sentiment_score、sentiment_label列）
+        """
+        if df.empty:
+            return
+        self.rows += len(df)
+        self.score_sum += float(df['sentiment_score'].sum())
+        counts = df['sentiment_label'].value_counts()
+        for label in LABELS:
+            self.labels[label] += int(counts.get(label, 0))
+
+        if len(self.comments) < COMMENT_SAMPLE_SIZE:
+            for row in df.head(COMMENT_SAMPLE_SIZE - len(self.comments)).itertuples(index=False):
+                self.comments.append({
+                    'content': row.content,
+                    'sentiment': row.sentiment_score,
+                    'user_name': row.user_name
+                })
+
+        flags = {label: df['sentiment_label'].eq(label) for label in LABELS}
+        per_video = df.assign(**flags).groupby('aweme_id', observed=True, sort=False).agg(
+            rows=('sentiment_score', 'size'),
+            positive=('positive', 'sum'),
+            negative=('negative', 'sum'),
+            neutral=('neutral', 'sum'),
+            score_sum=('sentiment_score', 'sum'),
+        )
+        for aweme_id, row in zip(per_video.index.astype(str), per_video.itertuples(index=False)):
+            video = self.videos.setdefault(aweme_id, [0, 0, 0, 0, 0.0])
+            video[0] += int(row.rows)
+            video[1] += int(row.positive)
+            video[2] += int(row.negative)
+            video[3] += int(row.neutral)
+            video[4] += float(row.score_sum)
+
+    def summary(self, video_id: Optional[str] = None) -> Dict[str, any]:
+        """
+        统计结果（与 SentimentAnalyzer 的格式一致，单个视频不含评论列表）
+        :param video_id: 视频ID，None表示全部评论
+        :return: 统计结果
+        """
+        if video_id is None:
+            rows, counts, score_sum = self.rows, self.labels, self.score_sum
+            comments = self.comments
+        else:
+            video = self.videos.get(str(video_id).strip())
+            if video is None:
+                return empty_summary()
+            rows, counts, score_sum = video[0], dict(zip(LABELS, video[1:4])), video[4]
+            comments = []
+
+        return {
+            'total': rows,
+            'analyzed': rows,
+            **{label: counts[label] for label in LABELS},
+            'average_score': round(score_sum / rows, 4) if rows > 0 else 0.0,
+            'comments': list(comments)
+        }
+
+    def to_dict(self) -> Dict:
+        return {'rows': self.rows, 'labels': self.labels, 'score_sum': self.score_sum,
+                'comments': self.comments, 'videos': self.videos}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SentimentAggregates':
+        aggregates = cls()
+        aggregates.rows = data['rows']
+        aggregates.labels = data['labels']
+        aggregates.score_sum = data['score_sum']
+        aggregates.comments = data['comments']
+        aggregates.videos = data['videos']
+        return aggregates
+
+
+def score_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    为评论打分
+    :param df: 标准化后的评论数据
+    :return: content、user_name、aweme_id、sentiment_score、sentiment_label列
+    """
+    contents = [str(content) if pd.notna(content) else '' for content in df['content']]
+    results = analyze_texts(contents)
+    return pd.DataFrame({
+        'content': contents,
+        'user_name': [str(name) if pd.notna(name) else '' for name in df['user_name']],
+        'aweme_id': ids_to_str(df['aweme_id']).to_numpy(),
+        'sentiment_score': [score for score, _ in results],
+        'sentiment_label': [label for _, label in results],
+    })
+
+
+def read_scored_csv_delta(cursor: Optional[Dict]) -> Tuple[Optional[Iterator[pd.DataFrame]], Optional[Dict], bool]:
+    """
+    按块读取 comment.csv 在游标之后追加的评论并打分（块的行数按流式分析的内存预算估算）
+    :param cursor: CSV游标，None表示从头读取
+    :return: (每块新增评论的得分生成器（无新增时为None）, 读完后的新游标, 是否需要重建)
+    """
+    if not os.path.exists(COMMENT_CSV_PATH):
+        return None, None, cursor is not None
+    chunk_rows = estimate_chunk_rows(COMMENT_CSV_PATH, columns=PIPELINE_COLUMNS)
+    chunks, cursor, reset = iter_csv_delta(COMMENT_CSV_PATH, normalize_comment_data, cursor,
+                                           usecols=PIPELINE_RAW_COLUMNS, chunk_rows=chunk_rows)
+    if chunks is not None:
+        chunks = (score_frame(chunk) for chunk in chunks)
+    return chunks, cursor, reset
+
+
+def read_scored_orm_delta(cursor: Optional[Dict]) -> Tuple[Optional[Iterator[pd.DataFrame]], Optional[Dict], bool]:
+    """
+    按主键分批读取数据库中主键大于游标的评论（先回填未分析的评论，读取保存的得分）
+    :param cursor: {'max_id'}，None表示全量读取
+    :return: (每批新增评论的得分生成器（无新增时为None）, 新游标, 是否需要重建)
+    """
+    from django.db.models import Max
+    from video.models import CommentData
+    from data.sentiment import SentimentAnalyzer
+
+    max_id = CommentData.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+    last_id = cursor['max_id'] if cursor is not None else 0
+    reset = cursor is None or max_id < last_id
+    if reset:
+        last_id = 0
+    elif max_id == last_id:
+        return None, cursor, False
+
+    # 未分析的评论只有新增的这些（更换模型后由 backfill_sentiment --rescore 重新分析并重建统计）
+    SentimentAnalyzer.backfill_scores()
+
+    def batches(last_id: int) -> Iterator[pd.DataFrame]:
+        while True:
+            rows = list(CommentData.objects.filter(id__gt=last_id, id__lte=max_id).order_by('id').values_list(
+                'id', 'content', 'userName', 'awemeId', 'sentiment_score', 'sentiment_label')
+                [:Config.SENTIMENT_BACKFILL_BATCH])
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            df = pd.DataFrame.from_records(rows, columns=['id', 'content', 'user_name', 'aweme_id',
+                                                          'sentiment_score', 'sentiment_label'])
+            df['content'] = df['content'].fillna('')
+            df['user_name'] = df['user_name'].fillna('')
+            df['aweme_id'] = ids_to_str(df['aweme_id'])
+            df['sentiment_score'] = df['sentiment_score'].fillna(0.0)
+            df['sentiment_label'] = df['sentiment_label'].fillna('neutral')
+            yield df.drop(columns='id')
+
+    return batches(last_id), {'max_id': max_id}, reset
+
+
+class SentimentPipeline:
+    """
+    增量情感分析
+
+    refresh() 为数据源新增的评论打分并累加到统计中，有变化时写入JSON文件；
+    summary() 返回全部评论或单个视频的情感统计。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._file_signature = None
+        self.backend = None
+        self.model = None
+        self.aggregates = SentimentAggregates()
+        self.cursor: Optional[Dict] = None
+        self.updated_at = None
+
+    def _path(self) -> str:
+        return str(self.path or Config.SENTIMENT_PIPELINE_PATH)
+
+    def _load(self):
+        """其他进程更新了统计文件时重新读取"""
+        path = self._path()
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._file_signature:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') != FORMAT_VERSION:
+                return
+            self.backend = data['backend']
+            self.model = data['model']
+            self.aggregates = SentimentAggregates.from_dict(data['aggregates'])
+            self.cursor = data['cursor']
+            self.updated_at = data['updated_at']
+            self._file_signature = signature
+        except Exception as e:
+            logger.error(f"读取情感统计文件失败: {e}")
+
+    def _save(self):
+        """原子替换统计文件"""
+        path = self._path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = {
+            'format': FORMAT_VERSION,
+            'backend': self.backend,
+            'model': self.model,
+            'aggregates': self.aggregates.to_dict(),
+            'cursor': self.cursor,
+            'updated_at': self.updated_at,
+        }
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        stat = os.stat(path)
+        self._file_signature = (stat.st_mtime_ns, stat.st_size)
+
+    def _try_lock(self) -> Optional[str]:
+        """
+        获取刷新锁（锁文件），已被其他进程持有时返回None，避免多个进程重复为同一批评论打分
+        :return: 锁文件路径
+        """
+        lock_path = self._path() + '.lock'
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        try:
+            if time.time() - os.path.getmtime(lock_path) > LOCK_TIMEOUT:
+                os.remove(lock_path)
+        except OSError:
+            pass
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return None
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        return lock_path
+
+    def refresh(self) -> int:
+        """
+        为新增的评论打分并累加到统计中（其他进程正在刷新时直接返回）
+        :return: 本次打分的评论数
+        """
+        with self._lock:
+            lock_path = self._try_lock()
+            if lock_path is None:
+                logger.info("其他进程正在刷新情感统计，跳过本次刷新")
+                return 0
+            try:
+                return self._refresh(lock_path)
+            finally:
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+
+    def _refresh(self, lock_path: str) -> int:
+        self._load()
+        model = model_version()
+        if self.backend != Config.DATASET_BACKEND or self.model != model:
+            self.backend = Config.DATASET_BACKEND
+            self.model = model
+            self.cursor = None
+
+        start = time.perf_counter()
+        if self.backend == 'orm':
+            chunks, cursor, reset = read_scored_orm_delta(self.cursor)
+        else:
+            chunks, cursor, reset = read_scored_csv_delta(self.cursor)
+
+        # 在副本上累加，全部读完后再替换（中途失败时统计和游标保持不变）
+        aggregates = SentimentAggregates() if reset else SentimentAggregates.from_dict(
+            copy.deepcopy(self.aggregates.to_dict()))
+        scored = 0
+        try:
+            for df in chunks or []:
+                aggregates.update(df)
+                scored += len(df)
+                # 刷新锁的修改时间，长时间的全量重建不会被当作过期的锁
+                os.utime(lock_path)
+        except pd.errors.ParserError as e:
+            if reset:
+                raise
+            # 多行评论内容写到一半，等待下次刷新
+            logger.warning(f"评论CSV末尾的行不完整，等待下次刷新: {e}")
+            return 0
+
+        if scored:
+            logger.info(f"情感统计{'重建' if reset else '增量更新'}: 新增 {scored} 条评论, "
+                        f"耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+        if reset or cursor != self.cursor:
+            self.aggregates = aggregates
+            self.cursor = cursor
+            self.updated_at = time.strftime('%Y-%m-%d %H:%M:%S')
+            self._save()
+        return scored
+
+    def invalidate(self):
+        """清空统计，下次刷新时全量重建（重建完成前 summary() 返回None）"""
+        with self._lock:
+            self._load()
+            self.aggregates = SentimentAggregates()
+            self.cursor = None
+            if os.path.exists(self._path()):
+                self._save()
+        # 情感接口的缓存随之失效
+        bump_data_change_token()
+
+    def summary(self, video_id: Optional[str] = None, refresh: bool = False) -> Optional[Dict[str, any]]:
+        """
+        情感统计
+        :param video_id: 视频ID，None表示全部评论
+        :param refresh: 是否先为新增的评论打分（Web请求中不刷新，由爬虫批次之后运行的刷新命令打分）
+        :return: 统计结果（单个视频不含评论列表），还没有为当前数据后端、模型版本生成过统计时返回None
+        """
+        with self._lock:
+            if refresh:
+                self.refresh()
+            else:
+                self._load()
+            if self.cursor is None or self.backend != Config.DATASET_BACKEND or self.model != model_version():
+                return None
+            return self.aggregates.summary(video_id)
+
+
+# 全局增量情感分析
+sentiment_pipeline = SentimentPipeline()
+
+
+if __name__ == '__main__':
+    # 爬虫批次之后运行，只为新增的评论打分（CSV后端）: python -m data.sentiment_pipeline
+    logging.basicConfig(level=logging.INFO)
+
+    start = time.perf_counter()
+    scored = sentiment_pipeline.refresh()
+    print(f"新增 {scored} 条评论, 耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+    summary = sentiment_pipeline.summary()
+    if summary is not None:
+        print({k: v for k, v in summary.items() if k != 'comments'})
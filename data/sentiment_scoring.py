@@ -0,0 +1,213 @@
+"""
+批量情感打分 - SnowNLP打分分发到进程池，使用多个CPU核
+
+    - 进程池按 spawn 方式启动，每个worker进程启动时加载一次SnowNLP情感模型（之后一直复用）；
+    - 文本按块分发，结果按输入顺序返回，各块的积极/消极/中性计数在worker中统计后合并；
+    - 文本较少（少于 Config.SENTIMENT_PARALLEL_MIN_TEXTS）或只有一个worker时在当前进程中打分。
+
+本模块不依赖Django，worker进程不需要初始化Django。
+"""
+
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from data.sentiment_cache import sentiment_cache
+
+logger = logging.getLogger(__name__)
+
+# 情感阈值
+POSITIVE_THRESHOLD = 0.6
+NEGATIVE_THRESHOLD = 0.4
+
+# 每块文本数的范围（块太小时进程间通信开销占比高，太大时各worker负载不均）
+MIN_CHUNK_SIZE = 64
+MAX_CHUNK_SIZE = 2000
+
+
+def sentiment_label(score: float) -> str:
+    """
+    根据得分确定情感标签
+    :param score: 情感得分
+    :return: 'positive' / 'negative' / 'neutral'
+    """
+    if score >= POSITIVE_THRESHOLD:
+        return 'positive'
+    if score <= NEGATIVE_THRESHOLD:
+        return 'negative'
+    return 'neutral'
+
+
+def _init_worker():
+    """worker进程启动时加载情感模型"""
+    from snownlp import sentiment  # noqa: F401
+
+
+def _score_chunk(texts: List[str]) -> Tuple[List[Optional[float]], Dict[str, int]]:
+    """
+    一块文本打分
+    :param texts: 文本列表
+    :return: (得分列表，空文本或失败的为None, 各标签计数)
+    """
+    from snownlp import SnowNLP
+
+    scores = []
+    counts = {'positive': 0, 'negative': 0, 'neutral': 0}
+    for text in texts:
+        if not text or not isinstance(text, str):
+            scores.append(None)
+            continue
+        try:
+            score = SnowNLP(text).sentiments
+        except Exception as e:
+            logger.error(f"情感分析失败: {e}")
+            scores.append(None)
+            continue
+        scores.append(score)
+        counts[sentiment_label(score)] += 1
+    return scores, counts
+
+
+class BatchScores:
+    """批量打分结果"""
+
+    def __init__(self, scores: List[Optional[float]], counts: Dict[str, int]):
+        # 与输入一一对应，空文本或打分失败的为None
+        self.scores = scores
+        # 打分成功的文本的各标签计数
+        self.counts = counts
+
+    @property
+    def analyzed(self) -> int:
+        return sum(self.counts.values())
+
+
+# 进程池（首次使用时创建，各次打分共用）：(worker数, ProcessPoolExecutor)
+_pool: Optional[Tuple[int, ProcessPoolExecutor]] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool[0] != workers:
+            if _pool is not None:
+                _pool[1].shutdown(wait=False)
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=_init_worker)
+            _pool = (workers, executor)
+        return _pool[1]
+
+
+def shutdown_pool():
+    """关闭进程池"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool[1].shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _score_vector(texts: List[str]) -> BatchScores:
+    """向量化引擎批量打分（单进程，见 data.sentiment_vector），失败时回退为逐条调用SnowNLP"""
+    from data.sentiment_vector import score_texts
+
+    try:
+        scores = score_texts(texts)
+    except Exception as e:
+        logger.error(f"向量化情感打分失败: {e}")
+        return BatchScores(*_score_chunk(texts))
+    counts = {'positive': 0, 'negative': 0, 'neutral': 0}
+    for score in scores:
+        if score is not None:
+            counts[sentiment_label(score)] += 1
+    return BatchScores(scores, counts)
+
+
+def score_many(texts: List[str], workers: Optional[int] = None, chunk_size: Optional[int] = None) -> BatchScores:
+    """
+    批量情感打分
+    :param texts: 文本列表
+    :param workers: worker进程数，默认为 Config.SENTIMENT_WORKERS（None表示CPU核数，向量化引擎不使用进程池）
+    :param chunk_size: 每块文本数，默认按worker数切分（每个worker约4块）
+    :return: BatchScores，scores 与 texts 顺序一致
+    """
+    texts = list(texts)
+    if Config.SENTIMENT_ENGINE == 'vector':
+        return _score_vector(texts)
+    workers = workers or Config.SENTIMENT_WORKERS or os.cpu_count() or 1
+    if workers <= 1 or len(texts) < Config.SENTIMENT_PARALLEL_MIN_TEXTS:
+        return BatchScores(*_score_chunk(texts))
+
+    if chunk_size is None:
+        chunk_size = min(max(math.ceil(len(texts) / (workers * 4)), MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+
+    scores: List[Optional[float]] = []
+    counts = {'positive': 0, 'negative': 0, 'neutral': 0}
+    try:
+        # map 按提交顺序返回结果
+        for chunk_scores, chunk_counts in _get_pool(workers).map(_score_chunk, chunks):
+            scores.extend(chunk_scores)
+            for label, count in chunk_counts.items():
+                counts[label] += count
+    except BrokenProcessPool as e:
+        # worker进程异常退出时重建进程池，本次在当前进程中打分
+        logger.error(f"情感打分进程池异常: {e}")
+        shutdown_pool()
+        return BatchScores(*_score_chunk(texts))
+    logger.debug(f"批量情感打分完成: {len(texts)} 条, {len(chunks)} 块, {workers} 个进程")
+    return BatchScores(scores, counts)
+
+
+def analyze_texts(texts: List[str]) -> List[Tuple[float, str]]:
+    """
+    批量分析文本情感：开启情感缓存时一次查询缓存，未命中的文本（文本较多时在进程池中）批量打分
+    :param texts: 文本列表
+    :return: 与 texts 一一对应的 (情感得分, 情感标签)，空文本或失败时为 (0.0, 'neutral')
+    """
+    results = [(0.0, 'neutral')] * len(texts)
+    valid = [i for i, text in enumerate(texts) if text and isinstance(text, str)]
+    valid_texts = [texts[i] for i in valid]
+    if Config.SENTIMENT_CACHE_ENABLED:
+        scores = sentiment_cache.score_many(valid_texts, lambda batch: score_many(batch).scores)
+    else:
+        scores = score_many(valid_texts).scores
+    for i, score in zip(valid, scores):
+        if score is not None:
+            results[i] = (round(score, 4), sentiment_label(score))
+    return results
+
+
+if __name__ == '__main__':
+    # 单进程与进程池打分的耗时对比: python -m data.sentiment_scoring [worker数]
+    import sys
+    import time
+
+    import pandas as pd
+
+    from data.dataset import COMMENT_CSV_PATH
+
+    logging.basicConfig(level=logging.WARNING)
+    contents = pd.read_csv(COMMENT_CSV_PATH, usecols=['评论内容'])['评论内容'].dropna().astype(str).tolist()
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+
+    _score_chunk(contents[:1])  # 加载模型
+    start = time.perf_counter()
+    single = score_many(contents, workers=1)
+    single_ms = (time.perf_counter() - start) * 1000
+
+    Config.SENTIMENT_PARALLEL_MIN_TEXTS = 0
+    score_many(contents[:workers], workers=workers, chunk_size=1)  # 启动进程池、加载模型
+    start = time.perf_counter()
+    pooled = score_many(contents, workers=workers)
+    pooled_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{len(contents)} 条评论: 单进程 {single_ms:.0f}ms, {workers} 个进程 {pooled_ms:.0f}ms, "
+          f"结果一致: {single.scores == pooled.scores}, 计数: {pooled.counts}")
@@ -0,0 +1,416 @@
+"""
+向量化情感引擎 - SnowNLP的分词模型和情感模型导出为numpy数组，一批评论一起分词、一起打分
+
+SnowNLP 每条评论构建一次对象，分词（字符级生成模型的Viterbi解码）和朴素贝叶斯打分都是逐字、逐词的Python循环，
+其中分词占绝大部分耗时。本模块把两个模型导出为数组（模型文件变化时重新导出，缓存为 .npz）：
+    - 分词：(字, 标签) 编号，一元计数数组，二元、三元计数按编码后的整数键排序（np.searchsorted 查找）；
+      一批评论的中文片段按长度排序，逐位置解码，每一步在所有未结束的片段上同时计算 4x4x4 的转移得分；
+    - 打分：词表 -> 列号，每列为 log P(词|积极) - log P(词|消极)（停用词为0，未登录词为加一平滑的值）；
+      一批评论的词组成稀疏的文档-词矩阵（COO：行号、列号），得分为一次稀疏矩阵向量乘（np.bincount）后取sigmoid。
+解码的平局规则、未登录字的处理与SnowNLP一致，得分与 SnowNLP(text).sentiments 只有浮点误差，
+python -m data.sentiment_vector 在评论数据上检查差异并对比吞吐量。
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 导出格式版本
+FORMAT_VERSION = 1
+
+# 分词标签（顺序与SnowNLP一致，决定平局时的取舍）
+TAGS = ('b', 'm', 'e', 's')
+B, M, E, S = range(4)
+
+# SnowNLP分词只处理这个范围内的汉字
+ZH_START, ZH_END = 0x4E00, 0x9FA5
+_ZH_RUN = re.compile('[\u4E00-\u9FA5]+')
+_OTHER_TOKEN = re.compile('[^\u4E00-\u9FA5\\s]+')
+
+# 与 SnowNLP(text).sentiments 对比时允许的误差
+TOLERANCE = 1e-9
+
+
+def _source_files() -> List[str]:
+    """导出所依赖的SnowNLP模型文件"""
+    from snownlp import normal, seg, sentiment
+    return [seg.data_path + '.3', sentiment.data_path + '.3', normal.stop_path]
+
+
+def source_signature() -> str:
+    """
+    SnowNLP模型文件的哈希，模型更换后重新导出
+    :return: 十六进制字符串
+    """
+    digest = hashlib.sha1(str(FORMAT_VERSION).encode())
+    for path in _source_files():
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def export_snownlp() -> Dict[str, np.ndarray]:
+    """
+    导出SnowNLP当前加载的分词模型、情感模型和停用词
+    :return: {数组名: 数组}
+    """
+    from snownlp import normal, seg, sentiment
+
+    model = seg.segger.segger
+    uni, bi, tri = model.uni.d, model.bi.d, model.tri.d
+
+    # (字, 标签) 编号，最后一个编号表示不存在的组合（计数为0）
+    pairs = list(uni.keys())
+    pair_ids = {pair: i for i, pair in enumerate(pairs)}
+    unknown = len(pairs)
+    base = unknown + 1
+
+    char_tag = np.full((ZH_END - ZH_START + 1, len(TAGS)), unknown, dtype=np.int64)
+    for (char, tag), pair_id in pair_ids.items():
+        if len(char) == 1 and ZH_START <= ord(char) <= ZH_END and tag in TAGS:
+            char_tag[ord(char) - ZH_START, TAGS.index(tag)] = pair_id
+
+    def keys(counts: Dict, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        encoded = np.empty(len(counts), dtype=np.int64)
+        values = np.empty(len(counts), dtype=np.float64)
+        for i, (key, count) in enumerate(counts.items()):
+            code = 0
+            for pair in key[:size]:
+                code = code * base + pair_ids.get(pair, unknown)
+            encoded[i] = code
+            values[i] = count
+        order = np.argsort(encoded)
+        return encoded[order], values[order]
+
+    bi_keys, bi_counts = keys(bi, 2)
+    tri_keys, tri_counts = keys(tri, 3)
+
+    # 朴素贝叶斯：每个词的 log P(词|积极) - log P(词|消极)，未出现的词计数为1（加一平滑）
+    classes = sentiment.classifier.classifier.d
+    pos, neg = classes['pos'], classes['neg']
+    vocab = sorted(set(pos.d) | set(neg.d))
+    pos_counts = np.array([pos.d.get(word, pos.none) for word in vocab], dtype=np.float64)
+    neg_counts = np.array([neg.d.get(word, neg.none) for word in vocab], dtype=np.float64)
+
+    return {
+        'format': np.array(FORMAT_VERSION),
+        'char_tag': char_tag,
+        'uni_counts': np.append(np.array([uni[pair] for pair in pairs], dtype=np.float64), 0.0),
+        'uni_total': np.array(model.uni.getsum(), dtype=np.float64),
+        'bos_id': np.array(pair_ids[('', 'BOS')]),
+        'lambdas': np.array([model.l1, model.l2, model.l3], dtype=np.float64),
+        'bi_keys': bi_keys,
+        'bi_counts': bi_counts,
+        'tri_keys': tri_keys,
+        'tri_counts': tri_counts,
+        'vocab': np.array(vocab, dtype=str),
+        'word_weights': np.log(pos_counts / pos.getsum()) - np.log(neg_counts / neg.getsum()),
+        'unknown_weight': np.array(np.log(pos.none / pos.getsum()) - np.log(neg.none / neg.getsum())),
+        'bias': np.array(np.log(pos.getsum()) - np.log(neg.getsum())),
+        'stopwords': np.array(sorted(normal.stop), dtype=str),
+    }
+
+
+class VectorSentimentModel:
+    """导出为数组的SnowNLP分词 + 情感模型"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.char_tag = arrays['char_tag']
+        self.seen = (self.char_tag != len(arrays['uni_counts']) - 1).any(axis=1)
+        self.uni_counts = arrays['uni_counts']
+        self.uni_total = float(arrays['uni_total'])
+        self.bos_id = int(arrays['bos_id'])
+        self.l1, self.l2, self.l3 = (float(value) for value in arrays['lambdas'])
+        self.base = len(self.uni_counts)
+        self.bi_keys, self.bi_counts = arrays['bi_keys'], arrays['bi_counts']
+        self.tri_keys, self.tri_counts = arrays['tri_keys'], arrays['tri_counts']
+
+        # 词 -> 列号：词表之后依次为未登录词、停用词（权重为0）两列
+        vocab = arrays['vocab'].tolist()
+        self.unknown_column = len(vocab)
+        self.stop_column = len(vocab) + 1
+        self.columns = {word: i for i, word in enumerate(vocab)}
+        self.columns.update((word, self.stop_column) for word in arrays['stopwords'].tolist())
+        self.weights = np.concatenate([arrays['word_weights'], [float(arrays['unknown_weight']), 0.0]])
+        self.bias = float(arrays['bias'])
+
+    @classmethod
+    def from_snownlp(cls) -> 'VectorSentimentModel':
+        return cls(export_snownlp())
+
+    # ---------- 分词 ----------
+
+    @staticmethod
+    def _count(keys: np.ndarray, counts: np.ndarray, codes: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """
+        按编码后的键查计数，不存在时为0
+        只查 valid 的位置（含不存在的 (字, 标签) 组合的键一定不存在），去重排序后查找，重复的字组合只查一次
+        """
+        result = np.zeros(codes.shape)
+        needles = codes[valid]
+        if needles.size:
+            unique, inverse = np.unique(needles, return_inverse=True)
+            index = np.searchsorted(keys, unique)
+            index[index == len(keys)] = 0
+            result[valid] = np.where(keys[index] == unique, counts[index], 0.0)[inverse]
+        return result
+
+    @staticmethod
+    def _div(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+        """分母为0时结果为0（与SnowNLP一致）"""
+        return np.divide(numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape),
+                         where=denominator != 0)
+
+    def _log_prob(self, a1: np.ndarray, a2: np.ndarray, a3: np.ndarray) -> np.ndarray:
+        """
+        三元转移得分 log(l1*P(s3) + l2*P(s3|s2) + l3*P(s3|s1,s2))
+        :param a1: (n, V) 前两个字各标签的 (字, 标签) 编号
+        :param a2: (n, U) 前一个字各标签的编号
+        :param a3: (n, 4) 当前字各标签的编号
+        :return: (n, V, U, 4)
+        """
+        base, unknown = self.base, self.base - 1
+        k1, k2, k3 = a1 != unknown, a2 != unknown, a3 != unknown
+        uni = self.l1 * (self.uni_counts[a3] / self.uni_total)
+        pair2 = a2[:, :, None] * base + a3[:, None, :]
+        bi = self._div(self.l2 * self._count(self.bi_keys, self.bi_counts, pair2, k2[:, :, None] & k3[:, None, :]),
+                       self.uni_counts[a2][:, :, None])
+        pair1 = a1[:, :, None] * base + a2[:, None, :]
+        known1 = k1[:, :, None] & k2[:, None, :]
+        triple = pair1[:, :, :, None] * base + a3[:, None, None, :]
+        tri = self._div(self.l3 * self._count(self.tri_keys, self.tri_counts, triple,
+                                              known1[:, :, :, None] & k3[:, None, None, :]),
+                        self._count(self.bi_keys, self.bi_counts, pair1, known1)[:, :, :, None])
+        with np.errstate(divide='ignore'):
+            return np.log(uni[:, None, None, :] + bi[:, None, :, :] + tri)
+
+    def _decode(self, rows: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """
+        批量Viterbi解码
+        :param rows: 各中文片段拼接后的字（汉字表中的行号）
+        :param lengths: 各片段的长度
+        :return: 与 rows 对应的标签
+        """
+        tags = np.zeros(len(rows), dtype=np.int64)
+        if len(lengths) == 0:
+            return tags
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        order = np.argsort(-lengths, kind='stable')
+        sorted_lengths, sorted_starts = lengths[order], starts[order]
+        # 第k个位置上未结束的片段数（片段按长度降序排列，未结束的总在前面）
+        active = np.searchsorted(-sorted_lengths, -np.arange(sorted_lengths[0] + 1), side='left')
+
+        char_tag = self.char_tag[rows]
+        seen = self.seen[rows]
+        bos = np.full((len(lengths), 1), self.bos_id, dtype=np.int64)
+        first = state = None
+        backpointers = []
+
+        for k in range(int(sorted_lengths[0])):
+            n = active[k]
+            pos = sorted_starts[:n] + k
+            a3, known = char_tag[pos], seen[pos]
+            if k == 0:
+                # 第一个字：前两个都是句首，未登录字得分不变
+                log_prob = self._log_prob(bos[:n], bos[:n], a3)[:, 0, 0, :]
+                first = np.where(known[:, None], log_prob, 0.0)
+            elif k == 1:
+                # state[v, u]：前一个字标签v、当前字标签u
+                log_prob = self._log_prob(bos[:n], char_tag[pos - 1], a3)[:, 0]
+                state = np.where(known[:, None, None], first[:n, :, None] + log_prob, first[:n, :, None])
+            else:
+                candidates = state[:n, :, :, None] + self._log_prob(char_tag[pos - 2], char_tag[pos - 1], a3)
+                # 得分相同时取先出现的（标签顺序在前的）
+                best = np.argmax(candidates, axis=1)
+                scores = np.take_along_axis(candidates, best[:, None], axis=1)[:, 0]
+                # 未登录字：SnowNLP依次覆盖，保留的是前一个字之前标签为s的路径，得分不变
+                best = np.where(known[:, None, None], best, S)
+                state = np.where(known[:, None, None], scores,
+                                 np.broadcast_to(state[:n, S, :, None], scores.shape))
+                backpointers.append(best)
+
+            # 在这一位置结束的片段：取得分最高的路径（按SnowNLP的候选顺序，先比较当前标签）
+            done = slice(active[k + 1], n)
+            if done.start < done.stop:
+                ends = sorted_starts[done] + k
+                if k == 0:
+                    tags[ends] = np.argmax(first[done], axis=1)
+                else:
+                    flat = np.argmax(state[done].transpose(0, 2, 1).reshape(-1, 16), axis=1)
+                    tags[ends] = flat // 4
+                    tags[ends - 1] = flat % 4
+
+        # 回溯
+        for k in range(int(sorted_lengths[0]) - 1, 1, -1):
+            n = active[k]
+            pos = sorted_starts[:n] + k
+            tags[pos - 2] = backpointers[k - 2][np.arange(n), tags[pos - 1], tags[pos]]
+        return tags
+
+    def segment(self, texts: List[str]) -> Tuple[List[str], np.ndarray]:
+        """
+        批量分词，与SnowNLP的 seg.seg() 结果一致（不保留词序）
+        :param texts: 文本列表
+        :return: (所有词, 每个词所属文本的序号)
+        """
+        runs, run_docs, words, word_docs = [], [], [], []
+        for i, text in enumerate(texts):
+            found = _ZH_RUN.findall(text)
+            runs.extend(found)
+            run_docs.extend([i] * len(found))
+            others = _OTHER_TOKEN.findall(text)
+            words.extend(others)
+            word_docs.extend([i] * len(others))
+        if not runs:
+            return words, np.array(word_docs, dtype=np.int64)
+
+        joined = ''.join(runs)
+        rows = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32).astype(np.int64) - ZH_START
+        lengths = np.array([len(run) for run in runs], dtype=np.int64)
+        tags = self._decode(rows, lengths)
+
+        # 词的起点：片段开头、标签为b/s、前一个字标签为e
+        begins = np.zeros(len(rows), dtype=bool)
+        begins[np.concatenate([[0], np.cumsum(lengths)[:-1]])] = True
+        begins |= (tags == B) | (tags == S)
+        begins[1:] |= tags[:-1] == E
+        bounds = np.append(np.flatnonzero(begins), len(rows)).tolist()
+        words.extend(joined[start:end] for start, end in zip(bounds[:-1], bounds[1:]))
+
+        char_docs = np.repeat(np.array(run_docs, dtype=np.int64), lengths)
+        word_docs = np.concatenate([np.array(word_docs, dtype=np.int64), char_docs[bounds[:-1]]])
+        return words, word_docs
+
+    # ---------- 打分 ----------
+
+    def document_term(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        文档-词矩阵（COO格式，重复的 (行, 列) 表示词频）
+        :param texts: 文本列表
+        :return: (行号, 列号)
+        """
+        words, docs = self.segment(texts)
+        get = self.columns.get
+        columns = np.fromiter((get(word, self.unknown_column) for word in words), dtype=np.int64, count=len(words))
+        return docs, columns
+
+    def score(self, texts: List[str]) -> np.ndarray:
+        """
+        批量情感得分，与 SnowNLP(text).sentiments 一致（浮点误差内）
+        :param texts: 文本列表
+        :return: 得分数组
+        """
+        if not texts:
+            return np.zeros(0)
+        docs, columns = self.document_term(texts)
+        # 稀疏矩阵向量乘：每行的词权重之和
+        logit = self.bias + np.bincount(docs, weights=self.weights[columns], minlength=len(texts))
+        # 与SnowNLP相同：取概率较大的类别，为消极时返回 1 - P(消极)
+        with np.errstate(over='ignore'):
+            positive = 1.0 / (1.0 + np.exp(-logit))
+            negative = 1.0 / (1.0 + np.exp(logit))
+        return np.where(positive > negative, positive, 1.0 - negative)
+
+
+# 全局模型（首次使用时加载）：(模型文件哈希, VectorSentimentModel)
+_model: Optional[Tuple[str, VectorSentimentModel]] = None
+_model_lock = threading.Lock()
+
+
+def get_vector_model() -> VectorSentimentModel:
+    """
+    获取向量化情感模型，优先读取导出缓存，SnowNLP模型文件变化时重新导出
+    :return: VectorSentimentModel
+    """
+    global _model
+    with _model_lock:
+        if _model is not None:
+            return _model[1]
+        signature = source_signature()
+
+        path = str(Config.SENTIMENT_VECTOR_MODEL_PATH)
+        arrays = None
+        if os.path.exists(path):
+            try:
+                with np.load(path, allow_pickle=False) as data:
+                    if str(data['signature']) == signature:
+                        arrays = {name: data[name] for name in data.files}
+            except Exception as e:
+                logger.error(f"读取向量化情感模型失败: {e}")
+        if arrays is None:
+            arrays = export_snownlp()
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+                np.savez(tmp_path, signature=np.array(signature), **arrays)
+                os.replace(tmp_path, path)
+                logger.info(f"向量化情感模型已导出: {path}")
+            except Exception as e:
+                logger.error(f"保存向量化情感模型失败: {e}")
+
+        _model = (signature, VectorSentimentModel(arrays))
+        return _model[1]
+
+
+def score_texts(texts: List[str]) -> List[Optional[float]]:
+    """
+    按 Config.SENTIMENT_VECTOR_BATCH 分批打分
+    :param texts: 文本列表
+    :return: 得分列表，空文本为None（与 data.sentiment_scoring 一致）
+    """
+    model = get_vector_model()
+    scores: List[Optional[float]] = [None] * len(texts)
+    valid = [i for i, text in enumerate(texts) if text and isinstance(text, str)]
+    batch = Config.SENTIMENT_VECTOR_BATCH
+    for start in range(0, len(valid), batch):
+        index = valid[start:start + batch]
+        # 相同文本（转发、刷屏的评论）只分词、打分一次
+        unique = {}
+        inverse = [unique.setdefault(texts[i], len(unique)) for i in index]
+        unique_scores = model.score(list(unique)).tolist()
+        for i, position in zip(index, inverse):
+            scores[i] = unique_scores[position]
+    return scores
+
+
+if __name__ == '__main__':
+    # 与SnowNLP对比得分差异和吞吐量: python -m data.sentiment_vector [重复倍数]
+    import sys
+    import time
+
+    import pandas as pd
+    from snownlp import SnowNLP
+
+    from data.dataset import COMMENT_CSV_PATH
+
+    logging.basicConfig(level=logging.WARNING)
+    contents = pd.read_csv(COMMENT_CSV_PATH, usecols=['评论内容'])['评论内容'].dropna().astype(str).tolist()
+
+    start = time.perf_counter()
+    expected = np.array([SnowNLP(text).sentiments for text in contents])
+    snownlp_seconds = time.perf_counter() - start
+
+    get_vector_model()
+    start = time.perf_counter()
+    actual = np.array(score_texts(contents), dtype=np.float64)
+    vector_seconds = time.perf_counter() - start
+
+    diff = np.abs(actual - expected)
+    print(f"{len(contents)} 条评论: 最大误差 {diff.max():.2e}, 超过 {TOLERANCE:g} 的 {int((diff > TOLERANCE).sum())} 条")
+    print(f"SnowNLP: {len(contents) / snownlp_seconds * 60:,.0f} 条/分钟, "
+          f"向量化: {len(contents) / vector_seconds * 60:,.0f} 条/分钟")
+
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    start = time.perf_counter()
+    score_texts(contents * copies)
+    rate = len(contents) * copies / (time.perf_counter() - start) * 60
+    print(f"向量化 x{copies}（重复文本只打分一次）: {rate:,.0f} 条/分钟")
@@ -0,0 +1,335 @@
+"""
+多进程共享数据集模块 - 各Django worker进程零拷贝挂载同一份标准化数据
+
+默认每个worker进程各自解析CSV并持有一份完整的视频、评论数据。开启 Config.DATASET_SHARED_ENABLED 后：
+    1. 某个进程（发现CSV有更新的第一个worker，或 python -m data.shared_dataset）将标准化后的数据
+       写入 DATASET_SHARED_DIR 下的Arrow IPC文件，并递增版本号；
+    2. 所有worker以内存映射方式打开该文件，数值列、时间列、文本列直接引用映射的内存，不复制数据，
+       多个进程共享操作系统的同一份页缓存；
+    3. 每次访问检查版本文件，版本号变化时重新挂载新文件。
+
+评论数据按aweme_id分组排列（同一视频的评论连续，组内保持CSV原顺序），按视频取评论时直接切片。
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 按该列分组排列的数据集（CSV文件名 -> 列名）
+GROUP_COLUMNS = {
+    'comment.csv': 'aweme_id',
+}
+
+# 构建锁超时时间（秒），超过后视为构建进程已退出
+LOCK_TIMEOUT = 600
+
+
+def _shared_dir() -> str:
+    return str(Config.DATASET_SHARED_DIR)
+
+
+def _dataset_name(csv_path: str) -> str:
+    return os.path.splitext(os.path.basename(csv_path))[0]
+
+
+def _meta_path(name: str) -> str:
+    return os.path.join(_shared_dir(), f'{name}.json')
+
+
+def group_rows(df: pd.DataFrame, column: str) -> pd.DataFrame:
+    """
+    按列分组排列：稳定排序，组的顺序为首次出现的顺序，缺失值排在最前
+    :param df: DataFrame
+    :param column: 分组列
+    :return: DataFrame
+    """
+    codes, _ = pd.factorize(df[column])
+    if len(codes) == 0 or (np.diff(codes) >= 0).all():
+        return df
+    return df.take(np.argsort(codes, kind='stable'))
+
+
+def _to_arrow_table(df: pd.DataFrame):
+    """
+    DataFrame -> Arrow表：文本列统一为large_string（pandas的Arrow字符串类型），单个数据块
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+    fields = []
+    for field in table.schema:
+        if pa.types.is_string(field.type):
+            field = field.with_type(pa.large_string())
+        fields.append(field)
+    return table.cast(pa.schema(fields)).combine_chunks()
+
+
+def _column_from_arrow(array, dtype: str):
+    """
+    Arrow列 -> pandas列，尽量直接引用Arrow内存（内存映射文件）而不复制
+    :param array: pyarrow.ChunkedArray（单个数据块）
+    :param dtype: 原pandas类型
+    :return: numpy数组或pandas扩展数组
+    """
+    import pyarrow as pa
+
+    chunk = array.chunk(0) if array.num_chunks == 1 else array.combine_chunks()
+
+    # 文本列：Arrow字符串，零拷贝
+    if pa.types.is_large_string(chunk.type):
+        return pd.arrays.ArrowStringArray(pa.chunked_array([chunk]))
+
+    # 可空整数列：数据零拷贝（无缺失值时），缺失值掩码单独生成
+    if dtype == 'Int64':
+        values = chunk.fill_null(0).to_numpy(zero_copy_only=chunk.null_count == 0)
+        mask = chunk.is_null().to_numpy(zero_copy_only=False)
+        return pd.arrays.IntegerArray(values, mask)
+
+    # 数值列、时间列：无缺失值时零拷贝
+    if chunk.null_count == 0 and (pa.types.is_integer(chunk.type) or pa.types.is_floating(chunk.type)
+                                  or pa.types.is_timestamp(chunk.type)):
+        return chunk.to_numpy(zero_copy_only=True)
+
+    # category等其他类型：转换为pandas（category只复制编码）
+    return chunk.to_pandas().array
+
+
+class SharedDataset:
+    """一个版本的共享数据：内存映射的Arrow表 + 在其上构建的DataFrame"""
+
+    def __init__(self, version: int, path: str, frame: pd.DataFrame):
+        self.version = version
+        self.path = path
+        self.frame = frame
+
+
+class SharedDatasetStore:
+    """
+    共享数据集存储
+
+    publish() 写入新版本的Arrow文件并更新版本文件；
+    attach() 检查版本文件，版本变化时内存映射新文件，否则返回已挂载的数据。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # 数据集名称 -> (版本文件签名, SharedDataset)
+        self._attached: Dict[str, Tuple[Tuple[int, int], SharedDataset]] = {}
+
+    @staticmethod
+    def read_meta(name: str) -> Optional[Dict]:
+        """
+        读取版本文件
+        :param name: 数据集名称
+        :return: {'version', 'file', 'source_signature', 'dtypes', 'rows', 'built_at'}，不存在时返回None
+        """
+        try:
+            with open(_meta_path(name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def publish(self, csv_path: str, df: pd.DataFrame, source_signature: Optional[Tuple[int, int]]) -> int:
+        """
+        发布新版本（先写数据文件，再原子替换版本文件）
+        :param csv_path: CSV文件路径
+        :param df: 标准化后的DataFrame
+        :param source_signature: 构建时CSV的(修改时间ns, 文件大小)
+        :return: 新版本号
+        """
+        import pyarrow as pa
+
+        name = _dataset_name(csv_path)
+        os.makedirs(_shared_dir(), exist_ok=True)
+
+        group_column = GROUP_COLUMNS.get(os.path.basename(csv_path))
+        if group_column and group_column in df.columns:
+            df = group_rows(df, group_column)
+
+        old_meta = self.read_meta(name)
+        version = (old_meta['version'] if old_meta else 0) + 1
+        filename = f'{name}.v{version}.arrow'
+        data_path = os.path.join(_shared_dir(), filename)
+        tmp_path = f'{data_path}.{os.getpid()}.tmp'
+
+        table = _to_arrow_table(df)
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, data_path)
+
+        meta = {
+            'version': version,
+            'file': filename,
+            'source_signature': list(source_signature) if source_signature else None,
+            'dtypes': {col: str(dtype) for col, dtype in df.dtypes.items()},
+            'rows': len(df),
+            'built_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        meta_tmp = f'{_meta_path(name)}.{os.getpid()}.tmp'
+        with open(meta_tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_tmp, _meta_path(name))
+        logger.info(f"共享数据集已发布: {data_path}, 版本 {version}, 共 {len(df)} 条")
+
+        # 删除旧版本文件：已挂载的进程仍持有映射，Windows下文件被占用时保留
+        if old_meta:
+            try:
+                os.remove(os.path.join(_shared_dir(), old_meta['file']))
+            except OSError:
+                pass
+        return version
+
+    def attach(self, csv_path: str) -> Optional[SharedDataset]:
+        """
+        挂载最新版本，版本未变化时直接返回已挂载的数据
+        :param csv_path: CSV文件路径
+        :return: SharedDataset，尚未发布时返回None
+        """
+        name = _dataset_name(csv_path)
+        try:
+            stat = os.stat(_meta_path(name))
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            attached = self._attached.get(name)
+            if attached is not None and attached[0] == signature:
+                return attached[1]
+
+            meta = self.read_meta(name)
+            if meta is None:
+                return attached[1] if attached else None
+            if attached is not None and attached[1].version == meta['version']:
+                self._attached[name] = (signature, attached[1])
+                return attached[1]
+
+            dataset = self._map(meta)
+            self._attached[name] = (signature, dataset)
+            logger.info(f"挂载共享数据集: {dataset.path}, 版本 {dataset.version}, 共 {len(dataset.frame)} 条")
+            return dataset
+
+    @staticmethod
+    def _map(meta: Dict) -> SharedDataset:
+        """
+        内存映射Arrow文件并构建DataFrame
+        :param meta: 版本信息
+        :return: SharedDataset
+        """
+        import pyarrow as pa
+
+        path = os.path.join(_shared_dir(), meta['file'])
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        columns = {
+            name: _column_from_arrow(table.column(name), meta['dtypes'].get(name, ''))
+            for name in table.column_names
+        }
+        frame = pd.DataFrame(columns, copy=False)
+        return SharedDataset(meta['version'], path, frame)
+
+    def version(self, csv_path: str) -> Optional[int]:
+        """
+        当前发布的版本号
+        :param csv_path: CSV文件路径
+        :return: 版本号，尚未发布时返回None
+        """
+        meta = self.read_meta(_dataset_name(csv_path))
+        return meta['version'] if meta else None
+
+    def is_stale(self, csv_path: str, source_signature: Optional[Tuple[int, int]]) -> bool:
+        """
+        已发布的数据是否落后于CSV
+        :param csv_path: CSV文件路径
+        :param source_signature: CSV当前的(修改时间ns, 文件大小)
+        :return: 是否需要重新构建
+        """
+        meta = self.read_meta(_dataset_name(csv_path))
+        if meta is None:
+            return True
+        return tuple(meta['source_signature'] or ()) != tuple(source_signature or ())
+
+    @staticmethod
+    def try_lock(csv_path: str) -> Optional[str]:
+        """
+        获取构建锁（锁文件），已被其他进程持有时返回None
+        :param csv_path: CSV文件路径
+        :return: 锁文件路径
+        """
+        os.makedirs(_shared_dir(), exist_ok=True)
+        lock_path = os.path.join(_shared_dir(), f'{_dataset_name(csv_path)}.lock')
+        try:
+            if time.time() - os.path.getmtime(lock_path) > LOCK_TIMEOUT:
+                os.remove(lock_path)
+        except OSError:
+            pass
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return None
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        return lock_path
+
+    def wait_published(self, csv_path: str, timeout: float = LOCK_TIMEOUT) -> Optional[SharedDataset]:
+        """
+        尚未发布任何版本且其他进程正在构建时，等待构建完成后挂载
+        :param csv_path: CSV文件路径
+        :param timeout: 最长等待时间（秒）
+        :return: SharedDataset，构建进程退出或超时仍未发布时返回None
+        """
+        lock_path = os.path.join(_shared_dir(), f'{_dataset_name(csv_path)}.lock')
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            dataset = self.attach(csv_path)
+            if dataset is not None or not os.path.exists(lock_path):
+                return dataset
+            time.sleep(0.2)
+        return None
+
+    @staticmethod
+    def release_lock(lock_path: str):
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+
+# 全局共享数据集存储
+shared_store = SharedDatasetStore()
+
+
+def publish_all() -> Dict[str, int]:
+    """
+    解析视频、评论CSV并发布共享数据集
+    :return: {'video': 版本号, 'comment': 版本号}
+    """
+    from data.dataset import VIDEO_CSV_PATH, COMMENT_CSV_PATH, DatasetCache
+    from data.normalize import normalize_video_data, normalize_comment_data
+
+    cache = DatasetCache(shared=False)
+    versions = {}
+    for name, path, normalizer in [('video', VIDEO_CSV_PATH, normalize_video_data),
+                                   ('comment', COMMENT_CSV_PATH, normalize_comment_data)]:
+        signature = cache.file_signature(path)
+        if signature is None:
+            continue
+        df = cache.get(path, normalizer)
+        versions[name] = shared_store.publish(path, df, signature)
+    return versions
+
+
+if __name__ == '__main__':
+    # 发布共享数据集: python -m data.shared_dataset
+    logging.basicConfig(level=logging.INFO)
+    print(publish_all())
@@ -0,0 +1,329 @@
+"""
+可合并统计模块 - 数值指标的计数、合计、最大、最小与分位数（中位数、p90、p99）
+
+MetricStats 可以逐批更新（新爬取的行、流式读取的块），也可以合并多个分区的结果，
+不需要重新扫描历史数据：
+    - 计数、合计、最大、最小：精确值；
+    - 分位数：不同取值不超过 STATS_EXACT_MAX_VALUES 个时保存每个取值的出现次数，结果精确
+      （与 numpy.percentile 的线性插值一致）；超过后转换为对数分桶的分位数草图（DDSketch），
+      结果的相对误差不超过 STATS_SKETCH_RELATIVE_ACCURACY，内存只与数值的数量级范围有关。
+草图只用于增量更新、分区合并的聚合表；整列数据已在内存中时用 exact_result() 精确计算。
+exact_only=True 时始终保存取值计数、不转换为草图，用于结果须与 exact_result() 一致的统计
+（如看板的 video_statistics），内存随不同取值的个数增长。
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+# 默认输出的分位数
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+def _numeric_values(series: pd.Series):
+    """
+    去掉缺失值后的数值数组，全为整数时为int64（合计保持整数）
+    :param series: 数值列
+    :return: (数组, 是否为整数)
+    """
+    series = pd.Series(series).dropna()
+    integer = series.dtype.kind in 'iub' or (series.dtype.kind == 'f' and (series % 1 == 0).all())
+    return series.to_numpy(dtype='int64' if integer else 'float64'), integer
+
+
+class QuantileSketch:
+    """
+    对数分桶的分位数草图（DDSketch）
+    正数x落入编号为 ceil(log_gamma(x)) 的桶，gamma = (1 + a) / (1 - a)，
+    桶内取值用 2 * gamma^i / (gamma + 1) 估计，相对误差不超过 a；负数按绝对值单独分桶，0单独计数。
+    两个草图合并时对应的桶计数相加，结果与一次性构建相同。
+    """
+
+    def __init__(self, relative_accuracy: Optional[float] = None):
+        self.relative_accuracy = relative_accuracy or Config.STATS_SKETCH_RELATIVE_ACCURACY
+        self.gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+
+    def _add_buckets(self, buckets: Dict[int, int], values: np.ndarray, counts: np.ndarray):
+        indexes = np.ceil(np.log(values) / self._log_gamma).astype('int64')
+        frame = pd.DataFrame({'index': indexes, 'count': counts}).groupby('index')['count'].sum()
+        for index, count in frame.items():
+            buckets[int(index)] = buckets.get(int(index), 0) + int(count)
+
+    def add(self, values: np.ndarray, counts: Optional[np.ndarray] = None):
+        """
+        加入一批数值
+        :param values: 数值数组（不含缺失值）
+        :param counts: 每个数值的出现次数，None表示各1次
+        """
+        values = np.asarray(values, dtype='float64')
+        counts = np.ones(len(values), dtype='int64') if counts is None else np.asarray(counts, dtype='int64')
+        self.zero_count += int(counts[values == 0].sum())
+        if (values > 0).any():
+            self._add_buckets(self.positive, values[values > 0], counts[values > 0])
+        if (values < 0).any():
+            self._add_buckets(self.negative, -values[values < 0], counts[values < 0])
+
+    def merge(self, other: 'QuantileSketch'):
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, count in theirs.items():
+                mine[index] = mine.get(index, 0) + count
+        self.zero_count += other.zero_count
+
+    def _value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q: float, count: int) -> float:
+        """
+        分位数估计
+        :param q: 0~1
+        :param count: 总数
+        :return: 估计值
+        """
+        rank = q * (count - 1)
+        cumulative = 0
+        # 从最小值开始：负数桶按编号从大到小，再到0，再到正数桶
+        for index in sorted(self.negative, reverse=True):
+            cumulative += self.negative[index]
+            if cumulative > rank:
+                return -self._value(index)
+        cumulative += self.zero_count
+        if cumulative > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            cumulative += self.positive[index]
+            if cumulative > rank:
+                return self._value(index)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'positive': [[k, v] for k, v in self.positive.items()],
+            'negative': [[k, v] for k, v in self.negative.items()],
+            'zero_count': self.zero_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'QuantileSketch':
+        sketch = cls(data['relative_accuracy'])
+        sketch.positive = {k: v for k, v in data['positive']}
+        sketch.negative = {k: v for k, v in data['negative']}
+        sketch.zero_count = data['zero_count']
+        return sketch
+
+
+class MetricStats:
+    """
+    单个指标的可合并统计
+    values 为精确的取值计数，转换为草图后为None，此后分位数由 sketch 估计
+    exact_only 为True时不限制不同取值的个数，分位数始终精确
+    """
+
+    def __init__(self, exact_max_values: Optional[int] = None, exact_only: bool = False):
+        self.exact_max_values = exact_max_values or Config.STATS_EXACT_MAX_VALUES
+        self.exact_only = exact_only
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.values: Optional[Dict] = {}
+        self.sketch: Optional[QuantileSketch] = None
+
+    @classmethod
+    def from_series(cls, series: pd.Series) -> 'MetricStats':
+        """
+        由一列数据构建
+        :param series: 数值列
+        :return: MetricStats
+        """
+        stats = cls()
+        stats.update(series)
+        return stats
+
+    @property
+    def exact(self) -> bool:
+        """分位数是否为精确值"""
+        return self.values is not None
+
+    def _to_sketch(self):
+        """取值过多时转换为草图"""
+        self.sketch = QuantileSketch()
+        if self.values:
+            self.sketch.add(np.array(list(self.values.keys())), np.array(list(self.values.values())))
+        self.values = None
+
+    def _add_counts(self, values: np.ndarray, counts: np.ndarray):
+        if self.values is not None:
+            for value, count in zip(values.tolist(), counts.tolist()):
+                self.values[value] = self.values.get(value, 0) + count
+            if not self.exact_only and len(self.values) > self.exact_max_values:
+                self._to_sketch()
+        else:
+            self.sketch.add(values, counts)
+
+    def update(self, series: pd.Series):
+        """
+        加入新的一批数据（缺失值忽略）
+        :param series: 数值列
+        """
+        values, integer = _numeric_values(series)
+        if values.size == 0:
+            return
+
+        self.count += len(values)
+        self.total += int(values.sum()) if integer else float(values.sum())
+        low, high = values.min().item(), values.max().item()
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+        unique, counts = np.unique(values, return_counts=True)
+        self._add_counts(unique, counts)
+
+    def merge(self, other: 'MetricStats'):
+        """
+        合并另一个分区的统计
+        :param other: MetricStats
+        """
+        if other.count == 0:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+        if other.values is not None:
+            self._add_counts(np.array(list(other.values.keys())), np.array(list(other.values.values())))
+        else:
+            if self.exact_only:
+                raise ValueError("精确统计不能合并草图模式的统计")
+            if self.values is not None:
+                self._to_sketch()
+            self.sketch.merge(other.sketch)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        分位数
+        :param q: 0~1
+        :return: 精确模式下与 numpy.percentile（线性插值）一致，草图模式下为估计值
+        """
+        if self.count == 0:
+            return None
+        if self.values is None:
+            return float(min(max(self.sketch.quantile(q, self.count), self.min), self.max))
+
+        keys = sorted(self.values)
+        cumulative = np.cumsum([self.values[k] for k in keys])
+        position = q * (self.count - 1)
+        lower_rank = math.floor(position)
+        lower = keys[int(np.searchsorted(cumulative, lower_rank, side='right'))]
+        upper = keys[int(np.searchsorted(cumulative, min(lower_rank + 1, self.count - 1), side='right'))]
+        # 与 numpy.percentile 相同的插值公式，结果逐位一致
+        fraction = position - lower_rank
+        if fraction >= 0.5:
+            return float(upper - (upper - lower) * (1 - fraction))
+        return float(lower + (upper - lower) * fraction)
+
+    def percentiles(self, percentiles: Iterable[int] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+        """
+        多个分位数
+        :param percentiles: 百分位，如 (50, 90, 99)
+        :return: {'p50': ..., 'p90': ..., 'p99': ...}
+        """
+        return {f'p{p}': self.quantile(p / 100) for p in percentiles}
+
+    def result(self) -> Dict[str, any]:
+        """
+        统计结果：合计、均值、最大、最小、中位数以及 p50 / p90 / p99
+        :return: 统计字典
+        """
+        if self.count == 0:
+            return {}
+        result = {
+            'total': self.total,
+            'mean': self.total / self.count,
+            'max': self.max,
+            'min': self.min,
+            'median': self.quantile(0.5),
+        }
+        result.update(self.percentiles())
+        return result
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'values': [[k, v] for k, v in self.values.items()] if self.values is not None else None,
+            'sketch': self.sketch.to_dict() if self.sketch is not None else None,
+            'exact_only': self.exact_only,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'MetricStats':
+        stats = cls(exact_only=data.get('exact_only', False))
+        stats.count = data['count']
+        stats.total = data['total']
+        stats.min = data['min']
+        stats.max = data['max']
+        stats.values = {k: v for k, v in data['values']} if data['values'] is not None else None
+        stats.sketch = QuantileSketch.from_dict(data['sketch']) if data['sketch'] is not None else None
+        return stats
+
+
+def exact_result(series: pd.Series, percentiles: Iterable[int] = DEFAULT_PERCENTILES) -> Dict[str, any]:
+    """
+    整列数据已在内存中时的统计结果（格式与 MetricStats.result() 一致），分位数用 numpy.percentile 精确计算
+    :param series: 数值列
+    :param percentiles: 百分位
+    :return: 统计字典，没有数据时为空
+    """
+    values, integer = _numeric_values(series)
+    if values.size == 0:
+        return {}
+    total = int(values.sum()) if integer else float(values.sum())
+    percentiles = list(percentiles)
+    quantiles = np.percentile(values, [50] + percentiles)
+    result = {
+        'total': total,
+        'mean': total / len(values),
+        'max': values.max().item(),
+        'min': values.min().item(),
+        'median': float(quantiles[0]),
+    }
+    result.update({f'p{p}': float(q) for p, q in zip(percentiles, quantiles[1:])})
+    return result
+
+
+def merge_stats(parts: List[MetricStats]) -> MetricStats:
+    """
+    合并多个分区的统计
+    :param parts: MetricStats列表
+    :return: 合并后的MetricStats
+    """
+    merged = MetricStats()
+    for part in parts:
+        merged.merge(part)
+    return merged
+
+
+if __name__ == '__main__':
+    # 精确模式与草图模式的分位数误差: python -m data.stats_sketch
+    rng = np.random.default_rng(0)
+    data = pd.Series(rng.lognormal(8, 2, 1_000_000).astype('int64'))
+
+    chunks = [MetricStats.from_series(pd.Series(chunk)) for chunk in np.array_split(data.to_numpy(), 10)]
+    stats = merge_stats(chunks)
+    print(f"精确: {stats.exact}, 草图桶数: {len(stats.sketch.positive) if stats.sketch else 0}")
+    for p in DEFAULT_PERCENTILES:
+        expected = float(np.percentile(data, p))
+        estimate = stats.quantile(p / 100)
+        print(f"p{p}: 实际 {expected:.1f}, 估计 {estimate:.1f}, 相对误差 {abs(estimate - expected) / expected:.4%}")
@@ -25,6 +25,9 @@ django.setup()
 
 from django.utils import timezone
 from video.models import VideoData, CommentData
+from data.normalize import CSV_DTYPES, normalize_video_data, normalize_comment_data
+from data.aggregates import materialized_aggregates
+from data.sentiment_pipeline import sentiment_pipeline
 import config
 
 logger = logging.getLogger(__name__)
@@ -40,59 +43,15 @@ class DataStorage:
         self.comment_csv_path = Path(__file__).parent / 'comment.csv'
 
     @staticmethod
-    def parse_duration(duration_str):
+    def localize_datetime(series: pd.Series) -> pd.Series:
         """
-        解析视频时长字符串，转换为秒数
-        例如: "01:59" -> 119秒
+        将标准化后的时间列转换为带时区的时间，无法解析的值为NaT（导入时使用当前时间）
+        :param series: datetime64列
+        :return: 带时区的datetime64列
         """
-        try:
-            if pd.isna(duration_str) or duration_str == '':
-                return 0
-            duration_str = str(duration_str).strip()
-            parts = duration_str.split(':')
-            if len(parts) == 2:
-                minutes = int(parts[0])
-                seconds = int(parts[1])
-                return minutes * 60 + seconds
-            elif len(parts) == 3:
-                hours = int(parts[0])
-                minutes = int(parts[1])
-                seconds = int(parts[2])
-                return hours * 3600 + minutes * 60 + seconds
-            return 0
-        except:
-            return 0
-
-    @staticmethod
-    def parse_datetime(datetime_str):
-        """
-        解析日期时间字符串
-        支持多种格式
-        """
-        if pd.isna(datetime_str) or datetime_str == '':
-            return timezone.now()
-
-        datetime_str = str(datetime_str).strip()
-
-        # 尝试多种日期格式
-        formats = [
-            '%Y-%m-%d %H:%M:%S',
-            '%Y/%m/%d %H:%M:%S',
-            '%Y-%m-%d',
-            '%Y/%m/%d',
-            '%m-%d %H:%M',
-        ]
-
-        for fmt in formats:
-            try:
-                dt = datetime.strptime(datetime_str, fmt)
-                return timezone.make_aware(dt)
-            except ValueError:
-                continue
-
-        # 如果都不匹配，返回当前时间
-        logger.warning(f"无法解析日期时间: {datetime_str}, 使用当前时间")
-        return timezone.now()
+        if series.dt.tz is not None:
+            return series
+        return series.dt.tz_localize(timezone.get_current_timezone(), ambiguous='NaT', nonexistent='NaT')
 
     def load_video_from_csv(self, csv_path: Optional[str] = None) -> pd.DataFrame:
         """
@@ -107,7 +66,7 @@ class DataStorage:
                 logger.error(f"视频CSV文件不存在: {path}")
                 return pd.DataFrame()
 
-            df = pd.read_csv(path, encoding='utf-8')
+            df = pd.read_csv(path, encoding='utf-8', dtype=CSV_DTYPES)
             logger.info(f"成功加载视频CSV文件，共 {len(df)} 条记录")
             return df
         except Exception as e:
@@ -127,7 +86,7 @@ class DataStorage:
                 logger.error(f"评论CSV文件不存在: {path}")
                 return pd.DataFrame()
 
-            df = pd.read_csv(path, encoding='utf-8')
+            df = pd.read_csv(path, encoding='utf-8', dtype=CSV_DTYPES)
             logger.info(f"成功加载评论CSV文件，共 {len(df)} 条记录")
             return df
         except Exception as e:
@@ -158,37 +117,10 @@ class DataStorage:
 
             stats['total'] = len(df)
 
-            # 列名映射
-            column_mapping = {
-                '用户名': 'user_name',
-                '粉丝数量': 'fans_count',
-                '视频描述': 'description',
-                '发布时间': 'publish_time',
-                '视频时长': 'duration',
-                '点赞数': 'like_count',
-                '收藏数': 'collect_count',
-                '评论数': 'comment_count',
-                '分享数': 'share_count',
-                '视频ID': 'aweme_id'
-            }
-
-            # 重命名列
-            df = df.rename(columns=column_mapping)
-
-            # 数据预处理
-            numeric_columns = ['fans_count', 'like_count', 'collect_count',
-                               'comment_count', 'share_count']
-            for col in numeric_columns:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-            # 解析duration字段
-            if 'duration' in df.columns:
-                df['duration'] = df['duration'].apply(self.parse_duration)
-
-            # 解析publish_time字段
+            # 列名映射、数值转换、解析时长和发布时间
+            df = normalize_video_data(df)
             if 'publish_time' in df.columns:
-                df['publish_time'] = df['publish_time'].apply(self.parse_datetime)
+                df['publish_time'] = self.localize_datetime(df['publish_time'])
 
             # 批量导入
             logger.info(f"开始导入视频数据到MySQL数据库...")
@@ -236,6 +168,9 @@ class DataStorage:
                     logger.error(f"导入第 {idx + 1} 行视频数据失败: {e}")
                     stats['failed'] += 1
 
+            # 已有视频被原地更新，视频聚合表下次读取时重建
+            materialized_aggregates.invalidate('video')
+
             logger.info(f"视频数据导入完成: {stats}")
             return stats
 
@@ -266,27 +201,10 @@ class DataStorage:
 
             stats['total'] = len(df)
 
-            # 列名映射
-            column_mapping = {
-                '用户id': 'user_id',
-                '用户名': 'user_name',
-                '评论内容': 'content',
-                '评论时间': 'comment_time',
-                'IP地址': 'user_ip',
-                '点赞数': 'like_count',
-                '视频id': 'aweme_id'
-            }
-
-            # 重命名列
-            df = df.rename(columns=column_mapping)
-
-            # 数据预处理
-            if 'like_count' in df.columns:
-                df['like_count'] = pd.to_numeric(df['like_count'], errors='coerce').fillna(0)
-
-            # 解析comment_time字段
+            # 列名映射、数值转换、解析评论时间
+            df = normalize_comment_data(df)
             if 'comment_time' in df.columns:
-                df['comment_time'] = df['comment_time'].apply(self.parse_datetime)
+                df['comment_time'] = self.localize_datetime(df['comment_time'])
 
             # 批量导入
             logger.info(f"开始导入评论数据到MySQL数据库...")
@@ -391,6 +309,8 @@ class DataStorage:
 
         VideoData.objects.all().delete()
         CommentData.objects.all().delete()
+        materialized_aggregates.invalidate()
+        sentiment_pipeline.invalidate()
 
         stats = {
             'videos_deleted': video_count,
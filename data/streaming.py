@@ -0,0 +1,328 @@
+"""
+流式分析模块 - 按块读取评论CSV并逐块聚合，内存占用不随文件大小增长
+
+评论数据超过内存时，IP分布、情感统计、词频、各视频评论数等分析不再一次性加载整个CSV，
+而是用 read_csv(chunksize=...) 逐块读取，每块只保留分析需要的列，
+各分析的中间结果（计数、得分合计）逐块合并，块的行数按内存预算估算。
+"""
+
+import logging
+import os
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from config import Config
+from data.dataset import COMMENT_CSV_PATH, drop_header_rows, memory_usage_mb
+from data.normalize import COMMENT_COLUMN_MAPPING, CSV_DTYPES, normalize_comment_data
+from data.stats_sketch import MetricStats
+
+logger = logging.getLogger(__name__)
+
+# 估算内存时采样的行数
+SAMPLE_ROWS = 2000
+
+# 解析CSV时的临时内存约为结果DataFrame的倍数
+PARSE_OVERHEAD = 3
+
+
+def estimate_chunk_rows(path: str = COMMENT_CSV_PATH, budget_mb: Optional[float] = None,
+                        columns: Optional[List[str]] = None) -> int:
+    """
+    按内存预算估算每块行数：采样前 SAMPLE_ROWS 行计算单行内存
+    :param path: CSV文件路径
+    :param budget_mb: 每块内存预算(MB)，默认使用配置
+    :param columns: 需要的列（英文列名），None表示全部
+    :return: 每块行数
+    """
+    if Config.STREAMING_CHUNK_ROWS:
+        return int(Config.STREAMING_CHUNK_ROWS)
+
+    budget_mb = budget_mb or Config.STREAMING_MEMORY_BUDGET_MB
+    sample = pd.read_csv(path, encoding='utf-8', dtype=CSV_DTYPES, nrows=SAMPLE_ROWS,
+                         usecols=_raw_columns(columns))
+    sample = normalize_comment_data(drop_header_rows(sample))
+    if sample.empty:
+        return SAMPLE_ROWS
+
+    row_mb = memory_usage_mb(sample) / len(sample) * PARSE_OVERHEAD
+    rows = max(int(budget_mb / max(row_mb, 1e-6)), 1000)
+    logger.info(f"流式读取: 单行约 {row_mb * 1024:.2f}KB, 内存预算 {budget_mb}MB, 每块 {rows} 行")
+    return rows
+
+
+def _raw_columns(columns: Optional[List[str]]) -> Optional[List[str]]:
+    """
+    英文列名 -> CSV原始列名
+    :param columns: 英文列名，None表示全部
+    :return: 原始列名
+    """
+    if columns is None:
+        return None
+    raw = {v: k for k, v in COMMENT_COLUMN_MAPPING.items()}
+    return [raw[col] for col in columns if col in raw]
+
+
+def iter_comment_chunks(path: str = COMMENT_CSV_PATH, columns: Optional[List[str]] = None,
+                        chunk_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    按块读取并标准化评论数据
+    :param path: CSV文件路径
+    :param columns: 需要的列（英文列名），None表示全部
+    :param chunk_rows: 每块行数，默认按内存预算估算
+    :return: 标准化后的DataFrame生成器
+    """
+    if not os.path.exists(path):
+        logger.warning(f"CSV文件不存在: {path}")
+        return
+
+    chunk_rows = chunk_rows or estimate_chunk_rows(path, columns=columns)
+    reader = pd.read_csv(path, encoding='utf-8', dtype=CSV_DTYPES, usecols=_raw_columns(columns),
+                         chunksize=chunk_rows)
+    with reader:
+        for chunk in reader:
+            chunk = drop_header_rows(chunk)
+            if not chunk.empty:
+                yield normalize_comment_data(chunk)
+
+
+class StreamingAggregator(ABC):
+    """逐块聚合的分析基类：update() 累加一块数据，merge() 合并另一个同类聚合器的中间结果"""
+
+    # 需要读取的列（英文列名）
+    columns: List[str] = []
+
+    @abstractmethod
+    def update(self, chunk: pd.DataFrame):
+        """累加一块数据"""
+
+    @abstractmethod
+    def merge(self, other: 'StreamingAggregator'):
+        """合并另一个同类聚合器的中间结果"""
+
+    @abstractmethod
+    def result(self):
+        """分析结果"""
+
+
+class ValueCounter(StreamingAggregator):
+    """按列计数，如IP分布、各视频评论数"""
+
+    def __init__(self, column: str, top_n: Optional[int] = None):
+        self.column = column
+        self.columns = [column]
+        self.top_n = top_n
+        self.counts = pd.Series(dtype='int64')
+
+    def update(self, chunk: pd.DataFrame):
+        counts = chunk[self.column].value_counts()
+        self.counts = self.counts.add(counts, fill_value=0)
+
+    def merge(self, other: 'ValueCounter'):
+        self.counts = self.counts.add(other.counts, fill_value=0)
+
+    def result(self) -> Dict[str, int]:
+        counts = self.counts.astype('int64').sort_values(ascending=False, kind='stable')
+        if self.top_n is not None:
+            counts = counts.head(self.top_n)
+        return {str(k): int(v) for k, v in counts.items()}
+
+
+class MetricAggregator(StreamingAggregator):
+    """数值列统计（合计、均值、最大、最小、分位数），如评论点赞数"""
+
+    def __init__(self, column: str):
+        self.column = column
+        self.columns = [column]
+        self.stats = MetricStats()
+
+    def update(self, chunk: pd.DataFrame):
+        self.stats.update(chunk[self.column])
+
+    def merge(self, other: 'MetricAggregator'):
+        self.stats.merge(other.stats)
+
+    def result(self) -> Dict[str, any]:
+        return self.stats.result()
+
+
+class WordFrequency(StreamingAggregator):
+    """评论内容分词词频"""
+
+    columns = ['content']
+
+    def __init__(self, top_n: Optional[int] = 50, segmenter: Optional[Callable[[str], List[str]]] = None):
+        if segmenter is None:
+            from data.wordcloud_gen import WordCloudGenerator
+            segmenter = WordCloudGenerator.segment_text
+        self.segmenter = segmenter
+        self.top_n = top_n
+        self.counter = Counter()
+        self.total_words = 0
+
+    def update(self, chunk: pd.DataFrame):
+        for content in chunk['content'].dropna():
+            words = self.segmenter(str(content))
+            self.counter.update(words)
+            self.total_words += len(words)
+
+    def merge(self, other: 'WordFrequency'):
+        self.counter.update(other.counter)
+        self.total_words += other.total_words
+
+    def result(self) -> Dict[str, any]:
+        return {
+            'keywords': [{'word': word, 'count': count} for word, count in self.counter.most_common(self.top_n)],
+            'total_words': self.total_words,
+        }
+
+
+class SentimentTotals(StreamingAggregator):
+    """情感统计，结果格式与 SentimentAnalyzer.analyze_all_comments() 一致"""
+
+    columns = ['content', 'user_name']
+
+    def __init__(self, sample_size: int = 100, scorer: Optional[Callable[[str], Tuple[float, str]]] = None):
+        # 未指定时按块批量分析（开启情感缓存时每块一次查询）
+        self.scorer = scorer
+        self.sample_size = sample_size
+        self.labels = Counter()
+        self.total_score = 0.0
+        self.analyzed = 0
+        self.comments = []
+
+    def update(self, chunk: pd.DataFrame):
+        contents = [str(content) if pd.notna(content) else '' for content in chunk['content']]
+        if self.scorer is None:
+            from data.sentiment import SentimentAnalyzer
+            results = SentimentAnalyzer.analyze_texts(contents)
+        else:
+            results = [self.scorer(content) for content in contents]
+
+        for content, user_name, (score, label) in zip(contents, chunk['user_name'], results):
+
+            # 收集评论列表（取前sample_size条）
+            if len(self.comments) < self.sample_size:
+                self.comments.append({
+                    'content': content,
+                    'sentiment': score,
+                    'user_name': str(user_name) if pd.notna(user_name) else ''
+                })
+
+            self.labels[label] += 1
+            self.total_score += score
+            self.analyzed += 1
+
+    def merge(self, other: 'SentimentTotals'):
+        self.labels.update(other.labels)
+        self.total_score += other.total_score
+        self.analyzed += other.analyzed
+        self.comments.extend(other.comments[:self.sample_size - len(self.comments)])
+
+    def result(self) -> Dict[str, any]:
+        return {
+            'total': self.analyzed,
+            'analyzed': self.analyzed,
+            'positive': self.labels['positive'],
+            'negative': self.labels['negative'],
+            'neutral': self.labels['neutral'],
+            'average_score': round(self.total_score / self.analyzed, 4) if self.analyzed > 0 else 0.0,
+            'comments': self.comments
+        }
+
+
+def run_comment_pipelines(aggregators: Dict[str, StreamingAggregator], path: str = COMMENT_CSV_PATH,
+                          chunk_rows: Optional[int] = None, aweme_ids: Optional[List[str]] = None) -> Dict[str, any]:
+    """
+    单次扫描评论CSV，同时执行多个流式分析
+    :param aggregators: {名称: 聚合器}
+    :param path: CSV文件路径
+    :param chunk_rows: 每块行数，默认按内存预算估算
+    :param aweme_ids: 只统计这些视频的评论，None表示全部
+    :return: {名称: 分析结果}
+    """
+    # Dask模式：各分区并行执行后合并
+    from data.dask_engine import dask_enabled, run_comment_pipelines_dask
+    if dask_enabled():
+        result = run_comment_pipelines_dask(aggregators, path, aweme_ids)
+        if result is not None:
+            return result
+
+    columns = {col for aggregator in aggregators.values() for col in aggregator.columns}
+    if aweme_ids is not None:
+        columns.add('aweme_id')
+    chunks = 0
+    rows = 0
+    for chunk in iter_comment_chunks(path, columns=sorted(columns), chunk_rows=chunk_rows):
+        if aweme_ids is not None:
+            chunk = chunk[chunk['aweme_id'].isin(aweme_ids)]
+        for aggregator in aggregators.values():
+            aggregator.update(chunk)
+        chunks += 1
+        rows += len(chunk)
+
+    logger.info(f"流式分析完成: {path}, 共 {rows} 条, {chunks} 块")
+    return {name: aggregator.result() for name, aggregator in aggregators.items()}
+
+
+def stream_ip_distribution(top_n: int = 10, path: str = COMMENT_CSV_PATH,
+                           aweme_ids: Optional[List[str]] = None) -> Dict[str, int]:
+    """
+    流式统计IP地址分布
+    :param top_n: 返回前N个IP
+    :param path: CSV文件路径
+    :param aweme_ids: 只统计这些视频的评论，None表示全部
+    :return: IP分布字典
+    """
+    return run_comment_pipelines({'ip': ValueCounter('user_ip', top_n)}, path, aweme_ids=aweme_ids)['ip']
+
+
+def stream_video_comment_counts(path: str = COMMENT_CSV_PATH) -> Dict[str, int]:
+    """
+    流式统计各视频的评论数
+    :param path: CSV文件路径
+    :return: {aweme_id: 评论数}
+    """
+    return run_comment_pipelines({'video': ValueCounter('aweme_id')}, path)['video']
+
+
+def stream_word_frequency(top_n: int = 50, path: str = COMMENT_CSV_PATH) -> Dict[str, any]:
+    """
+    流式统计评论词频
+    :param top_n: 返回前N个词
+    :param path: CSV文件路径
+    :return: {'keywords': [...], 'total_words': 总词数}
+    """
+    return run_comment_pipelines({'words': WordFrequency(top_n)}, path)['words']
+
+
+def stream_sentiment_totals(path: str = COMMENT_CSV_PATH) -> Dict[str, any]:
+    """
+    流式统计评论情感
+    :param path: CSV文件路径
+    :return: 统计结果
+    """
+    return run_comment_pipelines({'sentiment': SentimentTotals()}, path)['sentiment']
+
+
+if __name__ == '__main__':
+    # 流式统计并输出峰值内存: python -m data.streaming [comment.csv]
+    import sys
+    import tracemalloc
+
+    logging.basicConfig(level=logging.INFO)
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else COMMENT_CSV_PATH
+
+    tracemalloc.start()
+    results = run_comment_pipelines({
+        'ip_distribution': ValueCounter('user_ip', top_n=10),
+        'video_comment_counts': ValueCounter('aweme_id', top_n=10),
+        'like_count': MetricAggregator('like_count'),
+    }, csv_path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(results)
+    print(f"峰值内存: {peak / 1024 / 1024:.1f}MB")
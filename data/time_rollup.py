@@ -0,0 +1,304 @@
+"""
+时间汇总模块 - 视频发布时间、评论时间按 小时(一天中的小时) / 天 / 周 / 月 汇总
+
+每个数据版本只计算一次时间分桶：datetime64数组一次转换出各粒度的桶（天、周一、月初、小时），
+各 (粒度, 维度) 的汇总表（数量、点赞数合计）在首次查询时分组计算并缓存，之后的查询只读取汇总表。
+维度可选按视频(aweme_id)或按作者(user_name)，评论按作者汇总时通过视频ID对应到视频作者
+（对应后的汇总表按视频数据版本缓存）。
+
+CSV后端的汇总挂在数据集缓存条目上（数据变化后重新构建），数据库后端按 repo.version() 缓存。
+有筛选条件（data.filters）时在筛选后的数据上构建，缓存在该数据版本的筛选掩码缓存中。
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from data.dataset import VIDEO_CSV_PATH, COMMENT_CSV_PATH, dataset_cache
+from data.filters import FilterSpec, is_filtered, get_filter_masks, filtered_videos, filtered_comments
+from data.normalize import normalize_video_data, normalize_comment_data
+from data.repository import get_repository
+
+logger = logging.getLogger(__name__)
+
+# 时间粒度（hour 为一天中的小时 0-23，其余为时间线）
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+
+# 维度 -> 列名
+DIMENSIONS = {
+    'video': 'aweme_id',
+    'creator': 'user_name',
+}
+
+# 数据源 -> (时间列, 可直接分组的维度)
+SOURCES = {
+    'video': ('publish_time', ('video', 'creator')),
+    'comment': ('comment_time', ('video',)),
+}
+
+# 汇总需要的列
+SOURCE_COLUMNS = {
+    'video': ['publish_time', 'aweme_id', 'user_name', 'like_count'],
+    'comment': ['comment_time', 'aweme_id', 'like_count'],
+}
+
+
+def time_buckets(times: pd.Series) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    一次计算各粒度的时间桶
+    :param times: datetime64列（本地时间，无时区）
+    :return: ({粒度: 桶数组}, 有效行掩码)，天、周、月的桶为 datetime64[D] / datetime64[M]
+    """
+    values = pd.to_datetime(times).to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(values)
+    day = values.astype('datetime64[D]')
+    # 1970-01-01 为周四，(天数 + 3) % 7 为距本周一的天数
+    weekday = (day.astype('int64') + 3) % 7
+    buckets = {
+        'hour': values.astype('datetime64[h]').astype('int64') % 24,
+        'day': day,
+        'week': day - weekday.astype('timedelta64[D]'),
+        'month': values.astype('datetime64[M]'),
+    }
+    return buckets, valid
+
+
+def format_bucket(bucket, granularity: str) -> str:
+    """
+    桶 -> 显示文本
+    :param bucket: 桶值
+    :param granularity: 粒度
+    :return: hour: '0'~'23'，day / week: 'YYYY-MM-DD'（周为周一），month: 'YYYY-MM'
+    """
+    if granularity == 'hour':
+        return str(int(bucket))
+    return str(np.datetime64(bucket, 'M' if granularity == 'month' else 'D'))
+
+
+class TimeCubes:
+    """
+    一个数据源的时间汇总
+    table(粒度, 维度) 返回汇总表：[维度列,] bucket, count, likes（按维度、时间排序）
+    """
+
+    def __init__(self, frame: pd.DataFrame, time_column: str, dimensions: Tuple[str, ...]):
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+        self._tables: Dict[Tuple[str, Optional[str]], pd.DataFrame] = {}
+        # 按作者汇总所用的视频数据版本（不能直接按作者分组的数据源，见 creator_table）
+        self._creator_version = None
+        self._creators: Dict[str, str] = {}
+
+        if frame.empty or time_column not in frame.columns:
+            self._buckets, self._valid = {g: np.array([]) for g in GRANULARITIES}, np.array([], dtype=bool)
+            self._likes = np.array([], dtype='int64')
+            self._dimension_values = {}
+            return
+
+        self._buckets, self._valid = time_buckets(frame[time_column])
+        likes = frame['like_count'] if 'like_count' in frame.columns else pd.Series(0, index=frame.index)
+        self._likes = likes.fillna(0).to_numpy(dtype='int64')[self._valid]
+        self._dimension_values = {
+            dim: frame[DIMENSIONS[dim]].iloc[np.flatnonzero(self._valid)].reset_index(drop=True)
+            for dim in dimensions if DIMENSIONS[dim] in frame.columns
+        }
+
+    def table(self, granularity: str, dimension: Optional[str] = None) -> pd.DataFrame:
+        """
+        汇总表（首次访问时分组计算并缓存）
+        :param granularity: 粒度
+        :param dimension: 维度，None表示不分维度
+        :return: DataFrame
+        """
+        key = (granularity, dimension)
+        with self._lock:
+            if key not in self._tables:
+                self._tables[key] = self._build_table(granularity, dimension)
+            return self._tables[key]
+
+    def creator_table(self, granularity: str, version: str,
+                      load_creators: Callable[[], Dict[str, str]]) -> pd.DataFrame:
+        """
+        按作者汇总（评论没有作者列）：按视频汇总的表通过视频ID对应到视频作者后再合并
+        结果按视频数据版本缓存，视频数据变化后重新对应
+        :param granularity: 粒度
+        :param version: 视频数据版本
+        :param load_creators: 读取 {视频ID: 作者} 的函数，每个版本只调用一次
+        :return: DataFrame: creator, bucket, count, likes
+        """
+        table = self.table(granularity, 'video')
+        key = (granularity, 'creator')
+        with self._lock:
+            if self._creator_version != version:
+                for cached in [k for k in self._tables if k[1] == 'creator']:
+                    del self._tables[cached]
+                self._creators = load_creators()
+                self._creator_version = version
+            if key not in self._tables:
+                creators = table['video'].astype(str).map(self._creators)
+                mapped = table.assign(creator=creators.to_numpy()).dropna(subset=['creator'])
+                self._tables[key] = mapped.groupby(['creator', 'bucket'], sort=True)[['count', 'likes']] \
+                    .sum().reset_index()
+            return self._tables[key]
+
+    def _build_table(self, granularity: str, dimension: Optional[str]) -> pd.DataFrame:
+        data = pd.DataFrame({'bucket': self._buckets[granularity][self._valid], 'likes': self._likes})
+        keys = ['bucket']
+        if dimension is not None:
+            data.insert(0, dimension, self._dimension_values[dimension])
+            keys = [dimension, 'bucket']
+        table = data.groupby(keys, observed=True, sort=True)['likes'].agg(['size', 'sum']).reset_index()
+        return table.rename(columns={'size': 'count', 'sum': 'likes'})
+
+
+def build_video_time_cubes(df: pd.DataFrame) -> TimeCubes:
+    time_column, dimensions = SOURCES['video']
+    return TimeCubes(df, time_column, dimensions)
+
+
+def build_comment_time_cubes(df: pd.DataFrame) -> TimeCubes:
+    time_column, dimensions = SOURCES['comment']
+    return TimeCubes(df, time_column, dimensions)
+
+
+# 数据库后端的汇总：数据源 -> (数据版本, TimeCubes)
+_orm_cubes: Dict[str, Tuple[str, TimeCubes]] = {}
+_orm_lock = threading.Lock()
+
+
+def get_time_cubes(source: str, filters: Optional[FilterSpec] = None) -> TimeCubes:
+    """
+    获取数据源的时间汇总（每个数据版本构建一次）
+    :param source: 'video' / 'comment'
+    :param filters: 筛选条件，评论只保留筛选出的视频的评论
+    :return: TimeCubes
+    """
+    if is_filtered(filters):
+        return _filtered_time_cubes(source, filters)
+
+    builder = build_video_time_cubes if source == 'video' else build_comment_time_cubes
+    if Config.DATASET_BACKEND == 'csv':
+        path, normalizer = (VIDEO_CSV_PATH, normalize_video_data) if source == 'video' \
+            else (COMMENT_CSV_PATH, normalize_comment_data)
+        _, cubes = dataset_cache.get_derived(path, normalizer, 'time_cubes', builder)
+        return cubes if cubes is not None else builder(pd.DataFrame())
+
+    repo = get_repository()
+    version = repo.version()
+    with _orm_lock:
+        cached = _orm_cubes.get(source)
+        if cached is None or cached[0] != version:
+            frame = repo.videos(columns=SOURCE_COLUMNS['video']) if source == 'video' \
+                else repo.comments(columns=SOURCE_COLUMNS['comment'])
+            cached = (version, builder(frame))
+            _orm_cubes[source] = cached
+        return cached[1]
+
+
+def _filtered_time_cubes(source: str, filters: FilterSpec) -> TimeCubes:
+    """筛选后的时间汇总：CSV后端缓存在筛选掩码缓存中，数据库后端按筛选条件查询后构建"""
+    if Config.DATASET_BACKEND != 'csv':
+        if source == 'video':
+            return build_video_time_cubes(filtered_videos(filters, columns=SOURCE_COLUMNS['video']))
+        return build_comment_time_cubes(filtered_comments(filters, columns=SOURCE_COLUMNS['comment']))
+
+    videos = get_filter_masks('video')
+    if source == 'video':
+        return videos.cached(('time_cubes', filters.key()),
+                             lambda: build_video_time_cubes(filtered_videos(filters)))
+    # 评论汇总还取决于视频数据版本（筛选出的视频ID）
+    return get_filter_masks('comment').cached(('time_cubes', videos.token, filters.key()),
+                                              lambda: build_comment_time_cubes(filtered_comments(filters)))
+
+
+def _video_creators() -> Dict[str, str]:
+    """视频ID -> 作者（同一视频取第一行）"""
+    videos = get_repository().videos(columns=['aweme_id', 'user_name']).drop_duplicates('aweme_id')
+    return dict(zip(videos['aweme_id'].astype(str), videos['user_name']))
+
+
+def _creator_table(cubes: TimeCubes, granularity: str) -> pd.DataFrame:
+    """评论按作者汇总，按视频数据版本缓存在评论的 TimeCubes 中，不在每次请求时重新读取视频"""
+    return cubes.creator_table(granularity, get_repository().version(), _video_creators)
+
+
+def _series_records(table: pd.DataFrame, granularity: str) -> List[Dict]:
+    return [
+        {'time': format_bucket(bucket, granularity), 'count': int(count), 'likes': int(likes)}
+        for bucket, count, likes in zip(table['bucket'], table['count'], table['likes'])
+    ]
+
+
+def get_time_series(source: str = 'video', granularity: str = 'day', dimension: Optional[str] = None,
+                    key: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None,
+                    limit: int = 10, filters: Optional[FilterSpec] = None) -> Dict[str, any]:
+    """
+    查询时间序列
+    :param source: 'video'（按发布时间） / 'comment'（按评论时间）
+    :param granularity: 'hour' / 'day' / 'week' / 'month'
+    :param dimension: None / 'video' / 'creator'
+    :param key: 维度取值（视频ID或作者名），None时返回数量最多的前limit个
+    :param start: 开始日期（含），如 '2025-01-01'，hour粒度时忽略
+    :param end: 结束日期（含）
+    :param limit: 未指定key时返回的维度取值数量
+    :param filters: 筛选条件
+    :return: 不分维度时 {'series': [...]}，分维度时 {'groups': [{'key', 'total', 'series'}]}
+    """
+    if source not in SOURCES:
+        raise ValueError(f"不支持的数据源: {source}")
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"不支持的时间粒度: {granularity}")
+    if dimension is not None and dimension not in DIMENSIONS:
+        raise ValueError(f"不支持的维度: {dimension}")
+
+    cubes = get_time_cubes(source, filters)
+    if source == 'comment' and dimension == 'creator':
+        table = _creator_table(cubes, granularity)
+    else:
+        table = cubes.table(granularity, dimension)
+
+    if granularity != 'hour' and (start or end):
+        unit = 'M' if granularity == 'month' else 'D'
+        buckets = table['bucket'].to_numpy(dtype=f'datetime64[{unit}]')
+        mask = np.ones(len(table), dtype=bool)
+        if start:
+            mask &= buckets >= np.datetime64(pd.Timestamp(start).date(), unit)
+        if end:
+            mask &= buckets <= np.datetime64(pd.Timestamp(end).date(), unit)
+        table = table[mask]
+
+    result = {'source': source, 'granularity': granularity, 'dimension': dimension}
+    if dimension is None:
+        result['series'] = _series_records(table, granularity)
+        return result
+
+    if key is not None:
+        table = table[table[dimension].astype(str) == str(key)]
+        keys = [str(key)] if not table.empty else []
+    else:
+        totals = table.groupby(dimension, observed=True)['count'].sum()
+        keys = totals.sort_values(ascending=False, kind='stable').head(limit).index.tolist()
+
+    groups = []
+    for group_key, group in table[table[dimension].isin(keys)].groupby(dimension, observed=True, sort=False):
+        groups.append({'key': str(group_key), 'total': int(group['count'].sum()),
+                       'series': _series_records(group, granularity)})
+    groups.sort(key=lambda g: -g['total'])
+    result['groups'] = groups
+    return result
+
+
+if __name__ == '__main__':
+    # 输出评论数量的月度趋势: python -m data.time_rollup
+    import time
+
+    logging.basicConfig(level=logging.INFO)
+    for granularity in GRANULARITIES:
+        start_time = time.perf_counter()
+        series = get_time_series('comment', granularity)['series']
+        print(f"{granularity}: {len(series)} 个时间段, {(time.perf_counter() - start_time) * 1000:.1f}ms")
+    print(get_time_series('comment', 'month')['series'][-12:])
@@ -30,10 +30,7 @@ import pandas as pd
 sys.path.insert(0, str(Path(__file__).parent.parent))
 import config
 
-from video.models import VideoData, CommentData
-
-# CSV文件路径
-COMMENT_CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'comment.csv')
+from data.repository import get_repository
 
 logger = logging.getLogger(__name__)
 
@@ -60,38 +57,15 @@ class WordCloudGenerator:
     @staticmethod
     def load_comment_data_from_csv(video_id: str = None) -> pd.DataFrame:
         """
-        从CSV文件加载评论数据
+        从数据仓库加载评论数据
         :param video_id: 视频ID，None表示所有评论
         :return: DataFrame
         """
         try:
-            if not os.path.exists(COMMENT_CSV_PATH):
-                logger.warning(f"评论CSV文件不存在: {COMMENT_CSV_PATH}")
-                return pd.DataFrame()
-
-            df = pd.read_csv(COMMENT_CSV_PATH, encoding='utf-8')
-
-            # 列名映射
-            column_mapping = {
-                '用户id': 'user_id',
-                '用户名': 'user_name',
-                '评论内容': 'content',
-                '评论时间': 'comment_time',
-                'IP地址': 'user_ip',
-                '点赞数': 'like_count',
-                '视频id': 'aweme_id'
-            }
-
-            # 重命名列
-            df = df.rename(columns=column_mapping)
-
-            # 根据video_id筛选
+            # 指定视频时只取该视频的评论
             if video_id is not None:
-                df['aweme_id'] = df['aweme_id'].astype(str)
-                video_id_str = str(video_id)
-                df = df[df['aweme_id'] == video_id_str]
-
-            return df
+                return get_repository().video_comments(video_id)
+            return get_repository().comments()
         except Exception as e:
             logger.error(f"从CSV加载评论数据失败: {e}")
             return pd.DataFrame()
@@ -194,13 +168,11 @@ class WordCloudGenerator:
         :return: 词云数据
         """
         try:
-            # 获取视频数据
-            if video_id:
-                videos = VideoData.objects.filter(awemeId=video_id)
-            else:
-                videos = VideoData.objects.all()
+            # 获取视频描述
+            filters = {'aweme_id': video_id} if video_id else None
+            videos = get_repository().videos(filters=filters, columns=['description'])
 
-            if videos.count() == 0:
+            if videos.empty:
                 return {
                     'success': False,
                     'message': '没有找到视频数据'
@@ -208,8 +180,8 @@ class WordCloudGenerator:
 
             # 收集所有描述文本
             all_words = []
-            for video in videos:
-                words = cls.segment_text(video.description)
+            for description in videos['description']:
+                words = cls.segment_text(description)
                 all_words.extend(words)
 
             if not all_words:
@@ -230,7 +202,7 @@ class WordCloudGenerator:
                 'image': wordcloud,
                 'top_words': top_words,
                 'total_words': len(all_words),
-                'video_count': videos.count()
+                'video_count': len(videos)
             }
 
         except Exception as e:
@@ -396,16 +368,22 @@ class WordCloudGenerator:
         :return: 分析结果
         """
         try:
-            video = VideoData.objects.get(aweme_id=video_id)
-            comments = CommentData.objects.filter(aweme_id=video_id)
+            repo = get_repository()
+            video = repo.get_video(video_id)
+            if video is None:
+                return {
+                    'success': False,
+                    'message': f'视频不存在: {video_id}'
+                }
+            comments = repo.video_comments(video_id, columns=['content'])
 
             # 描述关键词
-            desc_words = cls.segment_text(video.description)
+            desc_words = cls.segment_text(video['description'])
 
             # 评论文本关键词
             comment_words = []
-            for comment in comments:
-                words = cls.segment_text(comment.content)
+            for content in comments['content'] if not comments.empty else []:
+                words = cls.segment_text(content)
                 comment_words.extend(words)
 
             # 统计
@@ -423,14 +401,9 @@ class WordCloudGenerator:
                     {'word': word, 'count': count}
                     for word, count in comment_freq
                 ],
-                'comment_count': comments.count()
+                'comment_count': len(comments)
             }
 
-        except VideoData.DoesNotExist:
-            return {
-                'success': False,
-                'message': f'视频不存在: {video_id}'
-            }
         except Exception as e:
             logger.error(f"分析视频关键词失败: {e}")
             return {
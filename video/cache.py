@@ -0,0 +1,115 @@
+"""
+接口缓存 - 统计接口的ETag与服务端响应缓存
+
+统计接口的结果只在数据变化时改变。ETag由数据版本（repo.version()）、数据变化标记、接口路径、
+查询参数和影响结果的配置计算：
+    - 请求带 If-None-Match 且ETag未变化时直接返回304，不计算也不序列化；
+    - 否则按ETag查找服务端缓存的响应内容（Django缓存，默认为进程内存，可通过 CACHES 配置为共享缓存）；
+    - 都未命中时执行视图，成功的响应（"success" 为 true）写入缓存。
+
+数据库后端原地更新的行不改变行数和最大主键，导入数据、重建聚合表、重新分析情感时改写数据变化标记
+（data.dataset.bump_data_change_token），ETag随之变化。
+"""
+
+import hashlib
+import json
+import logging
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.views.decorators.http import condition
+
+from config import Config
+from data.dataset import data_change_token
+from data.repository import get_repository
+
+logger = logging.getLogger(__name__)
+
+# 缓存键前缀
+CACHE_PREFIX = 'api_response'
+
+
+def api_etag(request, *args, **kwargs) -> str:
+    """
+    计算接口响应的ETag（同一请求只计算一次）
+    :param request: 请求
+    :return: ETag（不含引号）
+    """
+    etag = getattr(request, '_api_etag', None)
+    if etag is None:
+        key = json.dumps({
+            'path': request.path,
+            'query': sorted(request.GET.lists()),
+            'version': get_repository().version(),
+            'changes': data_change_token(),
+            'backend': Config.DATASET_BACKEND,
+            'streaming': Config.COMMENT_STREAMING_ENABLED,
+            'aggregates': Config.MATERIALIZED_AGGREGATES_ENABLED,
+        }, ensure_ascii=False, sort_keys=True)
+        etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        request._api_etag = etag
+    return etag
+
+
+def _is_success(response) -> bool:
+    """
+    是否为成功的统计结果：状态码200且JSON内容的 success 为 true
+    :param response: 视图返回的响应
+    :return: 是否可以缓存
+    """
+    if response.status_code != 200 or getattr(response, 'streaming', False):
+        return False
+    try:
+        return json.loads(response.content).get('success') is True
+    except (ValueError, AttributeError):
+        return False
+
+
+def _etag_or_none(request):
+    """ETag，关闭缓存或计算失败时返回None（不做条件请求处理）"""
+    if not Config.API_CACHE_ENABLED:
+        return None
+    try:
+        return api_etag(request)
+    except Exception as e:
+        logger.error(f"计算接口ETag失败: {e}")
+        return None
+
+
+def cached_api(view):
+    """
+    统计接口装饰器：ETag / 304 + 服务端响应缓存
+    只用于GET请求、结果只由数据和查询参数决定的接口
+    """
+
+    @wraps(view)
+    def cached_view(request, *args, **kwargs):
+        etag = _etag_or_none(request)
+        if etag is None:
+            return view(request, *args, **kwargs)
+
+        key = f'{CACHE_PREFIX}:{etag}'
+        content = cache.get(key)
+        if content is not None:
+            return HttpResponse(content, content_type='application/json')
+
+        response = view(request, *args, **kwargs)
+        # 只缓存成功的响应
+        if _is_success(response):
+            cache.set(key, response.content, Config.API_CACHE_TIMEOUT)
+        else:
+            response._api_error = True
+        return response
+
+    conditional_view = condition(etag_func=lambda request, *args, **kwargs: _etag_or_none(request))(cached_view)
+
+    @wraps(view)
+    def api_view(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        # 错误响应不带ETag，客户端下次请求时重新执行视图
+        if getattr(response, '_api_error', False) and response.has_header('ETag'):
+            del response['ETag']
+        return response
+
+    return api_view
@@ -0,0 +1,38 @@
+"""
+评论情感回填：为数据库中未分析的评论批量打分，写入 sentiment_score / sentiment_label
+
+    python manage.py backfill_sentiment
+    python manage.py backfill_sentiment --batch-size 5000 --video-id 7312345678901234567
+    python manage.py backfill_sentiment --rescore    # 更换情感模型后重新分析所有评论
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from data.sentiment import SentimentAnalyzer
+from data.sentiment_pipeline import sentiment_pipeline
+
+
+class Command(BaseCommand):
+    help = '为数据库中未分析的评论批量打分并保存情感得分、情感标签'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='每批评论数（默认为 Config.SENTIMENT_BACKFILL_BATCH）')
+        parser.add_argument('--rescore', action='store_true', help='重新分析已有得分的评论')
+        parser.add_argument('--video-id', default=None, help='只回填该视频的评论')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        updated = SentimentAnalyzer.backfill_scores(batch_size=options['batch_size'], rescore=options['rescore'],
+                                                    video_id=options['video_id'])
+        seconds = time.perf_counter() - start
+        if options['rescore']:
+            # 已有评论的得分变化，增量统计需要重建
+            sentiment_pipeline.invalidate()
+        self.stdout.write(self.style.SUCCESS(f"情感回填完成: {updated} 条评论, 耗时 {seconds:.1f}秒"))
+
+        summary = SentimentAnalyzer.get_sentiment_summary(options['video_id'])
+        self.stdout.write(f"积极 {summary['positive']}, 消极 {summary['negative']}, 中性 {summary['neutral']}, "
+                          f"平均得分 {summary['average_score']}")
@@ -0,0 +1,32 @@
+"""
+增量情感分析刷新：爬虫批次之后运行，只为新增的评论打分并更新情感统计
+
+    python manage.py refresh_sentiment
+    python manage.py refresh_sentiment --rebuild    # 全量重建
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from data.sentiment_pipeline import sentiment_pipeline
+
+
+class Command(BaseCommand):
+    help = '为新增的评论打分并更新增量情感统计'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='清空统计后全量重建')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            sentiment_pipeline.invalidate()
+        start = time.perf_counter()
+        scored = sentiment_pipeline.refresh()
+        seconds = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"情感统计刷新完成: 新增 {scored} 条评论, 耗时 {seconds:.1f}秒"))
+
+        summary = sentiment_pipeline.summary()
+        if summary is not None:
+            self.stdout.write(f"共 {summary['total']} 条, 积极 {summary['positive']}, 消极 {summary['negative']}, "
+                              f"中性 {summary['neutral']}, 平均得分 {summary['average_score']}")
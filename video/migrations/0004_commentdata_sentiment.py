@@ -0,0 +1,51 @@
+# Generated by Django 5.2.9 on 2026-10-18 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("video", "0003_commentdata"),
+    ]
+
+    operations = [
+        migrations.AlterModelTable(
+            name="commentdata",
+            table="comment_data",
+        ),
+        migrations.AlterField(
+            model_name="commentdata",
+            name="commentTime",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="评论时间"),
+        ),
+        migrations.AlterField(
+            model_name="videodata",
+            name="publishTime",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="发布时间"),
+        ),
+        migrations.AddField(
+            model_name="commentdata",
+            name="sentiment_label",
+            field=models.CharField(
+                blank=True, max_length=10, null=True, verbose_name="情感标签"
+            ),
+        ),
+        migrations.AddField(
+            model_name="commentdata",
+            name="sentiment_score",
+            field=models.FloatField(blank=True, null=True, verbose_name="情感得分"),
+        ),
+        migrations.AddIndex(
+            model_name="commentdata",
+            index=models.Index(
+                fields=["sentiment_label", "sentiment_score"],
+                name="comment_label_score_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="commentdata",
+            index=models.Index(
+                fields=["awemeId", "sentiment_label"], name="comment_video_label_idx"
+            ),
+        ),
+    ]
@@ -33,7 +33,16 @@ class CommentData(models.Model):
     content = models.TextField(verbose_name='评论内容', null=True, blank=True)
     likeCount = models.BigIntegerField(verbose_name='点赞数', null=True, blank=True)
     awemeId = models.BigIntegerField(verbose_name='视频ID', null=True, blank=True)
+    # 情感分析结果（python manage.py backfill_sentiment 批量回填，未分析的为空）
+    sentiment_score = models.FloatField(verbose_name='情感得分', null=True, blank=True)
+    sentiment_label = models.CharField(verbose_name='情感标签', max_length=10, null=True, blank=True)
 
     class Meta:
         verbose_name = '评论信息'
-        db_table = 'comment_data'
\ No newline at end of file
+        db_table = 'comment_data'
+        indexes = [
+            # 按标签计数、按标签取得分最高/最低的评论、查找未分析的评论
+            models.Index(fields=['sentiment_label', 'sentiment_score'], name='comment_label_score_idx'),
+            # 单个视频的情感统计
+            models.Index(fields=['awemeId', 'sentiment_label'], name='comment_video_label_idx'),
+        ]
\ No newline at end of file
@@ -1,3 +1,954 @@
-from django.test import TestCase
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import path
+from django.utils import timezone
+
+from config import Config
+from data.aggregates import MaterializedAggregates, read_csv_delta, iter_csv_delta
+from data.dask_engine import _read_csv_range, csv_ranges
+from data import time_rollup
+from data.dataset import bump_data_change_token, build_rank_index, complete_rows_end, file_fingerprint, read_csv_from, top_positions
+from data.filters import FilterMasks, FilterSpec, condition_mask, hashtag_pattern, orm_filters
+from data.normalize import normalize_comment_data
+from data.report import (NUMERIC_COLUMNS, REPORT_SECTIONS, ReportEngine, compute_ip_distribution,
+                         compute_video_statistics)
+from data.repository import CsvRepository, OrmRepository
+from data.sentiment import SentimentAnalyzer
+from data.sentiment_pipeline import SentimentPipeline
+from data.sentiment_vector import TOLERANCE, VectorSentimentModel
+from data.stats_sketch import MetricStats, exact_result, merge_stats
+from data.streaming import SentimentTotals, run_comment_pipelines
+from data.time_rollup import format_bucket, get_time_series, time_buckets
+from video.cache import cached_api
+from video.models import CommentData, VideoData
+
+# 情感分析测试使用的评论（含空评论）
+SENTIMENT_TEXTS = ['这个视频太好看了，非常喜欢', '太难看了，垃圾，浪费时间', '一般般吧', '好可爱啊，爱了爱了',
+                   '真的很失望，再也不看了', '', '哈哈哈哈笑死我了', '画质好差，看不清楚']
+
+COMMENT_HEADER = '用户id,用户名,评论内容,评论时间,IP地址,点赞数,视频id\n'
+
+
+def comment_rows(start: int, count: int, aweme_id: str = '7000000000000000001') -> str:
+    """生成评论CSV行"""
+    return ''.join(f'{i},用户{i},第{i}条评论,2025-01-01 12:00:{i % 60:02d},广东,{i},{aweme_id}\n'
+                   for i in range(start, start + count))
+
+
+def sentiment_rows(start: int, texts, aweme_ids) -> str:
+    """生成评论CSV行，评论依次属于各视频"""
+    return ''.join(f'{i},用户{i},{text},2025-01-01 12:00:00,广东,0,{aweme_ids[i % len(aweme_ids)]}\n'
+                   for i, text in enumerate(texts, start))
+
+
+def patch_config(test, **values):
+    """测试期间修改配置"""
+    for name, value in values.items():
+        patcher = mock.patch.object(Config, name, value)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+
+
+class CsvDeltaTests(SimpleTestCase):
+    """只追加写入的CSV游标：只读取新增的行，文件被改写时从头读取"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'comment.csv')
+        self.write(COMMENT_HEADER + comment_rows(0, 5))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write(self, text: str, mode: str = 'w'):
+        with open(self.path, mode, encoding='utf-8') as f:
+            f.write(text)
+
+    def read(self, cursor):
+        return read_csv_delta(self.path, normalize_comment_data, cursor)
+
+    def test_first_read_and_unchanged_file(self):
+        df, cursor, reset = self.read(None)
+        self.assertTrue(reset)
+        self.assertEqual(len(df), 5)
+        self.assertEqual(cursor['offset'], os.path.getsize(self.path))
+
+        df, same_cursor, reset = self.read(cursor)
+        self.assertIsNone(df)
+        self.assertFalse(reset)
+        self.assertEqual(same_cursor, cursor)
+
+    def test_append_reads_only_new_rows(self):
+        _, cursor, _ = self.read(None)
+        self.write(comment_rows(5, 3), 'a')
+
+        df, cursor, reset = self.read(cursor)
+        self.assertFalse(reset)
+        self.assertEqual(df['user_id'].tolist(), [5, 6, 7])
+        self.assertEqual(cursor['offset'], os.path.getsize(self.path))
+
+    def test_repeated_header_rows_are_dropped(self):
+        # 爬虫每批追加写入时重复写入表头
+        _, cursor, _ = self.read(None)
+        self.write(COMMENT_HEADER + comment_rows(5, 2), 'a')
+
+        df, _, reset = self.read(cursor)
+        self.assertFalse(reset)
+        self.assertEqual(df['user_id'].tolist(), [5, 6])
+
+    def test_partial_trailing_row_waits_for_next_read(self):
+        _, cursor, _ = self.read(None)
+        self.write('5,用户5,写到一半', 'a')
+
+        df, partial_cursor, reset = self.read(cursor)
+        self.assertIsNone(df)
+        self.assertFalse(reset)
+        self.assertEqual(partial_cursor['offset'], cursor['offset'])
+
+        self.write(',2025-01-01 12:00:05,广东,5,7000000000000000001\n', 'a')
+        df, cursor, reset = self.read(partial_cursor)
+        self.assertFalse(reset)
+        self.assertEqual(df['content'].tolist(), ['写到一半'])
+        self.assertEqual(cursor['offset'], os.path.getsize(self.path))
+
+    def test_rewritten_file_resets(self):
+        _, cursor, _ = self.read(None)
+        # 已读取部分的内容变化（文件更长，不能只按大小判断）
+        self.write(COMMENT_HEADER + comment_rows(100, 8))
+
+        df, _, reset = self.read(cursor)
+        self.assertTrue(reset)
+        self.assertEqual(df['user_id'].tolist(), list(range(100, 108)))
+
+    def test_truncated_file_resets(self):
+        _, cursor, _ = self.read(None)
+        self.write(COMMENT_HEADER + comment_rows(0, 2))
+
+        df, _, reset = self.read(cursor)
+        self.assertTrue(reset)
+        self.assertEqual(len(df), 2)
+
+    def test_removed_file_resets(self):
+        _, cursor, _ = self.read(None)
+        os.remove(self.path)
+
+        df, cursor, reset = self.read(cursor)
+        self.assertIsNone(df)
+        self.assertIsNone(cursor)
+        self.assertTrue(reset)
+
+    def test_fingerprint_covers_only_read_bytes(self):
+        offset = os.path.getsize(self.path)
+        fingerprint = file_fingerprint(self.path, offset)
+        self.write(comment_rows(5, 3), 'a')
+        self.assertEqual(file_fingerprint(self.path, offset), fingerprint)
+
+        with open(self.path, 'r+b') as f:
+            f.seek(offset - 5)
+            f.write(b'9')
+        self.assertNotEqual(file_fingerprint(self.path, offset), fingerprint)
+
+    def test_chunked_delta_matches_full_delta(self):
+        _, cursor, _ = self.read(None)
+        self.write(comment_rows(5, 7), 'a')
+
+        df, full_cursor, _ = self.read(cursor)
+        chunks, chunk_cursor, reset = iter_csv_delta(self.path, normalize_comment_data, cursor, chunk_rows=2)
+        chunked = pd.concat(list(chunks), ignore_index=True)
+        self.assertFalse(reset)
+        pd.testing.assert_frame_equal(chunked, df.reset_index(drop=True))
+        self.assertEqual(chunk_cursor['offset'], full_cursor['offset'])
+        self.assertEqual(chunk_cursor['fingerprint'], full_cursor['fingerprint'])
+
+        chunks, _, _ = iter_csv_delta(self.path, normalize_comment_data, chunk_cursor)
+        self.assertIsNone(chunks)
+
+
+class MetricStatsTests(SimpleTestCase):
+    """可合并统计：分位数精度，分批更新、分区合并与一次构建的结果一致"""
+
+    PERCENTILES = (50, 90, 99)
+
+    def setUp(self):
+        rng = np.random.default_rng(15)
+        # 少量不同取值（精确模式）与大量不同取值（草图模式）
+        self.repeated = pd.Series(rng.integers(0, 500, 20000))
+        self.spread = pd.Series(rng.lognormal(10, 2, 20000).round())
+
+    @staticmethod
+    def split(values: pd.Series, parts: int):
+        return [values.iloc[positions] for positions in np.array_split(np.arange(len(values)), parts)]
+
+    @classmethod
+    def build(cls, values: pd.Series, parts: int = 1, exact_max_values: int = None) -> MetricStats:
+        stats = MetricStats(exact_max_values)
+        for part in cls.split(values, parts):
+            stats.update(part)
+        return stats
+
+    def test_exact_mode_matches_numpy(self):
+        stats = self.build(self.repeated)
+        self.assertTrue(stats.exact)
+        for p in self.PERCENTILES:
+            self.assertAlmostEqual(stats.quantile(p / 100), np.percentile(self.repeated, p))
+        result = stats.result()
+        self.assertEqual(result['total'], int(self.repeated.sum()))
+        self.assertEqual(result['max'], int(self.repeated.max()))
+        self.assertEqual(result['min'], int(self.repeated.min()))
+        self.assertAlmostEqual(result['median'], float(np.median(self.repeated)))
+
+    def test_sketch_relative_error(self):
+        stats = self.build(self.spread, exact_max_values=1000)
+        self.assertFalse(stats.exact)
+        for p in self.PERCENTILES:
+            expected = np.percentile(self.spread, p)
+            error = abs(stats.quantile(p / 100) - expected) / expected
+            self.assertLessEqual(error, Config.STATS_SKETCH_RELATIVE_ACCURACY, f'p{p}')
+
+    def test_batches_and_merge_match_single_build(self):
+        for values, exact_max_values in ((self.repeated, None), (self.spread, 1000)):
+            single = self.build(values, exact_max_values=exact_max_values).result()
+            self.assertEqual(self.build(values, parts=7, exact_max_values=exact_max_values).result(), single)
+
+            parts = [self.build(part, exact_max_values=exact_max_values) for part in self.split(values, 5)]
+            merged = merge_stats(parts).result()
+            self.assertEqual(set(merged), set(single))
+            for key in single:
+                self.assertAlmostEqual(merged[key], single[key], msg=key)
+
+    def test_merge_exact_into_sketch(self):
+        # 一个分区已转换为草图，另一个仍为精确计数
+        sketch = self.build(self.spread[:15000], exact_max_values=1000)
+        exact = self.build(self.spread[15000:].head(100), exact_max_values=1000)
+        self.assertTrue(exact.exact)
+        sketch.merge(exact)
+        expected = self.build(pd.concat([self.spread[:15000], self.spread[15000:].head(100)]),
+                              exact_max_values=1000)
+        self.assertEqual(sketch.count, expected.count)
+        self.assertEqual(sketch.result(), expected.result())
+
+    def test_json_round_trip(self):
+        for values, exact_max_values in ((self.repeated, None), (self.spread, 1000)):
+            stats = self.build(values, exact_max_values=exact_max_values)
+            restored = MetricStats.from_dict(json.loads(json.dumps(stats.to_dict())))
+            self.assertEqual(restored.result(), stats.result())
+
+    def test_missing_values_and_empty(self):
+        self.assertEqual(MetricStats().result(), {})
+        self.assertEqual(exact_result(pd.Series([np.nan])), {})
+        stats = MetricStats.from_series(pd.Series([1, np.nan, 3]))
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(stats.result()['total'], 4)
+
+    def test_exact_result(self):
+        result = exact_result(self.spread)
+        self.assertEqual(result['median'], float(np.median(self.spread)))
+        for p in self.PERCENTILES:
+            self.assertEqual(result[f'p{p}'], float(np.percentile(self.spread, p)))
+        self.assertEqual(set(result), set(self.build(self.repeated).result()))
+
+    def test_exact_only_never_converts_to_sketch(self):
+        stats = MetricStats(exact_max_values=1000, exact_only=True)
+        for part in self.split(self.spread, 7):
+            stats.update(part)
+        self.assertTrue(stats.exact)
+        self.assertEqual(stats.result(), exact_result(self.spread))
+
+        restored = MetricStats.from_dict(json.loads(json.dumps(stats.to_dict())))
+        self.assertTrue(restored.exact_only)
+        restored.update(self.spread)
+        self.assertTrue(restored.exact)
+
+
+class DaskCsvRangeTests(SimpleTestCase):
+    """Dask模式的CSV分段：只在行边界切分，各段合起来与整个文件一致"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.path = os.path.join(self.tmp_dir, 'comment.csv')
+        # 评论内容含引号和换行
+        rows = ''.join(f'{i},用户{i},"第{i}条""评论""\n第二行\n第三行",2025-01-01 12:00:00,广东,{i},7000\n'
+                       for i in range(40))
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(COMMENT_HEADER + rows + comment_rows(40, 40) + '80,未写完')
+
+    def test_ranges_cover_complete_rows(self):
+        expected = normalize_comment_data(read_csv_from(self.path).frame)
+        columns = list(pd.read_csv(self.path, nrows=0).columns)
+        for blocksize in (1, 50, 333, 4096, None, 10 ** 9):
+            ranges = csv_ranges(self.path, blocksize)
+            self.assertEqual(ranges[0][0], 0)
+            self.assertEqual(ranges[-1][1], complete_rows_end(self.path))
+            if blocksize in (50, 333):
+                self.assertGreater(len(ranges), 1)
+            frames = [normalize_comment_data(_read_csv_range(self.path, start, end, columns))
+                      for start, end in ranges]
+            actual = pd.concat(frames, ignore_index=True)
+            pd.testing.assert_frame_equal(actual, expected, check_dtype=False, obj=f'blocksize={blocksize}')
+
+
+class MaterializedSectionTests(SimpleTestCase):
+    """预计算聚合表的结果与关闭预计算时全量计算的结果一致"""
+
+    def setUp(self):
+        rng = np.random.default_rng(12)
+        rows = 12000
+        # 不同取值远多于 STATS_EXACT_MAX_VALUES
+        self.video = pd.DataFrame({col: rng.integers(0, 10 ** 7, rows) for col in NUMERIC_COLUMNS})
+        # 次数相同的IP较多
+        ips = ['广东', '北京', '上海', '浙江', '江苏', '四川', '湖北', '湖南', '河南', '山东', '福建', '云南']
+        self.comment = pd.DataFrame({'user_ip': pd.Categorical([ips[i % 12] for i in range(120)] + ['广东', '北京'])})
+        self.aggregates = MaterializedAggregates(path=os.path.join(tempfile.mkdtemp(), 'aggregates.json'))
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.aggregates.path))
+
+    def test_video_statistics_are_exact(self):
+        for positions in np.array_split(np.arange(len(self.video)), 6):
+            self.aggregates.video.update(self.video.iloc[positions])
+        self.assertEqual(self.aggregates.section('video_statistics', refresh=False),
+                         compute_video_statistics(self.video))
+
+    def test_ip_ties_match_full_computation(self):
+        for positions in np.array_split(np.arange(len(self.comment)), 4):
+            self.aggregates.comment.update(self.comment.iloc[positions])
+        section = self.aggregates.section('user_ip_distribution', refresh=False)
+        expected = compute_ip_distribution(self.comment, top_n=10)
+        self.assertEqual(list(section.items()), list(expected.items()))
+        self.assertEqual(list(section)[:3], ['北京', '广东', '上海'])
+
+
+class SentimentBackfillTests(TestCase):
+    """数据库评论的情感回填：保存的得分与逐条分析一致，统计查询与保存的得分一致"""
+
+    VIDEOS = (7000000000000000001, 7000000000000000002)
+
+    def setUp(self):
+        # 不读写项目的情感缓存文件
+        patch_config(self, SENTIMENT_CACHE_ENABLED=False)
+        CommentData.objects.bulk_create([
+            CommentData(userName=f'用户{i}', content=text, awemeId=self.VIDEOS[i % 2])
+            for i, text in enumerate(SENTIMENT_TEXTS)
+        ])
+
+    @staticmethod
+    def expected_summary(texts):
+        results = [SentimentAnalyzer.analyze_text(text) for text in texts]
+        labels = [label for _, label in results]
+        return {
+            'total': len(texts),
+            'analyzed': len(texts),
+            'positive': labels.count('positive'),
+            'negative': labels.count('negative'),
+            'neutral': labels.count('neutral'),
+            'average_score': round(sum(score for score, _ in results) / len(texts), 4),
+        }
+
+    def assertSummary(self, summary, expected):
+        self.assertEqual({k: v for k, v in summary.items() if k not in ('average_score', 'distribution')},
+                         {k: v for k, v in expected.items() if k != 'average_score'})
+        self.assertAlmostEqual(summary['average_score'], expected['average_score'], places=3)
+
+    def test_backfill_scores_every_comment(self):
+        self.assertEqual(SentimentAnalyzer.get_sentiment_summary()['analyzed'], 0)
+
+        self.assertEqual(SentimentAnalyzer.backfill_scores(batch_size=3), len(SENTIMENT_TEXTS))
+        self.assertFalse(CommentData.objects.filter(sentiment_label__isnull=True).exists())
+        for comment in CommentData.objects.all():
+            score, label = SentimentAnalyzer.analyze_text(comment.content)
+            self.assertAlmostEqual(comment.sentiment_score, score, places=4)
+            self.assertEqual(comment.sentiment_label, label)
+
+        # 已分析的评论不再打分
+        self.assertEqual(SentimentAnalyzer.backfill_scores(batch_size=3), 0)
+
+    def test_summary_matches_live_analysis(self):
+        SentimentAnalyzer.backfill_scores(batch_size=3)
+        self.assertSummary(SentimentAnalyzer.get_sentiment_summary(), self.expected_summary(SENTIMENT_TEXTS))
+        for index, video_id in enumerate(self.VIDEOS):
+            self.assertSummary(SentimentAnalyzer.get_sentiment_summary(str(video_id)),
+                               self.expected_summary(SENTIMENT_TEXTS[index::2]))
+        self.assertEqual(SentimentAnalyzer.get_sentiment_summary('x')['total'], 0)
+
+    def test_backfill_single_video_and_new_comments(self):
+        video_id = str(self.VIDEOS[0])
+        self.assertEqual(SentimentAnalyzer.backfill_scores(video_id=video_id), len(SENTIMENT_TEXTS[::2]))
+        self.assertEqual(SentimentAnalyzer.get_sentiment_summary(video_id)['analyzed'], len(SENTIMENT_TEXTS[::2]))
+        self.assertEqual(SentimentAnalyzer.get_sentiment_summary()['analyzed'], len(SENTIMENT_TEXTS[::2]))
+
+        # 新爬取的评论只回填这些
+        CommentData.objects.create(userName='新用户', content='太棒了', awemeId=self.VIDEOS[1])
+        self.assertEqual(SentimentAnalyzer.backfill_scores(), len(SENTIMENT_TEXTS[1::2]) + 1)
+        self.assertSummary(SentimentAnalyzer.get_sentiment_summary(),
+                           self.expected_summary(SENTIMENT_TEXTS + ['太棒了']))
+
+    def test_rescore_overwrites_saved_scores(self):
+        SentimentAnalyzer.backfill_scores()
+        CommentData.objects.update(sentiment_score=0.5, sentiment_label='neutral')
+        self.assertEqual(SentimentAnalyzer.backfill_scores(rescore=True), len(SENTIMENT_TEXTS))
+        self.assertSummary(SentimentAnalyzer.get_sentiment_summary(), self.expected_summary(SENTIMENT_TEXTS))
+
+
+class SentimentPipelineTests(SimpleTestCase):
+    """增量情感分析（CSV后端）：逐批累加的统计与全量重新打分的结果一致"""
+
+    VIDEOS = ('7000000000000000001', '7000000000000000002')
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, True)
+        self.csv_path = os.path.join(self.tmp_dir, 'comment.csv')
+        patcher = mock.patch('data.sentiment_pipeline.COMMENT_CSV_PATH', self.csv_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # 每块3行，增量和全量重建都会跨多个块
+        patch_config(self, DATASET_BACKEND='csv', SENTIMENT_CACHE_ENABLED=False, STREAMING_CHUNK_ROWS=3,
+                     ANALYSIS_ENGINE='pandas',
+                     DATA_CHANGE_TOKEN_PATH=os.path.join(self.tmp_dir, 'data_change.token'))
+        self.pipeline = self.new_pipeline('incremental')
+
+    def new_pipeline(self, name: str) -> SentimentPipeline:
+        return SentimentPipeline(os.path.join(self.tmp_dir, f'{name}.json'))
+
+    def write(self, text: str, mode: str = 'w'):
+        with open(self.csv_path, mode, encoding='utf-8') as f:
+            f.write(text)
+
+    def full_rescore(self, video_id=None):
+        """在当前文件上从头打分"""
+        pipeline = self.new_pipeline('full')
+        pipeline.refresh()
+        summary = pipeline.summary(video_id)
+        os.remove(pipeline._path())
+        return summary
+
+    def assertSameSummary(self, summary, expected):
+        self.assertEqual({k: v for k, v in summary.items() if k != 'average_score'},
+                         {k: v for k, v in expected.items() if k != 'average_score'})
+        self.assertAlmostEqual(summary['average_score'], expected['average_score'], places=3)
+
+    def test_incremental_matches_full_rescore(self):
+        self.assertIsNone(self.pipeline.summary())
+        self.write(COMMENT_HEADER + sentiment_rows(0, SENTIMENT_TEXTS[:5], self.VIDEOS))
+        self.assertEqual(self.pipeline.refresh(), 5)
+
+        # 爬虫追加一批（带重复表头）
+        self.write(COMMENT_HEADER + sentiment_rows(5, SENTIMENT_TEXTS[5:], self.VIDEOS), 'a')
+        self.assertEqual(self.pipeline.refresh(), len(SENTIMENT_TEXTS) - 5)
+        self.assertEqual(self.pipeline.refresh(), 0)
+
+        self.assertSameSummary(self.pipeline.summary(), self.full_rescore())
+        for video_id in self.VIDEOS:
+            self.assertSameSummary(self.pipeline.summary(video_id), self.full_rescore(video_id))
+
+        # 与流式分析逐条打分的结果一致
+        totals = run_comment_pipelines({'sentiment': SentimentTotals()}, self.csv_path)['sentiment']
+        self.assertSameSummary(self.pipeline.summary(), totals)
+
+        # 其他进程读取保存的统计
+        self.assertSameSummary(self.new_pipeline('incremental').summary(), self.pipeline.summary())
+
+    def test_rewritten_file_rebuilds(self):
+        self.write(COMMENT_HEADER + sentiment_rows(0, SENTIMENT_TEXTS, self.VIDEOS))
+        self.pipeline.refresh()
+
+        self.write(COMMENT_HEADER + sentiment_rows(0, SENTIMENT_TEXTS[:3], self.VIDEOS))
+        self.assertEqual(self.pipeline.refresh(), 3)
+        self.assertEqual(self.pipeline.summary()['total'], 3)
+        self.assertSameSummary(self.pipeline.summary(), self.full_rescore())
+
+    def test_partial_trailing_row_is_scored_once(self):
+        self.write(COMMENT_HEADER + sentiment_rows(0, SENTIMENT_TEXTS[:4], self.VIDEOS))
+        self.pipeline.refresh()
+
+        row = sentiment_rows(4, SENTIMENT_TEXTS[4:5], self.VIDEOS)
+        self.write(row[:10], 'a')
+        self.assertEqual(self.pipeline.refresh(), 0)
+        self.write(row[10:], 'a')
+        self.assertEqual(self.pipeline.refresh(), 1)
+        self.assertSameSummary(self.pipeline.summary(), self.full_rescore())
+
+    def test_invalidate_and_lock(self):
+        self.write(COMMENT_HEADER + sentiment_rows(0, SENTIMENT_TEXTS, self.VIDEOS))
+        self.pipeline.refresh()
+        self.pipeline.invalidate()
+        self.assertIsNone(self.pipeline.summary())
+
+        # 其他进程正在刷新时不打分
+        with open(self.pipeline._path() + '.lock', 'w') as f:
+            f.write('0')
+        self.assertEqual(self.pipeline.refresh(), 0)
+        self.assertIsNone(self.pipeline.summary())
+
+        os.remove(self.pipeline._path() + '.lock')
+        self.assertEqual(self.pipeline.refresh(), len(SENTIMENT_TEXTS))
+        self.assertSameSummary(self.pipeline.summary(), self.full_rescore())
+
+
+class OrmSentimentPipelineTests(TestCase):
+    """增量情感分析（数据库后端）：逐批累加的统计与聚合查询的结果一致"""
+
+    VIDEOS = SentimentBackfillTests.VIDEOS
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, True)
+        patch_config(self, DATASET_BACKEND='orm', SENTIMENT_CACHE_ENABLED=False, SENTIMENT_BACKFILL_BATCH=3,
+                     DATA_CHANGE_TOKEN_PATH=os.path.join(self.tmp_dir, 'data_change.token'))
+        self.pipeline = SentimentPipeline(os.path.join(self.tmp_dir, 'sentiment_pipeline.json'))
+
+    def create_comments(self, texts):
+        CommentData.objects.bulk_create([
+            CommentData(userName=f'用户{i}', content=text, awemeId=self.VIDEOS[i % 2])
+            for i, text in enumerate(texts)
+        ])
+
+    def assertMatchesDatabase(self, video_id=None):
+        summary = self.pipeline.summary(video_id)
+        expected = SentimentAnalyzer.get_sentiment_summary(video_id)
+        for key in ('total', 'analyzed', 'positive', 'negative', 'neutral'):
+            self.assertEqual(summary[key], expected[key], key)
+        self.assertAlmostEqual(summary['average_score'], expected['average_score'], places=3)
+
+    def test_incremental_matches_database_summary(self):
+        self.create_comments(SENTIMENT_TEXTS[:5])
+        self.assertEqual(self.pipeline.refresh(), 5)
+        self.assertMatchesDatabase()
+
+        self.create_comments(SENTIMENT_TEXTS[5:])
+        self.assertEqual(self.pipeline.refresh(), len(SENTIMENT_TEXTS) - 5)
+        self.assertEqual(self.pipeline.refresh(), 0)
+        self.assertFalse(CommentData.objects.filter(sentiment_label__isnull=True).exists())
+        self.assertMatchesDatabase()
+        for video_id in self.VIDEOS:
+            self.assertMatchesDatabase(str(video_id))
+
+
+# 接口缓存测试的视图调用次数
+api_calls = []
+
+
+@cached_api
+def cached_stats_view(request):
+    api_calls.append(request.GET.dict())
+    if 'fail' in request.GET:
+        return JsonResponse({'success': False, 'error': '参数错误'})
+    return JsonResponse({'success': True, 'data': {'videos': VideoData.objects.count(), 'calls': len(api_calls)}})
+
+
+urlpatterns = [
+    path('api/stats/', cached_stats_view),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class ApiCacheTests(TestCase):
+    """统计接口的ETag / 304 与服务端缓存"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, True)
+        patch_config(self, DATASET_BACKEND='orm', API_CACHE_ENABLED=True,
+                     MATERIALIZED_AGGREGATES_DIR=self.tmp_dir,
+                     DATA_CHANGE_TOKEN_PATH=os.path.join(self.tmp_dir, 'data_change.token'))
+        cache.clear()
+        api_calls.clear()
+        VideoData.objects.create(awemeId='7000000000000000001', likeCount=10, description='原始描述')
+
+    def get(self, query: str = '', etag: str = None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(f'/api/stats/{query}', **headers)
+
+    def test_not_modified_with_matching_etag(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.get(etag=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(api_calls), 1)
+
+        # 不带条件请求时由服务端缓存返回
+        response = self.get()
+        self.assertEqual(response.json()['data']['calls'], 1)
+        self.assertEqual(len(api_calls), 1)
+
+    def test_query_parameters_change_etag(self):
+        etag = self.get('?limit=10')['ETag']
+        self.assertNotEqual(self.get('?limit=20')['ETag'], etag)
+        self.assertEqual(self.get('?limit=20', etag=etag).status_code, 200)
+        self.assertEqual(len(api_calls), 2)
+
+    def test_in_place_import_changes_etag(self):
+        etag = self.get()['ETag']
+
+        # 重新导入视频：原地更新，行数和最大主键不变
+        VideoData.objects.update_or_create(awemeId='7000000000000000001', defaults={'likeCount': 20})
+        MaterializedAggregates().invalidate('video')
+
+        response = self.get(etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(api_calls), 2)
+
+    def test_error_responses_are_not_cached(self):
+        response = self.get('?fail=1')
+        self.assertFalse(response.json()['success'])
+        self.assertFalse(response.has_header('ETag'))
+
+        self.assertEqual(self.get('?fail=1').status_code, 200)
+        self.assertEqual(len(api_calls), 2)
+
+
+class FilterSpecTests(SimpleTestCase):
+    """筛选条件的解析与话题正则"""
+
+    def test_parse_params(self):
+        spec = FilterSpec.from_params({'keyword': ' 汉服 ', 'hashtag': '#Cos', 'fans_min': '100', 'fans_max': '',
+                                       'creator': '用户1', 'unknown': 'x'})
+        self.assertEqual(spec.conditions(), [('description', 'contains', '汉服'), ('description', 'hashtag', 'cos'),
+                                             ('fans_count', 'gte', 100), ('user_name', 'exact', '用户1')])
+        self.assertEqual(spec.to_dict(), {'keyword': '汉服', 'hashtag': 'Cos', 'fans_min': '100', 'creator': '用户1'})
+        self.assertTrue(FilterSpec.from_params({'keyword': '  ', 'hashtag': '#'}).is_empty)
+        self.assertEqual(FilterSpec(hashtag='cos').key(), FilterSpec(hashtag='#COS').key())
+
+    def test_end_date_includes_whole_day(self):
+        self.assertEqual(FilterSpec(end='2025-01-02').conditions(),
+                         [('publish_time', 'lt', pd.Timestamp('2025-01-03'))])
+        self.assertEqual(FilterSpec(end='2025-01-02 12:30').conditions(),
+                         [('publish_time', 'lte', pd.Timestamp('2025-01-02 12:30'))])
+
+    def test_invalid_values(self):
+        for params in ({'fans_min': 'abc'}, {'fans_max': '1.5'}, {'start': '2025-13-01'}, {'end': 'tomorrow'},
+                       {'start': 'NaT'}):
+            with self.assertRaises(ValueError, msg=params):
+                FilterSpec.from_params(params)
+
+    @override_settings(TIME_ZONE='Asia/Shanghai')
+    def test_timezone_aware_dates_become_local(self):
+        spec = FilterSpec(start='2025-01-01T00:00:00+00:00', end='2025-01-01T08:00:00Z')
+        self.assertEqual(spec.start, pd.Timestamp('2025-01-01 08:00'))
+        self.assertIsNone(spec.start.tzinfo)
+        self.assertEqual(spec.conditions()[1], ('publish_time', 'lte', pd.Timestamp('2025-01-01 16:00')))
+        # 与不带时区的 publish_time 列比较不报错
+        times = pd.Series(pd.to_datetime(['2025-01-01 07:00', '2025-01-01 12:00', '2025-01-02 00:00']),
+                          name='publish_time')
+        mask = FilterMasks(pd.DataFrame({'publish_time': times})).mask(spec)
+        self.assertEqual(mask.tolist(), [False, True, False])
+
+    def test_hashtag_pattern(self):
+        pattern = re.compile(hashtag_pattern('cos'), re.IGNORECASE)
+        for text in ('#cos 好看', '#COS#汉服', '今天的 #Cos', '#cos\n第二行'):
+            self.assertIsNotNone(pattern.search(text), text)
+        for text in ('#cosers', 'cos', '# cos', '#coser #cosplay'):
+            self.assertIsNone(pattern.search(text), text)
+        # 正则特殊字符按原样匹配
+        pattern = re.compile(hashtag_pattern('c++'), re.IGNORECASE)
+        self.assertIsNotNone(pattern.search('#c++ 教程'))
+        self.assertIsNone(pattern.search('#cc 教程'))
+
+
+class FilterMasksTests(SimpleTestCase):
+    """掩码缓存：单列条件复用，最多保留 FILTER_MASK_CACHE_SIZE 项"""
+
+    def setUp(self):
+        self.masks = FilterMasks(pd.DataFrame({'fans_count': [10, 200, 3000], 'user_name': ['a', 'b', 'a']}))
+
+    def test_masks_are_cached_and_read_only(self):
+        spec = FilterSpec(fans_min=100, creator='a')
+        with mock.patch('data.filters.condition_mask', wraps=condition_mask) as build:
+            mask = self.masks.mask(spec)
+            self.assertIs(self.masks.mask(FilterSpec(fans_min='100', creator='a')), mask)
+            self.masks.mask(FilterSpec(fans_min=100))
+        self.assertEqual(mask.tolist(), [False, False, True])
+        self.assertFalse(mask.flags.writeable)
+        # 每个单列条件只计算一次
+        self.assertEqual(build.call_count, 2)
+
+    def test_lru_eviction(self):
+        patch_config(self, FILTER_MASK_CACHE_SIZE=2)
+        builds = []
+
+        def cached(key):
+            return self.masks.cached(key, lambda: builds.append(key) or key)
+
+        cached('a')
+        cached('b')
+        cached('a')
+        cached('c')
+        self.assertEqual(list(self.masks._items), ['a', 'c'])
+        cached('a')
+        cached('b')
+        self.assertEqual(builds, ['a', 'b', 'c', 'b'])
+
+
+class FilterBackendTests(TestCase):
+    """同一筛选条件在CSV掩码与数据库查询条件下选出相同的视频"""
+
+    ROWS = [
+        ('用户1', 50, '#cos 第一条', datetime(2025, 1, 1, 9, 0)),
+        ('用户2', 150, '#COSER#汉服 ', datetime(2025, 1, 1, 23, 30)),
+        ('用户1', 999, '正片 #cosers', datetime(2025, 1, 2, 0, 0)),
+        ('用户3', 1000, 'cos日常 汉服', datetime(2025, 1, 2, 12, 0)),
+        ('用户3', None, None, None),
+        ('用户4', 5000, '#c++ 教程', datetime(2025, 1, 3, 8, 0)),
+        ('用户2', 20, '话题在最后 #cos', datetime(2025, 1, 3, 23, 59, 59)),
+    ]
+
+    def setUp(self):
+        patch_config(self, DATASET_BACKEND='orm')
+        for i, (user_name, fans_count, description, publish_time) in enumerate(self.ROWS):
+            VideoData.objects.create(awemeId=str(7000 + i), userName=user_name, fansCount=fans_count,
+                                     description=description,
+                                     publishTime=timezone.make_aware(publish_time) if publish_time else None)
+
+    def test_csv_masks_match_orm_filters(self):
+        repo = OrmRepository()
+        frame = repo.videos()
+        masks = FilterMasks(frame)
+        specs = [
+            FilterSpec(hashtag='cos'), FilterSpec(hashtag='#coser'), FilterSpec(hashtag='c++'),
+            FilterSpec(keyword='汉服'), FilterSpec(start='2025-01-02'), FilterSpec(end='2025-01-01'),
+            FilterSpec(start='2025-01-01 23:30', end='2025-01-02 12:00'), FilterSpec(end='2025-01-03'),
+            FilterSpec(start='2025-01-02T06:00:00+00:00'), FilterSpec(fans_min=150, fans_max=1000),
+            FilterSpec(creator='用户3'), FilterSpec(hashtag='cos', fans_max=100, start='2025-01-02'),
+        ]
+        for spec in specs:
+            expected = sorted(repo.videos(filters=orm_filters(spec), columns=['aweme_id'])['aweme_id'])
+            actual = sorted(frame['aweme_id'][masks.mask(spec)])
+            self.assertEqual(actual, expected, spec)
+            self.assertEqual(repo.count_videos(orm_filters(spec)), len(actual), spec)
+        self.assertEqual(sorted(frame['aweme_id'][masks.mask(FilterSpec(hashtag='cos'))]), ['7000', '7006'])
+
+
+class VectorSentimentTests(SimpleTestCase):
+    """向量化情感引擎与 SnowNLP(text).sentiments 的得分差异不超过 TOLERANCE"""
+
+    TEXTS = ['这个视频太好看了，非常喜欢', '太难看了，垃圾，浪费时间', '一般般吧', '不是不好看，是太好看了',
+             '哈哈哈哈笑死我了', 'cos得太像了吧 OMG', '第3集什么时候更新？?', 'I love this video 真的',
+             '好可爱😍😍👍', '😭😭😭', '！！！', '……', '?!,.', '   ']
+
+    def test_scores_match_snownlp(self):
+        from snownlp import SnowNLP
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, True)
+        model_path = os.path.join(tmp_dir, 'sentiment_vector.npz')
+        patch_config(self, SENTIMENT_VECTOR_MODEL_PATH=model_path)
+
+        model = VectorSentimentModel.from_snownlp()
+        scores = model.score(self.TEXTS)
+        self.assertEqual(len(scores), len(self.TEXTS))
+        for text, score in zip(self.TEXTS, scores.tolist()):
+            self.assertLessEqual(abs(score - SnowNLP(text).sentiments), TOLERANCE, text)
+        # 单条打分与批量打分一致
+        self.assertEqual(model.score(self.TEXTS[:1]).tolist(), scores[:1].tolist())
+        self.assertEqual(model.score([]).tolist(), [])
+        # 直接从SnowNLP导出，不写模型缓存文件
+        self.assertFalse(os.path.exists(model_path))
+
+
+class RankIndexTests(SimpleTestCase):
+    """排行索引切片和部分排序与 sort_values(kind='stable').head(n) 的行和并列顺序一致"""
+
+    def setUp(self):
+        rng = np.random.default_rng(14)
+        rows = 5000
+        # 取值范围小，并列的行很多
+        like = rng.integers(0, 50, rows).astype('float64')
+        like[rng.random(rows) < 0.1] = np.nan
+        fans = pd.array(rng.integers(0, 30, rows), dtype='Int64')
+        fans[rng.random(rows) < 0.05] = pd.NA
+        self.df = pd.DataFrame({
+            'like_count': like,
+            'fans_count': fans,
+            'comment_count': rng.integers(0, 20, rows),
+            'share_count': rng.integers(0, 3, rows),
+            'user_name': [f'用户{i}' for i in rng.integers(0, 800, rows)],
+        })
+        self.rank_index = build_rank_index(self.df)
+        self.mask = rng.random(rows) < 0.3
+        self.limits = (1, 10, 137, 1499, 1500, len(self.df) - 1, len(self.df), len(self.df) + 100, 10 ** 6)
+
+    def expected(self, column: str, ascending: bool, limit, offset: int = 0, mask=None):
+        df = self.df if mask is None else self.df[mask]
+        df = df.sort_values(column, ascending=ascending, kind='stable')
+        return df.iloc[offset:None if limit is None else offset + limit]
+
+    def test_top_positions(self):
+        for column in ('like_count', 'fans_count', 'comment_count', 'share_count'):
+            for ascending in (False, True):
+                for limit in self.limits:
+                    expected = self.expected(column, ascending, limit).index.to_numpy()
+                    actual = top_positions(self.df[column], limit, ascending)
+                    np.testing.assert_array_equal(actual, expected, f'{column} {ascending} {limit}')
+        self.assertEqual(len(top_positions(self.df['like_count'], 0)), 0)
+
+    def test_rank_index_positions(self):
+        for column, positions in self.rank_index.positions.items():
+            np.testing.assert_array_equal(positions, self.expected(column, False, None).index.to_numpy(), column)
+        # 同名用户保留第一次出现的行（与 compute_top_users 一致）
+        users = self.df.drop_duplicates('user_name').sort_values('fans_count', ascending=False, kind='stable')
+        np.testing.assert_array_equal(self.rank_index.user_positions, users.index.to_numpy())
+
+    def test_query_fast_paths_match_stable_sort(self):
+        for column in ('like_count', 'fans_count', 'comment_count'):
+            for ascending in (False, True):
+                for limit in self.limits + (None,):
+                    for offset in (0, 7):
+                        for mask in (None, self.mask):
+                            for rank_index in (None, self.rank_index):
+                                order = [column if ascending else f'-{column}']
+                                actual = CsvRepository.query(self.df, order=order, limit=limit, offset=offset,
+                                                             rank_index=rank_index, mask=mask)
+                                expected = self.expected(column, ascending, limit, offset, mask)
+                                pd.testing.assert_frame_equal(
+                                    actual, expected,
+                                    obj=f'{order} limit={limit} offset={offset} mask={mask is not None}')
+
+
+class TimeBucketTests(SimpleTestCase):
+    """时间分桶的周、月边界"""
+
+    def test_week_and_month_boundaries(self):
+        times = pd.Series(pd.to_datetime([
+            '2024-12-29 23:59:59',  # 周日
+            '2024-12-30 00:00:00',  # 周一，跨年的一周
+            '2025-01-05 23:59:59',
+            '2025-01-06 00:00:00',
+            '2024-02-29 12:00:00',  # 闰日
+            '2025-03-01 00:00:00',
+            '1969-12-31 23:00:00',  # 1970年之前
+            None,
+        ]))
+        buckets, valid = time_buckets(times)
+        self.assertEqual(valid.tolist(), [True] * 7 + [False])
+        weeks = [format_bucket(b, 'week') for b in buckets['week'][valid]]
+        self.assertEqual(weeks, ['2024-12-23', '2024-12-30', '2024-12-30', '2025-01-06',
+                                 '2024-02-26', '2025-02-24', '1969-12-29'])
+        months = [format_bucket(b, 'month') for b in buckets['month'][valid]]
+        self.assertEqual(months, ['2024-12', '2024-12', '2025-01', '2025-01', '2024-02', '2025-03', '1969-12'])
+        days = [format_bucket(b, 'day') for b in buckets['day'][valid]]
+        self.assertEqual(days[0], '2024-12-29')
+        self.assertEqual(days[-1], '1969-12-31')
+        self.assertEqual(buckets['hour'][valid].tolist(), [23, 0, 23, 0, 12, 0, 23])
+        # 周桶都是周一
+        self.assertTrue(all(pd.Timestamp(week).dayofweek == 0 for week in weeks))
+
+
+class TimeSeriesTests(TestCase):
+    """时间序列查询：参数校验，评论按作者汇总的缓存"""
+
+    VIDEOS = [('7100', '作者A'), ('7101', '作者B'), ('7102', '作者A')]
+
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, True)
+        patch_config(self, DATASET_BACKEND='orm', DATA_CHANGE_TOKEN_PATH=os.path.join(tmp_dir, 'data_change.token'))
+        patcher = mock.patch.dict(time_rollup._orm_cubes, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for aweme_id, user_name in self.VIDEOS:
+            VideoData.objects.create(awemeId=aweme_id, userName=user_name, likeCount=1,
+                                     publishTime=timezone.make_aware(datetime(2025, 1, 1, 12)))
+        for i, aweme_id in enumerate(['7100', '7100', '7101', '7102', '7102', '7102']):
+            CommentData.objects.create(userName=f'用户{i}', content='好', awemeId=int(aweme_id), likeCount=i,
+                                       commentTime=timezone.make_aware(datetime(2025, 1, 1 + i % 2, 8)))
+
+    def test_validation(self):
+        for kwargs in ({'source': 'user'}, {'granularity': 'year'}, {'dimension': 'ip'}):
+            with self.assertRaises(ValueError, msg=kwargs):
+                get_time_series(**kwargs)
+
+    def test_comment_creator_series_cached_per_video_version(self):
+        with mock.patch.object(OrmRepository, 'videos', autospec=True, side_effect=OrmRepository.videos) as videos:
+            result = get_time_series('comment', 'day', dimension='creator')
+            self.assertEqual([(g['key'], g['total']) for g in result['groups']], [('作者A', 5), ('作者B', 1)])
+            self.assertEqual(result['groups'][0]['series'], [{'time': '2025-01-01', 'count': 2, 'likes': 4},
+                                                             {'time': '2025-01-02', 'count': 3, 'likes': 9}])
+            self.assertEqual(get_time_series('comment', 'day', dimension='creator'), result)
+            get_time_series('comment', 'month', dimension='creator')
+            self.assertEqual(videos.call_count, 1)
+
+            # 视频作者被原地更新（导入时改写数据变化标记）后重新对应
+            VideoData.objects.filter(awemeId='7101').update(userName='作者A')
+            bump_data_change_token()
+            result = get_time_series('comment', 'day', dimension='creator', key='作者A')
+            self.assertEqual([(g['key'], g['total']) for g in result['groups']], [('作者A', 6)])
+            self.assertEqual(videos.call_count, 2)
+
+
+class ReportParallelTests(SimpleTestCase):
+    """完整报告并行计算：失败和超时的部分记录在 errors 中并返回默认值，其他部分不受影响，各部分分别计时"""
+
+    TIMEOUT = 0.5
+
+    def setUp(self):
+        patch_config(self, MATERIALIZED_AGGREGATES_ENABLED=False, REPORT_PROCESS_SECTIONS=[],
+                     REPORT_MAX_WORKERS=None, REPORT_SECTION_TIMEOUT=self.TIMEOUT, DATASET_BACKEND='csv')
+        self.release = threading.Event()
+        # 超时的部分在测试结束时放行，线程自行退出
+        self.addCleanup(self.release.set)
+
+        def stub(section):
+            def run(engine):
+                if section == 'fans_distribution':
+                    raise RuntimeError('粉丝数列缺失')
+                if section == 'video_statistics':
+                    self.release.wait(10)
+                    return {'late': True}
+                if section == 'publish_time_distribution':
+                    time.sleep(0.1)
+                return {'section': section}
+            return run
+
+        for section in REPORT_SECTIONS:
+            patcher = mock.patch.object(ReportEngine, section, stub(section))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(ReportEngine, '_load', lambda engine: None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_failures_and_timeouts_do_not_sink_report(self):
+        engine = ReportEngine(repository=mock.Mock(), parallel=True)
+        start = time.perf_counter()
+        with self.assertLogs('data.report', level='ERROR') as logs:
+            report = engine.build()
+        self.assertEqual(len(logs.records), 2)
+        self.assertLess(time.perf_counter() - start, self.TIMEOUT + 2)
+
+        self.assertEqual(list(report), list(REPORT_SECTIONS))
+        self.assertEqual(report['fans_distribution'], {})
+        self.assertEqual(report['video_statistics'], {})
+        self.assertEqual(report['top_videos'], {'section': 'top_videos'})
+        self.assertEqual(set(engine.errors), {'fans_distribution', 'video_statistics'})
+        self.assertIn('粉丝数列缺失', engine.errors['fans_distribution'])
+        self.assertIn('超时', engine.errors['video_statistics'])
+
+        self.assertEqual(set(engine.timings), set(REPORT_SECTIONS) | {'load', 'total'})
+        self.assertGreaterEqual(engine.timings['publish_time_distribution'], 100)
+        self.assertGreaterEqual(engine.timings['video_statistics'], self.TIMEOUT * 1000)
+        self.assertLess(engine.timings['general_statistics'], self.TIMEOUT * 1000)
+
+    def test_serial_failure_is_recorded(self):
+        self.release.set()
+        engine = ReportEngine(repository=mock.Mock(), parallel=False)
+        with self.assertLogs('data.report', level='ERROR'):
+            report = engine.build()
+        self.assertEqual(report['fans_distribution'], {})
+        self.assertEqual(report['video_statistics'], {'late': True})
+        self.assertEqual(set(engine.errors), {'fans_distribution'})
+        self.assertEqual(set(engine.timings), set(REPORT_SECTIONS) | {'load', 'total'})
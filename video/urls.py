@@ -34,7 +34,10 @@ urlpatterns = [
     path('api/top-videos/', views.api_top_videos, name='api_top_videos'),
     path('api/video-statistics/', views.api_video_statistics, name='api_video_statistics'),
     path('api/publish-time-distribution/', views.api_publish_time_distribution, name='api_publish_time_distribution'),
+    path('api/time-series/', views.api_time_series, name='api_time_series'),
     path('api/full-report/', views.api_full_report, name='api_full_report'),
+    path('api/report-snapshot/', views.api_report_snapshot, name='api_report_snapshot'),
+    path('api/video-summary/', views.api_video_summary, name='api_video_summary'),
     path('api/video-list/', views.api_video_list, name='api_video_list'),
     path('api/video-comments/', views.api_video_comments, name='api_video_comments'),
     path('api/analyze-sentiment/', views.api_analyze_sentiment, name='api_analyze_sentiment'),
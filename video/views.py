@@ -9,130 +9,67 @@ import logging
 import pandas as pd
 import numpy as np
 import os
+from functools import wraps
 
 from .models import VideoData, CommentData
 from data.wordcloud_gen import WordCloudGenerator
 from data.ai_analyzer import AIVideoAnalyzer
 from data.analyzer import DataAnalyzer
+from data.report import ReportEngine
+from data.filters import FilterSpec
+from data.precompute import report_refresher
+from .cache import cached_api
+from data.repository import get_repository
 
 logger = logging.getLogger(__name__)
 
-# CSV文件路径
-VIDEO_CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'video_data.csv')
-COMMENT_CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'comment.csv')
 
+# 点赞预测使用的列
+PREDICTION_COLUMNS = ['comment_count', 'collect_count', 'share_count', 'fans_count', 'duration', 'like_count']
 
-def parse_duration(duration_str):
-    """
-    解析视频时长字符串，转换为秒数
-    例如: "01:59" -> 119秒
-    """
-    try:
-        if pd.isna(duration_str) or duration_str == '':
-            return 0
-        duration_str = str(duration_str).strip()
-        parts = duration_str.split(':')
-        if len(parts) == 2:
-            minutes = int(parts[0])
-            seconds = int(parts[1])
-            return minutes * 60 + seconds
-        elif len(parts) == 3:
-            hours = int(parts[0])
-            minutes = int(parts[1])
-            seconds = int(parts[2])
-            return hours * 3600 + minutes * 60 + seconds
-        return 0
-    except:
-        return 0
-
-
-def load_video_data_from_csv():
+
+def load_video_data_from_csv(columns=None):
     """
-    从CSV文件加载视频数据
+    从数据仓库加载视频数据（CSV或数据库，由 Config.DATASET_BACKEND 决定）
+    :param columns: 需要的列，None表示全部
     :return: DataFrame
     """
-    try:
-        if os.path.exists(VIDEO_CSV_PATH):
-            df = pd.read_csv(VIDEO_CSV_PATH, encoding='utf-8')
-
-            # 列名映射
-            column_mapping = {
-                '用户名': 'user_name',
-                '粉丝数量': 'fans_count',
-                '视频描述': 'description',
-                '发布时间': 'publish_time',
-                '视频时长': 'duration',
-                '点赞数': 'like_count',
-                '收藏数': 'collect_count',
-                '评论数': 'comment_count',
-                '分享数': 'share_count',
-                '视频ID': 'aweme_id'
-            }
-
-            # 重命名列
-            df = df.rename(columns=column_mapping)
-
-            # 数据类型转换
-            numeric_columns = ['fans_count', 'like_count', 'collect_count', 'comment_count', 'share_count']
-            for col in numeric_columns:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    return get_repository().videos(columns=columns)
 
-            # 将aweme_id转换为字符串，便于API查找
-            if 'aweme_id' in df.columns:
-                df['aweme_id'] = df['aweme_id'].astype(str)
 
-            # 解析duration字段
-            if 'duration' in df.columns:
-                df['duration'] = df['duration'].apply(parse_duration)
-
-            return df
-        else:
-            logger.warning(f"视频CSV文件不存在: {VIDEO_CSV_PATH}")
-            return pd.DataFrame()
-    except Exception as e:
-        logger.error(f"从CSV加载视频数据失败: {e}")
-        return pd.DataFrame()
+def load_comment_data_from_csv(columns=None):
+    """
+    从数据仓库加载评论数据（CSV或数据库，由 Config.DATASET_BACKEND 决定）
+    :param columns: 需要的列，None表示全部
+    :return: DataFrame
+    """
+    return get_repository().comments(columns=columns)
 
 
-def load_comment_data_from_csv():
+def get_video(video_id):
     """
-    从CSV文件加载评论数据
-    :return: DataFrame
+    获取单条视频数据
+    :param video_id: 视频ID
+    :return: 视频数据（Series），不存在时返回None
     """
-    try:
-        if os.path.exists(COMMENT_CSV_PATH):
-            df = pd.read_csv(COMMENT_CSV_PATH, encoding='utf-8')
-
-            # 列名映射
-            column_mapping = {
-                '用户id': 'user_id',
-                '用户名': 'user_name',
-                '评论内容': 'content',
-                '评论时间': 'comment_time',
-                'IP地址': 'user_ip',
-                '点赞数': 'like_count',
-                '视频id': 'aweme_id'
-            }
+    return get_repository().get_video(video_id)
 
-            # 重命名列
-            df = df.rename(columns=column_mapping)
 
-            # 数据类型转换
-            if 'like_count' in df.columns:
-                df['like_count'] = pd.to_numeric(df['like_count'], errors='coerce').fillna(0)
+def with_filters(view):
+    """
+    统计接口装饰器：解析查询参数中的筛选条件（keyword / hashtag / start / end / fans_min / fans_max / creator），
+    以 filters 参数传给视图，参数无效时返回错误
+    """
 
-            # 将aweme_id转换为字符串，便于筛选
-            if 'aweme_id' in df.columns:
-                df['aweme_id'] = df['aweme_id'].astype(str)
+    @wraps(view)
+    def filtered_view(request, *args, **kwargs):
+        try:
+            filters = FilterSpec.from_params(request.GET)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)})
+        return view(request, *args, filters=filters, **kwargs)
 
-            return df
-        else:
-            logger.warning(f"评论CSV文件不存在: {COMMENT_CSV_PATH}")
-            return pd.DataFrame()
-    except Exception as e:
-        logger.error(f"从CSV加载评论数据失败: {e}")
-        return pd.DataFrame()
+    return filtered_view
 
 
 def index(request):
@@ -141,12 +78,12 @@ def index(request):
 
 
 def dashboard(request):
-    """数据仪表盘"""
-    analyzer = DataAnalyzer()
-    report = analyzer.generate_full_analysis_report()
+    """数据仪表盘（读取后台生成的报告快照，不等待分析计算）"""
+    snapshot = report_refresher.latest()
 
     return render(request, 'dashboard.html', {
-        'report': report
+        'report': snapshot.report if snapshot else None,
+        'report_built_at': snapshot.built_at if snapshot else None,
     })
 
 
@@ -160,60 +97,127 @@ def ai_analysis(request):
     return render(request, 'ai_analysis.html')
 
 
-def api_general_stats(request):
+@cached_api
+@with_filters
+def api_general_stats(request, filters=None):
     """总体统计数据API"""
-    stats = DataAnalyzer.get_general_statistics()
+    stats = DataAnalyzer.get_general_statistics(filters=filters)
     return JsonResponse({'success': True, 'data': stats})
 
 
-def api_like_collect_relation(request):
+@cached_api
+@with_filters
+def api_like_collect_relation(request, filters=None):
     """点赞收藏关系API"""
-    relation = DataAnalyzer.analyze_like_collect_relation()
+    relation = DataAnalyzer.analyze_like_collect_relation(filters=filters)
     return JsonResponse({'success': True, 'data': relation})
 
 
-def api_fans_distribution(request):
+@cached_api
+@with_filters
+def api_fans_distribution(request, filters=None):
     """粉丝分布API"""
-    distribution = DataAnalyzer.categorize_fans_distribution()
+    distribution = DataAnalyzer.categorize_fans_distribution(filters=filters)
     return JsonResponse({'success': True, 'data': distribution})
 
 
-def api_ip_distribution(request):
+@cached_api
+@with_filters
+def api_ip_distribution(request, filters=None):
     """IP分布API"""
-    distribution = DataAnalyzer.analyze_user_ip_distribution()
+    distribution = DataAnalyzer.analyze_user_ip_distribution(filters=filters)
     return JsonResponse({'success': True, 'data': distribution})
 
 
-def api_top_users(request):
+@cached_api
+@with_filters
+def api_top_users(request, filters=None):
     """用户排行API"""
     limit = int(request.GET.get('limit', 10))
-    users = DataAnalyzer.get_top_users_by_fans(limit=limit)
+    users = DataAnalyzer.get_top_users_by_fans(limit=limit, filters=filters)
     return JsonResponse({'success': True, 'data': users})
 
 
-def api_top_videos(request):
+@cached_api
+@with_filters
+def api_top_videos(request, filters=None):
     """视频排行API"""
     limit = int(request.GET.get('limit', 10))
-    videos = DataAnalyzer.get_top_videos_by_likes(limit=limit)
+    videos = DataAnalyzer.get_top_videos_by_likes(limit=limit, filters=filters)
     return JsonResponse({'success': True, 'data': videos})
 
 
-def api_video_statistics(request):
+@cached_api
+@with_filters
+def api_video_statistics(request, filters=None):
     """视频统计API"""
-    stats = DataAnalyzer.analyze_video_statistics()
+    stats = DataAnalyzer.analyze_video_statistics(filters=filters)
     return JsonResponse({'success': True, 'data': stats})
 
 
-def api_publish_time_distribution(request):
+@cached_api
+@with_filters
+def api_publish_time_distribution(request, filters=None):
     """发布时间分布API"""
-    distribution = DataAnalyzer.analyze_publish_time_distribution()
+    distribution = DataAnalyzer.analyze_publish_time_distribution(filters=filters)
     return JsonResponse({'success': True, 'data': distribution})
 
 
-def api_full_report(request):
+@cached_api
+@with_filters
+def api_time_series(request, filters=None):
+    """时间趋势API"""
+    try:
+        result = DataAnalyzer.analyze_time_series(
+            source=request.GET.get('source', 'video'),
+            granularity=request.GET.get('granularity', 'day'),
+            dimension=request.GET.get('dimension') or None,
+            key=request.GET.get('key') or None,
+            start=request.GET.get('start') or None,
+            end=request.GET.get('end') or None,
+            limit=int(request.GET.get('limit', 10)),
+            filters=filters,
+        )
+        return JsonResponse({'success': True, 'data': result})
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+
+@cached_api
+@with_filters
+def api_full_report(request, filters=None):
     """完整报告API"""
-    report = DataAnalyzer.generate_full_analysis_report()
-    return JsonResponse({'success': True, 'data': report})
+    engine = ReportEngine(filters=filters)
+    report = engine.build()
+    return JsonResponse({'success': True, 'data': report, 'timings': engine.timings, 'errors': engine.errors})
+
+
+def api_report_snapshot(request):
+    """预计算报告API（最近一次完成的快照）"""
+    snapshot = report_refresher.latest()
+    if snapshot is None:
+        return JsonResponse({'success': False, 'error': '报告正在生成，请稍后重试'})
+    return JsonResponse({
+        'success': True,
+        'data': snapshot.report,
+        'built_at': snapshot.built_at,
+        'build_ms': snapshot.build_ms,
+    })
+
+
+def api_video_summary(request):
+    """视频评论汇总API（预计算）"""
+    video_id = request.GET.get('video_id')
+    if not video_id:
+        return JsonResponse({'success': False, 'error': '缺少video_id参数'})
+
+    snapshot = report_refresher.latest()
+    if snapshot is None:
+        return JsonResponse({'success': False, 'error': '报告正在生成，请稍后重试'})
+    summary = snapshot.video_summaries.get(str(video_id).strip())
+    if summary is None:
+        return JsonResponse({'success': False, 'error': '视频不存在'})
+    return JsonResponse({'success': True, 'data': summary, 'built_at': snapshot.built_at})
 
 
 def api_video_wordcloud(request):
@@ -329,17 +333,13 @@ def api_analyze_video_data(request):
         if not video_id:
             return JsonResponse({'success': False, 'error': '缺少video_id参数'})
 
-        # 从CSV加载视频数据
-        df = load_video_data_from_csv()
-
-        if df.empty:
+        if get_repository().count_videos() == 0:
             return JsonResponse({'success': False, 'error': '没有视频数据'})
 
-        video_row = df[df['aweme_id'] == video_id]
-        if video_row.empty:
+        video = get_video(video_id)
+        if video is None:
             return JsonResponse({'success': False, 'error': '视频不存在'})
 
-        video = video_row.iloc[0]
         video_data = {
             'aweme_id': str(video['aweme_id']),
             'description': str(video['description']) if pd.notna(video['description']) else '',
@@ -366,10 +366,11 @@ def api_video_list(request):
         limit = int(request.GET.get('limit', 20))
         offset = int(request.GET.get('offset', 0))
 
-        # 从CSV加载视频数据
-        df = load_video_data_from_csv()
+        # 分页查询（数据库后端转换为 LIMIT / OFFSET）
+        repo = get_repository()
+        total = repo.count_videos()
 
-        if df.empty:
+        if total == 0:
             return JsonResponse({
                 'success': True,
                 'data': {
@@ -378,9 +379,7 @@ def api_video_list(request):
                 }
             })
 
-        # 分页
-        total = len(df)
-        df_page = df.iloc[offset:offset+limit]
+        df_page = repo.videos(limit=limit, offset=offset)
 
         video_list = []
         for _, video in df_page.iterrows():
@@ -463,10 +462,16 @@ def api_video_comments(request):
         page = int(request.GET.get('page', 1))
         limit = int(request.GET.get('limit', 20))
 
-        # 从CSV加载评论数据
-        df = load_comment_data_from_csv()
+        # 分页查询：指定视频时只取该视频的评论
+        repo = get_repository()
+        offset = (page - 1) * limit
+        if video_id:
+            total = repo.count_comments({'aweme_id': video_id})
+            logger.info(f"筛选视频ID: {video_id}, 找到 {total} 条评论")
+        else:
+            total = repo.count_comments()
 
-        if df.empty:
+        if total == 0:
             return JsonResponse({
                 'success': True,
                 'data': {
@@ -475,15 +480,10 @@ def api_video_comments(request):
                 }
             })
 
-        # 筛选条件：根据视频ID筛选评论
         if video_id:
-            df = df[df['aweme_id'] == str(video_id)]
-            logger.info(f"筛选视频ID: {video_id}, 找到 {len(df)} 条评论")
-
-        # 分页
-        total = len(df)
-        offset = (page - 1) * limit
-        df_page = df.iloc[offset:offset+limit]
+            df_page = repo.video_comments(video_id, limit=limit, offset=offset)
+        else:
+            df_page = repo.comments(limit=limit, offset=offset)
 
         # 构建评论列表
         comments_list = []
@@ -493,7 +493,7 @@ def api_video_comments(request):
                 'content': str(comment['content']) if pd.notna(comment['content']) else '',
                 'like_count': int(comment['like_count']) if pd.notna(comment['like_count']) else 0,
                 'user_ip': str(comment['user_ip']) if pd.notna(comment['user_ip']) else '',
-                'comment_time': str(comment['comment_time']) if pd.notna(comment['comment_time']) else ''
+                'comment_time': comment['comment_time'].strftime('%Y-%m-%d %H:%M:%S') if pd.notna(comment['comment_time']) else ''
             })
 
         return JsonResponse({
@@ -546,8 +546,8 @@ def api_prediction_stats(request):
         from sklearn.linear_model import LinearRegression
         from sklearn.model_selection import train_test_split
 
-        # 从CSV加载数据
-        df = load_video_data_from_csv()
+        # 加载预测使用的列
+        df = load_video_data_from_csv(columns=PREDICTION_COLUMNS)
 
         if df.empty or len(df) < 10:
             # 数据不足，返回默认值
@@ -607,8 +607,8 @@ def api_predict_likes(request):
         if not video_id:
             return JsonResponse({'success': False, 'error': '缺少video_id参数'})
 
-        # 从CSV加载数据
-        df = load_video_data_from_csv()
+        # 加载预测使用的列
+        df = load_video_data_from_csv(columns=PREDICTION_COLUMNS)
 
         if df.empty or len(df) < 10:
             return JsonResponse({
@@ -617,12 +617,10 @@ def api_predict_likes(request):
             })
 
         # 查找指定视频
-        video_row = df[df['aweme_id'] == video_id]
-        if video_row.empty:
+        video = get_video(video_id)
+        if video is None:
             return JsonResponse({'success': False, 'error': '视频不存在'})
 
-        video = video_row.iloc[0]
-
         # 准备训练数据
         videos = df[['comment_count', 'collect_count', 'share_count', 'fans_count', 'duration', 'like_count']].dropna()
         X = videos[['comment_count', 'collect_count', 'share_count', 'fans_count', 'duration']].values
@@ -669,8 +667,8 @@ def api_predict_likes(request):
         return JsonResponse({
             'success': True,
             'data': {
-                'video_id': video['aweme_id'],
-                'description': video['description'],
+                'video_id': str(video['aweme_id']),
+                'description': str(video['description']) if pd.notna(video['description']) else '',
                 'current_likes': int(current_likes),
                 'predicted_likes': int(base_predicted_likes),
                 'future_dates': future_dates,
@@ -689,8 +687,8 @@ def api_prediction_performance(request):
         from sklearn.linear_model import LinearRegression
         from sklearn.model_selection import train_test_split
 
-        # 从CSV加载数据
-        df = load_video_data_from_csv()
+        # 加载预测使用的列
+        df = load_video_data_from_csv(columns=PREDICTION_COLUMNS)
 
         if df.empty or len(df) < 10:
             return JsonResponse({
@@ -734,8 +732,8 @@ def api_prediction_comparison(request):
     try:
         from sklearn.linear_model import LinearRegression
 
-        # 从CSV加载数据
-        df = load_video_data_from_csv()
+        # 加载预测使用的列
+        df = load_video_data_from_csv(columns=['aweme_id'] + PREDICTION_COLUMNS)
 
         if df.empty or len(df) < 10:
             return JsonResponse({
@@ -801,12 +799,9 @@ def api_ai_chat(request):
         context = None
         if video_id:
             try:
-                df = load_video_data_from_csv()
-                if not df.empty:
-                    video_row = df[df['aweme_id'] == video_id]
-                    if not video_row.empty:
-                        video = video_row.iloc[0]
-                        context = f"""
+                video = get_video(video_id)
+                if video is not None:
+                    context = f"""
 当前视频数据：
 - 视频ID: {video['aweme_id']}
 - 用户名: {video['user_name']}
@@ -859,18 +854,13 @@ def api_ai_analyze_video(request):
         if not video_id:
             return JsonResponse({'success': False, 'error': '缺少video_id参数'})
 
-        # 从CSV获取视频数据
-        df = load_video_data_from_csv()
-
-        if df.empty:
+        if get_repository().count_videos() == 0:
             return JsonResponse({'success': False, 'error': '没有视频数据'})
 
-        video_row = df[df['aweme_id'] == video_id]
-        if video_row.empty:
+        video = get_video(video_id)
+        if video is None:
             return JsonResponse({'success': False, 'error': '视频不存在'})
 
-        video = video_row.iloc[0]
-
         # 构建视频数据字典
         video_data = {
             'aweme_id': str(video['aweme_id']),